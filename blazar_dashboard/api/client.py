@@ -10,22 +10,29 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from concurrent import futures
 import datetime
 from datetime import timezone
 from itertools import chain
 import json
 import logging
-
+import math
+import re
+import time
+
+from blazar_dashboard.api import identity
+from blazar_dashboard.api import metrics
+from blazar_dashboard.api import resilience
+from blazar_dashboard.api import singleflight
+from blazar_dashboard.api import snapshot
 from blazar_dashboard import conf
+from blazar_dashboard import profiling
 from django.conf import settings
+from django.core.cache import cache
 from horizon import exceptions
 from horizon.utils.memoized import memoized
-from keystoneauth1.identity import v3
-from keystoneauth1 import session
 from openstack_dashboard.api import base
 
-from blazarclient import client as blazar_client
-
 
 LOG = logging.getLogger(__name__)
 
@@ -69,8 +76,27 @@ class Allocation(base.APIDictWrapper):
     _attrs = ['resource_id', 'reservations']
 
 
+class HostUtilization(base.APIDictWrapper):
+    """Time one host was reserved during a window."""
+
+    _attrs = ['id', 'hypervisor_hostname', 'reservable', 'reserved_seconds',
+              'utilization']
+
+
+class LeaseSummary(base.APIDictWrapper):
+    """Lease counts of one project, by status and by resource type."""
+
+    _attrs = ['id', 'project_id', 'leases', 'statuses', 'resource_types']
+
+
 @memoized
+@profiling.traced('keystone_session')
 def blazarclient(request):
+    # The clients are imported on first use, so that Horizon workers only
+    # load them once a reservation panel is used.
+    from blazarclient import client as blazar_client
+    from keystoneauth1.identity import v3
+
     try:
         _ = base.url_for(request, 'reservation')
     except exceptions.ServiceCatalogException:
@@ -89,124 +115,636 @@ def blazarclient(request):
     # If 'insecure' is True, 'verify' is False in all cases; otherwise
     # pass the cacert path if it is present, or True if no cacert.
     verify = not insecure and (cacert or True)
-    sess = session.Session(auth=auth, verify=verify)
 
-    return blazar_client.Client(session=sess)
+    return blazar_client.Client(session=blazar_session(auth=auth,
+                                                       verify=verify))
 
 
-def lease_list(request):
-    """List the leases."""
-    leases = blazarclient(request).lease.list()
-    return [Lease(lease) for lease in leases]
+def blazar_session(auth=None, verify=True):
+    """Return a keystoneauth session whose Blazar calls are guarded.
+
+    Blazar calls get timeouts, retries and a circuit breaker, see
+    :func:`resilience.guarded`, and are traced by the profiler.
+    """
+    from keystoneauth1 import session
+
+    # Blazar calls get their own connect and read timeouts, see
+    # resilience.guarded(); this one bounds the calls to Keystone.
+    sess = session.Session(auth=auth, verify=verify,
+                           timeout=conf.resilience.get('read_timeout', 30))
+    sess.request = profiling.traced('blazar_http')(
+        resilience.guarded(sess.request))
+    return sess
 
 
+@metrics.instrumented
+@profiling.traced('api')
+def lease_list(request):
+    """List the leases."""
+    leases = [Lease(lease) for lease in singleflight.group.do(
+        ('leases', singleflight.scope(request)),
+        lambda: blazarclient(request).lease.list())]
+    imap = identity.identity_map(request)
+    for lease in leases:
+        imap.add('lease', lease.id, lease)
+    return leases
+
+
+@metrics.instrumented
+@profiling.traced('api')
+def lease_summary(request):
+    """Count the leases of each project by status and resource type.
+
+    Each lease is counted once per resource type it reserves.
+    """
+    summaries = {}
+    for lease in lease_list(request):
+        summary = summaries.get(lease.project_id)
+        if summary is None:
+            summary = summaries[lease.project_id] = {
+                'id': lease.project_id,
+                'project_id': lease.project_id,
+                'leases': 0,
+                'statuses': {},
+                'resource_types': {},
+            }
+        summary['leases'] += 1
+        statuses = summary['statuses']
+        statuses[lease.status] = statuses.get(lease.status, 0) + 1
+        resource_types = summary['resource_types']
+        for resource_type in {r['resource_type']
+                              for r in lease.reservations}:
+            resource_types[resource_type] = (
+                resource_types.get(resource_type, 0) + 1)
+    return [LeaseSummary(s) for _, s in sorted(summaries.items())]
+
+
+@metrics.instrumented
+@profiling.traced('api')
 def lease_get(request, lease_id):
     """Get a lease."""
-    lease = blazarclient(request).lease.get(lease_id)
-    return Lease(lease)
+    return identity.identity_map(request).get_or_fetch(
+        'lease', lease_id,
+        lambda: Lease(blazarclient(request).lease.get(lease_id)))
 
 
+@metrics.instrumented
+@profiling.traced('api')
 def lease_create(request, name, start, end, reservations, events):
     """Create a lease."""
     lease = blazarclient(request).lease.create(
         name, start, end, reservations, events)
+    snapshot.store.invalidate('allocations')
+    singleflight.group.forget('leases')
     return Lease(lease)
 
 
+def lease_create_many(request, leases, reservations, events):
+    """Create several leases with the same reservations concurrently.
+
+    :param leases: a list of ``(name, start, end)`` tuples.
+    Returns a list of ``(lease, created, exception)`` tuples, in the order of
+    leases, where exactly one of ``created`` and ``exception`` is set.
+    """
+    return _call_concurrently(
+        lambda lease: lease_create(request, *lease, reservations, events),
+        leases)
+
+
+@metrics.instrumented
+@profiling.traced('api')
 def lease_update(request, lease_id, **kwargs):
     """Update a lease."""
-    lease = blazarclient(request).lease.update(lease_id, **kwargs)
-    return Lease(lease)
+    lease = Lease(blazarclient(request).lease.update(lease_id, **kwargs))
+    identity.identity_map(request).add('lease', lease_id, lease)
+    snapshot.store.invalidate('allocations')
+    singleflight.group.forget('leases')
+    return lease
 
 
+@metrics.instrumented
+@profiling.traced('api')
 def lease_delete(request, lease_id):
     """Delete a lease."""
     blazarclient(request).lease.delete(lease_id)
+    identity.identity_map(request).discard('lease', lease_id)
+    snapshot.store.invalidate('allocations')
+    singleflight.group.forget('leases')
 
 
+@metrics.instrumented
+@profiling.traced('api')
 def host_list(request):
     """List hosts."""
-    hosts = blazarclient(request).host.list()
-    return [Host(h) for h in hosts]
+    hosts = [Host(h) for h in _hosts_snapshot(request)]
+    imap = identity.identity_map(request)
+    for host in hosts:
+        imap.add('host', host.id, host)
+    return hosts
 
 
+@metrics.instrumented
+@profiling.traced('api')
 def host_get(request, host_id):
     """Get a host."""
-    host = blazarclient(request).host.get(host_id)
-    return Host(host)
+    return identity.identity_map(request).get_or_fetch(
+        'host', host_id,
+        lambda: Host(blazarclient(request).host.get(host_id)))
 
 
+@metrics.instrumented
+@profiling.traced('api')
 def host_create(request, name, **kwargs):
     """Create a host."""
     host = blazarclient(request).host.create(name, **kwargs)
+    snapshot.store.invalidate('hosts')
     return Host(host)
 
 
-def host_update(request, host_id, values):
-    """Update a host."""
-    host = blazarclient(request).host.update(host_id, values)
-    return Host(host)
+@metrics.instrumented
+@profiling.traced('api')
+def host_update(request, host_id, values, invalidate=True):
+    """Update a host.
+
+    Batches of updates pass invalidate=False and drop the host snapshots
+    once they are done.
+    """
+    host = Host(blazarclient(request).host.update(host_id, values))
+    identity.identity_map(request).add('host', host_id, host)
+    if invalidate:
+        snapshot.store.invalidate('hosts')
+    return host
 
 
+def host_update_many(request, host_ids, values, on_result=None):
+    """Apply the same update to several hosts concurrently.
+
+    Returns a list of ``(host_id, host, exception)`` tuples, in the order of
+    host_ids, where exactly one of ``host`` and ``exception`` is set. If
+    given, on_result is also called with each tuple as soon as it is known.
+    The host snapshots are dropped once, after all the updates.
+    """
+    try:
+        return _call_concurrently(
+            lambda host_id: host_update(request, host_id, values,
+                                        invalidate=False),
+            host_ids, on_result)
+    finally:
+        snapshot.store.invalidate('hosts')
+
+
+def _call_concurrently(func, items, on_result=None):
+    """Call func on each item with a bounded number of threads."""
+    max_workers = conf.bulk_operations.get('max_workers', 10)
+    with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        calls = [executor.submit(func, item) for item in items]
+        if on_result is not None:
+            item_of = dict(zip(calls, items))
+            for call in futures.as_completed(calls):
+                exception = call.exception()
+                on_result(item_of[call],
+                          None if exception else call.result(), exception)
+    results = []
+    for item, call in zip(items, calls):
+        exception = call.exception()
+        results.append((item, None if exception else call.result(),
+                        exception))
+    return results
+
+
+@metrics.instrumented
+@profiling.traced('api')
 def host_delete(request, host_id):
     """Delete a host."""
     blazarclient(request).host.delete(host_id)
+    identity.identity_map(request).discard('host', host_id)
+    snapshot.store.invalidate('hosts')
+    snapshot.store.invalidate('allocations')
 
 
+@metrics.instrumented
+@profiling.traced('api')
+def host_allocation_get(request, host_id):
+    """Get the allocations of one host."""
+    request_manager = blazarclient(request).host.request_manager
+    resp, body = request_manager.get('/os-hosts/%s/allocation' % host_id)
+    return Allocation(body['allocation'])
+
+
+@metrics.instrumented
+@profiling.traced('api')
 def host_allocations_list(request):
     """List allocations for all hosts."""
-    request_manager = blazarclient(request).host.request_manager
-    resp, body = request_manager.get('/os-hosts/allocations')
-    allocations = body['allocations']
-    return [Allocation(a) for a in allocations]
+    return [Allocation(a) for a in _allocations_snapshot(request)]
 
 
-def reservation_calendar(request):
-    """Return a list of all scheduled leases."""
+def _hosts_snapshot(request):
+    return snapshot.get(request, 'hosts',
+                        lambda: blazarclient(request).host.list())
 
-    def compute_host2dict(h):
-        dictionary = dict(
+
+def _allocations_snapshot(request):
+    def fetch():
+        request_manager = blazarclient(request).host.request_manager
+        resp, body = request_manager.get('/os-hosts/allocations')
+        return body['allocations']
+
+    return snapshot.get(request, 'allocations', fetch)
+
+
+@metrics.instrumented
+@profiling.traced('api')
+def reservation_calendar(request):
+    """Return the reservable hosts and their reservations, for the calendar.
+
+    Returns ``(hosts, reservations, skipped)``. Each reservation is listed
+    once per host allocated to it, labelled with the calendar attribute of
+    the host. Data which cannot be displayed is left out and counted in
+    ``skipped``, see :func:`_calendar_allocations`.
+    """
+    calendar_attribute = conf.host_reservation.get('calendar_attribute')
+    skipped = _calendar_skipped()
+    hosts, known = _calendar_hosts(request, calendar_attribute, skipped)
+
+    rows = []
+    # Calendar label of each host, by host id.
+    labels = {}
+    for h in hosts:
+        label = labels[str(h.id)] = getattr(h, calendar_attribute)
+        row = dict(
             hypervisor_hostname=h.hypervisor_hostname, vcpus=h.vcpus,
             memory_mb=h.memory_mb, local_gb=h.local_gb, cpu_info=h.cpu_info,
-            hypervisor_type=h.hypervisor_type,)
-        # Ensure config attribute is copied over
-        calendar_attribute = conf.host_reservation.get('calendar_attribute')
-        dictionary[calendar_attribute] = (
-            h[calendar_attribute]
-        )
-        return dictionary
+            hypervisor_type=h.hypervisor_type)
+        row[calendar_attribute] = label
+        rows.append(row)
+
+    reservations = []
+    for host_id, host_reservations in _calendar_allocations(
+            request, labels, known, skipped):
+        label = labels[host_id]
+        for fields in host_reservations:
+            reservation = dict(fields)
+            reservation[calendar_attribute] = label
+            reservations.append(reservation)
+
+    _log_skipped(skipped)
+    return rows, reservations, skipped
+
+
+def _calendar_skipped():
+    return {'hosts': 0, 'allocations': 0, 'reservations': 0}
+
+
+def _calendar_hosts(request, attribute, skipped):
+    """Return the reservable hosts to display, and the ids of all hosts.
+
+    If attribute is given, hosts without it are skipped.
+    """
+    hosts = []
+    known = set()
+    for h in host_list(request):
+        known.add(str(h.id))
+        if not h.reservable:
+            continue
+        if attribute is not None and getattr(h, attribute, None) is None:
+            skipped['hosts'] += 1
+            continue
+        hosts.append(h)
+    return hosts, known
+
+
+def _calendar_allocations(request, shown, known, skipped):
+    """Yield the id and valid reservations of the allocated hosts in shown.
+
+    Allocations of hosts missing from known, e.g. deleted since, and
+    reservations without an id or valid dates are skipped rather than
+    failing the whole calendar, and counted in skipped. Allocations of
+    hosts which are known but not shown, e.g. not reservable, are left out
+    without being counted.
+    """
+    # A reservation of several hosts is in the allocations of each of them,
+    # so it is only parsed once.
+    parsed = {}
+    for alloc in host_allocations_list(request):
+        resource_id = str(alloc.resource_id)
+        if resource_id not in shown:
+            if resource_id not in known:
+                skipped['allocations'] += 1
+            continue
+        reservations = []
+        for r in alloc.reservations:
+            reservation_id = r.get('id')
+            fields = parsed.get(reservation_id, _NOT_PARSED)
+            if fields is _NOT_PARSED:
+                fields = parsed[reservation_id] = _calendar_reservation(r)
+            if fields is None:
+                skipped['reservations'] += 1
+            else:
+                reservations.append(fields)
+        yield resource_id, reservations
+
+
+_NOT_PARSED = object()
+
+
+def _calendar_reservation(reservation):
+    """Return the calendar fields of a reservation, or None if malformed."""
+    # Blazar dates are naive UTC in ISO 8601, which fromisoformat parses
+    # much faster than strptime.
+    parse = datetime.datetime.fromisoformat
+    if reservation.get('id') is None:
+        return None
+    try:
+        return {
+            'reservation_id': reservation['id'],
+            'start_date': parse(reservation['start_date']).replace(
+                tzinfo=timezone.utc),
+            'end_date': parse(reservation['end_date']).replace(
+                tzinfo=timezone.utc),
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
 
-    # NOTE: This filters by reservable hosts
-    hosts_by_id = {h.id: h for h in host_list(request) if h.reservable}
 
-    def host_reservation_dict(reservation, resource_id):
-        host_reservation = dict(
-            start_date=_parse_api_datestr(reservation['start_date']),
-            end_date=_parse_api_datestr(reservation['end_date']),
-            reservation_id=reservation['id'],
-        )
-        calendar_attribute = conf.host_reservation.get('calendar_attribute')
-        host_reservation[calendar_attribute] = (
-            hosts_by_id[resource_id][calendar_attribute]
-        )
+def _log_skipped(skipped):
+    if any(skipped.values()):
+        LOG.warning('Calendar built without %(hosts)d hosts, %(allocations)d '
+                    'allocations and %(reservations)d reservations which '
+                    'could not be displayed', skipped)
 
-        return {k: v for k, v in host_reservation.items() if v is not None}
 
-    host_reservations = [
-        [host_reservation_dict(r, alloc.resource_id)
-            for r in alloc.reservations
-            if alloc.resource_id in hosts_by_id]
-        for alloc in host_allocations_list(request)]
+def _cache_key(request, name):
+    """Return a cache key private to the user and project of request.
 
-    compute_hosts = [compute_host2dict(h) for h in hosts_by_id.values()]
+    Blazar applies its policies to each token, so cached responses are
+    only shared between requests made with the same credentials scope.
+    """
+    return 'blazar_dashboard:%s:%s:%s' % (name, request.user.id,
+                                          request.user.project_id)
 
-    return compute_hosts, list(chain(*host_reservations))
 
+# Shortest time between two saves of the last known good result of a call.
+LAST_KNOWN_GOOD_INTERVAL = 60
 
-def _parse_api_datestr(datestr):
-    if datestr is None:
-        return datestr
 
-    dateobj = datetime.datetime.strptime(datestr, "%Y-%m-%dT%H:%M:%S.%f")
+def last_known_good(request, name, fetch):
+    """Return the result of fetch, or its last result if it fails.
 
-    return dateobj.replace(tzinfo=timezone.utc)
+    Returns ``(result, fetched_at)``, where ``fetched_at`` is None for a
+    live result, and otherwise the time of the saved result, in
+    milliseconds since the epoch. Results are saved in the Django cache for
+    ``OPENSTACK_BLAZAR_CACHING['calendar_last_known_good_ttl']`` seconds,
+    at most once a minute, and are private to each user and project. If no
+    result is saved, the exception of fetch is raised.
+    """
+    ttl = conf.caching.get('calendar_last_known_good_ttl', 86400)
+    if not ttl:
+        return fetch(), None
+    key = _cache_key(request, 'last_known_good:%s' % name)
+    try:
+        result = fetch()
+    except Exception:
+        saved = cache.get(key)
+        if saved is None:
+            raise
+        LOG.warning('Unable to fetch %s, serving the result saved at %s',
+                    name, saved[1], exc_info=True)
+        return saved
+    if cache.add(key + ':saved', True, LAST_KNOWN_GOOD_INTERVAL):
+        cache.set(key, (result, int(time.time() * 1000)), ttl)
+    return result, None
+
+
+# Allocation index of each credentials scope, with the host and allocation
+# snapshots it was built from.
+_allocation_indexes = {}
+
+
+@metrics.instrumented
+@profiling.traced('api')
+def host_allocation_index(request):
+    """Return the hosts of each reservation, with a host inventory.
+
+    Returns ``(hosts_by_reservation, hosts_by_id)``, where the first maps
+    reservation ids to lists of host ids and the second maps host ids to
+    host dictionaries. Both are built in process from a single scan of the
+    host and allocation snapshots, and rebuilt whenever either snapshot
+    changes, e.g. when a lease is created, updated or deleted.
+    """
+    allocations = _allocations_snapshot(request)
+    hosts = _hosts_snapshot(request)
+    scope = singleflight.scope(request)
+    built = _allocation_indexes.get(scope)
+    if built is not None and built[0] is allocations and built[1] is hosts:
+        return built[2]
+    hosts_by_reservation = {}
+    for alloc in allocations:
+        for reservation in alloc.get('reservations') or ():
+            if 'id' in reservation:
+                hosts_by_reservation.setdefault(reservation['id'], []).append(
+                    str(alloc.get('resource_id')))
+    hosts_by_id = {str(h['id']): h for h in hosts if 'id' in h}
+    index = (hosts_by_reservation, hosts_by_id)
+    _allocation_indexes[scope] = (allocations, hosts, index)
+    return index
+
+
+def lease_allocated_hosts(request, lease):
+    """Return the hosts allocated to the reservations of a lease.
+
+    Each host has the ``reservation_id`` it is allocated to. Hosts missing
+    from the inventory, e.g. deleted since, are skipped.
+    """
+    hosts_by_reservation, hosts_by_id = host_allocation_index(request)
+    hosts = []
+    for reservation in lease.reservations:
+        for host_id in hosts_by_reservation.get(reservation['id'], ()):
+            host = hosts_by_id.get(host_id)
+            if host is not None:
+                hosts.append(Host(dict(host,
+                                       reservation_id=reservation['id'])))
+    return hosts
+
+
+@metrics.instrumented
+@profiling.traced('api')
+def host_utilization(request, start, end):
+    """Return the fraction of time each host was reserved in [start, end).
+
+    start and end are naive UTC datetimes. Overlapping reservations of a
+    host are only counted once. Malformed allocations and reservations are
+    skipped, like in the calendar.
+    """
+    window = (end - start).total_seconds()
+    skipped = 0
+    reserved = {}
+    for alloc in host_allocations_list(request):
+        alloc = alloc.to_dict()
+        reservations = alloc.get('reservations')
+        if not isinstance(reservations, list):
+            skipped += 1
+            continue
+        seconds, malformed = _reserved_seconds(reservations, start, end)
+        skipped += malformed
+        host_id = str(alloc.get('resource_id'))
+        reserved[host_id] = reserved.get(host_id, 0) + seconds
+    if skipped:
+        LOG.warning('Host utilization computed without %d malformed '
+                    'allocations and reservations', skipped)
+    utilization = []
+    for host in host_list(request):
+        seconds = reserved.get(str(host.id), 0)
+        utilization.append(HostUtilization({
+            'id': host.id,
+            'hypervisor_hostname': host.hypervisor_hostname,
+            'reservable': host.reservable,
+            'reserved_seconds': seconds,
+            'utilization': seconds / window if window > 0 else 0,
+        }))
+    return utilization
+
+
+def _reserved_seconds(reservations, start, end):
+    """Return the seconds of [start, end) covered by reservations.
+
+    Returns ``(seconds, skipped)``, where skipped counts the malformed
+    reservations left out.
+    """
+    intervals = []
+    skipped = 0
+    for reservation in reservations:
+        fields = (_calendar_reservation(reservation)
+                  if isinstance(reservation, dict) else None)
+        if fields is None:
+            skipped += 1
+            continue
+        interval_start = fields['start_date'].replace(tzinfo=None)
+        interval_end = fields['end_date'].replace(tzinfo=None)
+        if interval_start < end and interval_end > start:
+            intervals.append((max(interval_start, start),
+                              min(interval_end, end)))
+    reserved = datetime.timedelta()
+    for interval_start, interval_end in _merge_intervals(intervals):
+        reserved += interval_end - interval_start
+    return reserved.total_seconds(), skipped
+
+
+@metrics.instrumented
+@profiling.traced('api')
+def reservation_calendar_grouped(request, group_by):
+    """Return reserved host counts over time, grouped by a host attribute.
+
+    Returns ``(groups, skipped)``. Each group is summarised as a step series
+    of ``[timestamp, count]`` pairs, where ``timestamp`` is in milliseconds
+    since the epoch and ``count`` is the number of hosts of the group
+    reserved from that instant until the next step. Hosts without the
+    attribute are in the ``None`` group. Data which cannot be displayed is
+    counted in ``skipped``, see :func:`_calendar_allocations`.
+    """
+    skipped = _calendar_skipped()
+    hosts, known = _calendar_hosts(request, None, skipped)
+    group_of = {str(h.id): h.get(group_by) for h in hosts}
+    sizes = {}
+    for group in group_of.values():
+        sizes[group] = sizes.get(group, 0) + 1
+
+    intervals = {group: [] for group in sizes}
+    for host_id, reservations in _calendar_allocations(
+            request, group_of, known, skipped):
+        intervals[group_of[host_id]].extend(_merge_intervals(
+            (r['start_date'], r['end_date']) for r in reservations))
+
+    _log_skipped(skipped)
+    groups = [dict(name=group, total=sizes[group],
+                   steps=_occupancy_steps(intervals[group]))
+              for group in sorted(sizes, key=lambda g: (g is None, str(g)))]
+    return groups, skipped
+
+
+@metrics.instrumented
+@profiling.traced('api')
+def reservation_calendar_overview(request, start, end, columns):
+    """Rasterize the occupancy of reservable hosts over [start, end).
+
+    start and end are naive UTC datetimes. The window is divided into
+    ``columns`` cells, and a cell of a host is reserved if any reservation
+    of the host overlaps it. Returns ``(rows, runs, skipped)``: the calendar
+    label of each host, for each host its reserved cells, run-length
+    encoded as a flat ``[first_cell, length, ...]`` list, and the counts of
+    data which cannot be displayed, see :func:`_calendar_allocations`. The
+    size of the result depends on the number of hosts and columns, not of
+    reservations.
+    """
+    calendar_attribute = conf.host_reservation.get('calendar_attribute')
+    skipped = _calendar_skipped()
+    hosts, known = _calendar_hosts(request, calendar_attribute, skipped)
+    index = {str(h.id): i for i, h in enumerate(hosts)}
+    cells = {}
+    window = (end - start).total_seconds()
+    start = start.replace(tzinfo=timezone.utc)
+    reserved = memoryview(b'\x01' * columns)
+    for host_id, reservations in _calendar_allocations(
+            request, index, known, skipped):
+        i = index[host_id]
+        row = cells.get(i)
+        if row is None:
+            row = cells[i] = bytearray(columns)
+        for reservation in reservations:
+            first = (reservation['start_date'] -
+                     start).total_seconds() * columns / window
+            last = (reservation['end_date'] -
+                    start).total_seconds() * columns / window
+            first = max(int(first), 0)
+            last = min(math.ceil(last), columns)
+            if first < last:
+                # Paint the whole interval at once.
+                row[first:last] = reserved[:last - first]
+
+    runs = []
+    for i in range(len(hosts)):
+        row = cells.get(i)
+        encoded = []
+        if row is not None:
+            for match in _RESERVED_RUN.finditer(row):
+                encoded.extend((match.start(), match.end() - match.start()))
+        runs.append(encoded)
+    _log_skipped(skipped)
+    return ([getattr(h, calendar_attribute) for h in hosts], runs,
+            skipped)
+
+
+_RESERVED_RUN = re.compile(b'\x01+')
+
+
+def _merge_intervals(intervals):
+    """Merge overlapping (start, end) intervals into a sorted list."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _occupancy_steps(intervals):
+    """Sweep (start, end) intervals into a [timestamp, count] step series.
+
+    Ends sort before starts at the same instant so that back-to-back
+    reservations do not produce a spurious peak.
+    """
+    events = sorted(chain(((start, 1) for start, _ in intervals),
+                          ((end, -1) for _, end in intervals)),
+                    key=lambda e: (e[0], e[1]))
+    steps = []
+    count = 0
+    for when, delta in events:
+        count += delta
+        timestamp = int(when.timestamp() * 1000)
+        if steps and steps[-1][0] == timestamp:
+            steps[-1][1] = count
+        else:
+            steps.append([timestamp, count])
+    return [s for i, s in enumerate(steps) if i == 0 or
+            s[1] != steps[i - 1][1]]
@@ -0,0 +1,64 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Request-scoped identity map for Blazar resources.
+
+A single page often needs the same lease or host several times, e.g. the
+lease detail tab, the update form and the row actions. Objects fetched
+from Blazar are remembered on the Django request so that each resource is
+retrieved at most once per request.
+"""
+
+import logging
+
+LOG = logging.getLogger(__name__)
+
+_ATTR = '_blazar_identity_map'
+
+
+class IdentityMap(object):
+    """Objects fetched during one request, keyed by (kind, id)."""
+
+    def __init__(self):
+        self.objects = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_fetch(self, kind, obj_id, fetch):
+        key = (kind, str(obj_id))
+        try:
+            obj = self.objects[key]
+        except KeyError:
+            self.misses += 1
+            LOG.debug('Identity map miss for %s %s (hits=%d, misses=%d)',
+                      kind, obj_id, self.hits, self.misses)
+            obj = self.objects[key] = fetch()
+            return obj
+        self.hits += 1
+        LOG.debug('Identity map hit for %s %s (hits=%d, misses=%d)',
+                  kind, obj_id, self.hits, self.misses)
+        return obj
+
+    def add(self, kind, obj_id, obj):
+        self.objects[(kind, str(obj_id))] = obj
+
+    def discard(self, kind, obj_id):
+        self.objects.pop((kind, str(obj_id)), None)
+
+
+def identity_map(request):
+    """Return the identity map attached to the request, creating it."""
+    imap = getattr(request, _ATTR, None)
+    if imap is None:
+        imap = IdentityMap()
+        setattr(request, _ATTR, imap)
+    return imap
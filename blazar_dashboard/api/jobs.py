@@ -0,0 +1,142 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Bulk operations run in the background.
+
+Large bulk operations run on a thread of the Horizon worker, after the
+request which started them has been answered. Their status and the result
+of each item are kept in the Django cache, keyed by a job id, for
+``OPENSTACK_BLAZAR_BULK_OPERATIONS['job_ttl']`` seconds, so that the user
+who started them can follow them. With a ``CACHES`` backend shared between
+workers, any worker can show a job.
+
+A job stops being updated if its worker exits before it completes. Such a
+job is reported as interrupted once it has not been updated for
+``STALL_TIMEOUT`` seconds.
+"""
+
+import logging
+import threading
+import time
+import uuid
+
+from blazar_dashboard import conf
+from django.core.cache import cache
+
+LOG = logging.getLogger(__name__)
+
+RUNNING = 'running'
+COMPLETED = 'completed'
+INTERRUPTED = 'interrupted'
+
+# Seconds without progress after which a running job is interrupted.
+STALL_TIMEOUT = 600
+
+# Shortest time between two saves of the progress of a job, in seconds.
+SAVE_INTERVAL = 1
+
+
+class JobRequest(object):
+    """The credentials of a request, to call Blazar once it has ended.
+
+    Only the user, which holds the token and its scope, and the domain
+    context are kept.
+    """
+
+    def __init__(self, request):
+        self.user = request.user
+        self.session = {
+            'domain_context': request.session.get('domain_context')}
+
+
+class Job(object):
+    """Status and per item results of a background job."""
+
+    def __init__(self, job_id, name, owner, total):
+        self.id = job_id
+        self.name = name
+        self.owner = owner
+        self.total = total
+        self.status = RUNNING
+        self.succeeded = []
+        # (item, error message) pairs.
+        self.failed = []
+        self.updated_at = time.time()
+
+    @property
+    def done(self):
+        return len(self.succeeded) + len(self.failed)
+
+
+def _key(job_id):
+    return 'blazar_dashboard:job:%s' % job_id
+
+
+def _owner(request):
+    return request.user.id, request.user.project_id
+
+
+def _save(job):
+    job.updated_at = time.time()
+    cache.set(_key(job.id), job, conf.bulk_operations.get('job_ttl', 86400))
+
+
+def start(request, name, items, run):
+    """Run a job over items on a background thread, and return its id.
+
+    run is called with a :class:`JobRequest`, the items and a function to
+    call with ``(item, result, exception)`` as each item completes.
+    """
+    job = Job(uuid.uuid4().hex, name, _owner(request), len(items))
+    _save(job)
+    threading.Thread(target=_run, args=(job, JobRequest(request), items, run),
+                     daemon=True).start()
+    return job.id
+
+
+def _run(job, job_request, items, run):
+    lock = threading.Lock()
+
+    def on_result(item, result, exception):
+        with lock:
+            if exception is None:
+                job.succeeded.append(item)
+            else:
+                LOG.error('Error in job %s for %s: %s', job.id, item,
+                          exception)
+                job.failed.append((item, str(exception)))
+            if time.time() - job.updated_at >= SAVE_INTERVAL:
+                _save(job)
+
+    try:
+        run(job_request, items, on_result)
+    except Exception:
+        LOG.exception('Job %s failed', job.id)
+    with lock:
+        # Items not reported are failures too, e.g. if run raised.
+        reported = set(job.succeeded) | {item for item, _ in job.failed}
+        job.failed.extend((item, 'not processed') for item in items
+                          if item not in reported)
+        job.status = COMPLETED
+        _save(job)
+    LOG.info('Job %s: %d of %d items succeeded', job.id, len(job.succeeded),
+             job.total)
+
+
+def get(request, job_id):
+    """Return the job of job_id started by the user of request, or None."""
+    job = cache.get(_key(job_id))
+    if job is None or job.owner != _owner(request):
+        return None
+    if job.status == RUNNING and time.time() - job.updated_at > STALL_TIMEOUT:
+        job.status = INTERRUPTED
+    return job
@@ -0,0 +1,174 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-process metrics for the Blazar API calls made by the dashboard.
+
+Metrics are kept per Horizon worker process and rendered in the Prometheus
+text exposition format. Collection is controlled by the ``enabled`` key of
+``OPENSTACK_BLAZAR_METRICS``; when disabled, instrumented functions only pay
+for a dictionary lookup.
+"""
+
+import bisect
+import functools
+import threading
+import time
+
+from blazar_dashboard import conf
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+SIZE_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+
+
+class Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class FunctionMetrics(object):
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+
+
+class Registry(object):
+    """Metrics of all instrumented functions, keyed by function name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.functions = {}
+        self.coalesced = {}
+
+    def observe(self, name, elapsed, size=None, error=False):
+        with self._lock:
+            metrics = self.functions.get(name)
+            if metrics is None:
+                metrics = self.functions[name] = FunctionMetrics()
+            metrics.calls += 1
+            metrics.latency.observe(elapsed)
+            if error:
+                metrics.errors += 1
+            else:
+                metrics.size.observe(size)
+
+    def observe_coalesced(self, endpoint):
+        with self._lock:
+            self.coalesced[endpoint] = self.coalesced.get(endpoint, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.functions = {}
+            self.coalesced = {}
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            functions = sorted(self.functions.items())
+            lines = [
+                '# HELP blazar_dashboard_api_calls_total Blazar API calls.',
+                '# TYPE blazar_dashboard_api_calls_total counter',
+            ]
+            lines.extend('blazar_dashboard_api_calls_total'
+                         '{function="%s"} %d' % (name, m.calls)
+                         for name, m in functions)
+            lines.extend([
+                '# HELP blazar_dashboard_api_errors_total Blazar API calls '
+                'which raised an exception.',
+                '# TYPE blazar_dashboard_api_errors_total counter',
+            ])
+            lines.extend('blazar_dashboard_api_errors_total'
+                         '{function="%s"} %d' % (name, m.errors)
+                         for name, m in functions)
+            lines.extend([
+                '# HELP blazar_dashboard_api_latency_seconds Latency of '
+                'Blazar API calls.',
+                '# TYPE blazar_dashboard_api_latency_seconds histogram',
+            ])
+            for name, m in functions:
+                lines.extend(_render_histogram(
+                    'blazar_dashboard_api_latency_seconds', name, m.latency))
+            lines.extend([
+                '# HELP blazar_dashboard_api_result_items Number of items '
+                'returned by Blazar API calls.',
+                '# TYPE blazar_dashboard_api_result_items histogram',
+            ])
+            for name, m in functions:
+                lines.extend(_render_histogram(
+                    'blazar_dashboard_api_result_items', name, m.size))
+            lines.extend([
+                '# HELP blazar_dashboard_api_coalesced_calls_total Blazar '
+                'API calls which shared the result of an identical call in '
+                'flight.',
+                '# TYPE blazar_dashboard_api_coalesced_calls_total counter',
+            ])
+            lines.extend('blazar_dashboard_api_coalesced_calls_total'
+                         '{endpoint="%s"} %d' % (endpoint, count)
+                         for endpoint, count in sorted(
+                             self.coalesced.items()))
+        return '\n'.join(lines) + '\n'
+
+
+def _render_histogram(metric, name, histogram):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+        cumulative += count
+        yield '%s_bucket{function="%s",le="%s"} %d' % (metric, name, bound,
+                                                       cumulative)
+    yield '%s_sum{function="%s"} %s' % (metric, name, histogram.sum)
+    yield '%s_count{function="%s"} %d' % (metric, name, cumulative)
+
+
+def _result_size(result):
+    if isinstance(result, tuple):
+        return sum(_result_size(r) for r in result)
+    if isinstance(result, list):
+        return len(result)
+    return 0 if result is None else 1
+
+
+registry = Registry()
+
+
+def coalesced(endpoint):
+    """Count a call of endpoint served by an identical call in flight."""
+    if conf.metrics.get('enabled'):
+        registry.observe_coalesced(endpoint)
+
+
+def instrumented(func):
+    """Record call count, latency, result size and errors of func."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not conf.metrics.get('enabled'):
+            return func(*args, **kwargs)
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            registry.observe(name, time.monotonic() - start, error=True)
+            raise
+        registry.observe(name, time.monotonic() - start,
+                         size=_result_size(result))
+        return result
+
+    return wrapper
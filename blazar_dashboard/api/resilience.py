@@ -0,0 +1,179 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Timeouts, retries and a circuit breaker around Blazar HTTP calls.
+
+A slow or unavailable Blazar would otherwise hold Horizon workers for as
+long as its calls take, starving the other dashboards. Each Blazar call gets
+connect and read timeouts. GET calls, which are idempotent, are retried on
+connection errors and 5xx responses, after a backoff with full jitter so
+that workers do not retry in lockstep. A circuit breaker per Horizon worker
+process counts consecutive failures; once open, Blazar calls fail at once
+until ``reset_timeout`` has passed, then a single call probes Blazar again.
+
+Settings are read from ``OPENSTACK_BLAZAR_RESILIENCE``.
+"""
+
+import functools
+import logging
+import random
+import threading
+import time
+
+from blazar_dashboard import conf
+from django.utils.translation import gettext_lazy as _
+from horizon import exceptions
+
+LOG = logging.getLogger(__name__)
+
+RETRY_METHODS = ('GET', 'HEAD')
+
+
+class BlazarUnavailable(exceptions.NotAvailable):
+    """Raised instead of calling Blazar while the circuit is open."""
+
+    def __init__(self):
+        super(BlazarUnavailable, self).__init__(
+            _('The Reservation service is unavailable. Please try again '
+              'later.'))
+
+
+class CircuitBreaker(object):
+    """Consecutive failure count of the Blazar API, per process.
+
+    The circuit is closed while Blazar answers. After failure_threshold
+    consecutive failures it opens, and calls fail at once. Once
+    reset_timeout seconds have passed, it is half-open: one call goes
+    through, and its outcome closes or opens the circuit again.
+    """
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        if failure_threshold is None:
+            failure_threshold = conf.resilience.get('failure_threshold', 5)
+        if reset_timeout is None:
+            reset_timeout = conf.resilience.get('reset_timeout', 30)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def before_call(self):
+        """Raise BlazarUnavailable unless a call may be made."""
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited < self.reset_timeout or self._probing:
+                raise BlazarUnavailable()
+            LOG.info('Probing the Reservation service after %.0fs', waited)
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                LOG.info('Reservation service available again, closing '
+                         'circuit')
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            probing, self._probing = self._probing, False
+            if probing or (self._opened_at is None and
+                           self._failures == self.failure_threshold):
+                LOG.warning('Reservation service failed %d times in a row, '
+                            'opening circuit for %ss', self._failures,
+                            self.reset_timeout)
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """End a call which neither succeeded nor failed against Blazar.
+
+        E.g. a call which could not get a token from Keystone. A probe
+        ended this way leaves the circuit open, so that the next call
+        probes Blazar again.
+        """
+        with self._lock:
+            self._probing = False
+
+    def is_open(self):
+        """Return whether Blazar is currently considered unhealthy."""
+        with self._lock:
+            return self._opened_at is not None
+
+    def reset(self):
+        self.record_success()
+
+
+breaker = CircuitBreaker()
+
+
+def backoff(attempt):
+    """Return the delay before retry number attempt, counting from 0."""
+    base = conf.resilience.get('backoff', 0.2)
+    return random.uniform(0, base * 2 ** attempt)
+
+
+def guarded(request_func, circuit=None):
+    """Wrap Session.request with timeouts, retries and a circuit breaker.
+
+    Only Blazar calls, made through an adapter with an endpoint filter, are
+    guarded. Calls made by the session itself, e.g. to get a token from
+    Keystone, go through unchanged.
+    """
+    from keystoneauth1 import exceptions as ks_exceptions
+
+    circuit = circuit or breaker
+
+    @functools.wraps(request_func)
+    def wrapper(url, method, **kwargs):
+        if 'endpoint_filter' not in kwargs:
+            return request_func(url, method, **kwargs)
+        kwargs.setdefault('timeout', (
+            conf.resilience.get('connect_timeout', 5),
+            conf.resilience.get('read_timeout', 30)))
+        attempts = 1
+        if method.upper() in RETRY_METHODS:
+            attempts += conf.resilience.get('retries', 2)
+        for attempt in range(attempts):
+            circuit.before_call()
+            last = attempt + 1 == attempts
+            try:
+                resp = request_func(url, method, **kwargs)
+            except ks_exceptions.ConnectionError as e:
+                circuit.record_failure()
+                if last:
+                    raise
+                reason = e
+            except BaseException:
+                circuit.release()
+                raise
+            else:
+                if resp.status_code < 500:
+                    circuit.record_success()
+                    return resp
+                circuit.record_failure()
+                if last:
+                    return resp
+                reason = resp.status_code
+            delay = backoff(attempt)
+            LOG.debug('Retrying %s %s in %.2fs: %s', method, url, delay,
+                      reason)
+            time.sleep(delay)
+
+    return wrapper
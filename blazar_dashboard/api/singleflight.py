@@ -0,0 +1,88 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Coalescing of identical concurrent Blazar calls.
+
+When several users open the same page at once, each request would make the
+same calls to Blazar, e.g. listing all hosts. Calls are keyed by (endpoint,
+scope), the scope being the user and project whose token is used, so that
+Blazar policies still apply to each caller. While a call is in flight, the
+same call from other threads of the Horizon worker waits for it and shares
+its result, or its exception, instead of making another request.
+
+Results are shared between threads, and must not be modified.
+"""
+
+from concurrent import futures
+import logging
+import threading
+
+from blazar_dashboard.api import metrics
+
+LOG = logging.getLogger(__name__)
+
+
+class Group(object):
+    """Calls in flight, keyed by (endpoint, scope)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Return the result of func, or of the call of key in flight."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = futures.Future()
+        if not leader:
+            LOG.debug('Waiting for %s call in flight', key[0])
+            metrics.coalesced(key[0])
+            return call.result()
+        try:
+            result = func()
+        except Exception as e:
+            self._done(key, call)
+            call.set_exception(e)
+            raise
+        self._done(key, call)
+        call.set_result(result)
+        return result
+
+    def _done(self, key, call):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def forget(self, endpoint):
+        """Let later calls of endpoint start anew, in all scopes.
+
+        Calls in flight still complete for the threads already waiting.
+        This is used when the endpoint is changed, so that no caller gets
+        a result predating the change.
+        """
+        with self._lock:
+            for key in [k for k in self._calls if k[0] == endpoint]:
+                del self._calls[key]
+
+
+group = Group()
+
+
+def scope(request):
+    """Return the credentials scope of request, for use in keys."""
+    return request.user.id, request.user.project_id
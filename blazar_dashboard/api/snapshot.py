@@ -0,0 +1,154 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Stale-while-revalidate snapshots of the Blazar inventory.
+
+Hosts and host allocations are needed by most pages of the dashboard, and
+listing them is the slowest part of many requests. Snapshots of these lists
+are kept per Horizon worker process, keyed by (endpoint, scope). A snapshot
+is served as is while fresh. Once stale, it is still served, and refreshed
+on a background thread. Fetches go through :mod:`singleflight`, so that
+concurrent page loads result in a single Blazar call.
+
+Changes made through the dashboard invalidate the snapshots of the
+endpoint. So that other workers see them too, a generation counter of each
+endpoint is kept in the Django cache, and snapshots fetched before the
+latest invalidation are not served. This requires a ``CACHES`` backend
+shared between workers, such as memcached; with a per-process backend,
+other workers see changes once their snapshots expire.
+
+Snapshots are shared between requests and threads, and must not be
+modified.
+"""
+
+import logging
+import threading
+import time
+
+from blazar_dashboard.api import singleflight
+from blazar_dashboard import conf
+from django.core.cache import cache
+
+LOG = logging.getLogger(__name__)
+
+GENERATION_KEY = 'blazar_dashboard:snapshot_generation:%s'
+
+
+class Snapshot(object):
+    def __init__(self, value, fetched_at, shared_generation):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.shared_generation = shared_generation
+
+
+class SnapshotStore(object):
+    """Snapshots keyed by (endpoint, scope)."""
+
+    def __init__(self, group=None):
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        # Bumped by invalidate(), so that fetches started before are not
+        # stored.
+        self._generations = {}
+        self._group = group or singleflight.group
+
+    def get(self, key, fetch, ttl, max_stale):
+        """Return the snapshot of key, fetching it with fetch if needed.
+
+        Snapshots younger than ttl seconds are returned as is. Snapshots
+        younger than max_stale seconds are returned too, and refreshed in
+        the background. Otherwise, the caller waits for a new snapshot.
+        """
+        now = time.monotonic()
+        shared = _shared_generation(key[0])
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            generation = self._generations.get(key[0], 0)
+        if snapshot is not None and snapshot.shared_generation == shared:
+            age = now - snapshot.fetched_at
+            if age < ttl:
+                return snapshot.value
+            if age < max_stale:
+                if not self._group.in_flight(key):
+                    LOG.debug('Refreshing %s snapshot, %.1fs old', key[0],
+                              age)
+                    threading.Thread(target=self._refresh_in_background,
+                                     args=(key, fetch, generation, shared),
+                                     daemon=True).start()
+                return snapshot.value
+        return self._group.do(
+            key, lambda: self._refresh(key, fetch, generation, shared))
+
+    def _refresh(self, key, fetch, generation, shared):
+        value = fetch()
+        with self._lock:
+            if self._generations.get(key[0], 0) == generation:
+                self._snapshots[key] = Snapshot(value, time.monotonic(),
+                                                shared)
+        return value
+
+    def _refresh_in_background(self, key, fetch, generation, shared):
+        try:
+            self._group.do(
+                key, lambda: self._refresh(key, fetch, generation, shared))
+        except Exception as e:
+            LOG.warning('Unable to refresh %s snapshot: %s', key[0], e)
+
+    def invalidate(self, endpoint):
+        """Drop the snapshots of endpoint in all scopes and all workers.
+
+        Fetches in flight are forgotten too, so that later calls fetch the
+        endpoint again rather than wait for a result predating the change.
+        """
+        _bump_shared_generation(endpoint)
+        with self._lock:
+            self._generations[endpoint] = (
+                self._generations.get(endpoint, 0) + 1)
+            for key in [k for k in self._snapshots if k[0] == endpoint]:
+                del self._snapshots[key]
+        self._group.forget(endpoint)
+
+    def clear(self):
+        with self._lock:
+            self._snapshots = {}
+
+
+def _shared_generation(endpoint):
+    return cache.get(GENERATION_KEY % endpoint, 0)
+
+
+def _bump_shared_generation(endpoint):
+    key = GENERATION_KEY % endpoint
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted since added.
+        cache.set(key, 1, None)
+
+
+store = SnapshotStore()
+
+
+def get(request, endpoint, fetch):
+    """Return the snapshot of endpoint for the credentials of request.
+
+    Blazar applies its policies to each token, so snapshots are only shared
+    between requests made with the same user and project. When snapshots
+    are disabled, identical concurrent calls are still coalesced.
+    """
+    key = (endpoint, singleflight.scope(request))
+    ttl = conf.caching.get('inventory_ttl', 30)
+    if not ttl:
+        return singleflight.group.do(key, fetch)
+    max_stale = conf.caching.get('inventory_max_stale', 300)
+    return store.get(key, fetch, ttl, max(ttl, max_stale))
@@ -0,0 +1,871 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+import threading
+import unittest
+from unittest import mock
+
+from django import http
+from keystoneauth1 import adapter
+from keystoneauth1 import exceptions as ks_exceptions
+from keystoneauth1 import session
+
+from blazar_dashboard.api import client
+from blazar_dashboard.api import identity
+from blazar_dashboard.api import metrics
+from blazar_dashboard.api import resilience
+from blazar_dashboard.api import singleflight
+from blazar_dashboard.api import snapshot
+from blazar_dashboard import conf
+from blazar_dashboard.test.benchmarks import synthetic
+from blazar_dashboard.test import fake_blazar
+from blazar_dashboard.test import helpers as test
+from blazar_dashboard.test.test_data import blazar_data
+
+
+class IdentityMapTests(test.TestCase):
+    @mock.patch.object(client, 'blazarclient')
+    def test_lease_get_fetched_once_per_request(self, blazarclient):
+        blazarclient.return_value.lease.get.return_value = (
+            blazar_data.lease_sample1)
+        request = http.HttpRequest()
+        lease_id = blazar_data.lease_sample1['id']
+
+        first = client.lease_get(request, lease_id)
+        second = client.lease_get(request, lease_id)
+
+        self.assertIs(first, second)
+        blazarclient.return_value.lease.get.assert_called_once_with(lease_id)
+        imap = identity.identity_map(request)
+        self.assertEqual((1, 1), (imap.hits, imap.misses))
+
+    @mock.patch.object(client, 'blazarclient')
+    def test_lease_get_not_shared_between_requests(self, blazarclient):
+        blazarclient.return_value.lease.get.return_value = (
+            blazar_data.lease_sample1)
+        lease_id = blazar_data.lease_sample1['id']
+
+        client.lease_get(http.HttpRequest(), lease_id)
+        client.lease_get(http.HttpRequest(), lease_id)
+
+        self.assertEqual(2, blazarclient.return_value.lease.get.call_count)
+
+    @mock.patch.object(client, 'blazarclient')
+    def test_host_list_seeds_host_get(self, blazarclient):
+        blazarclient.return_value.host.list.return_value = [
+            blazar_data.host_sample1, blazar_data.host_sample2]
+        request = self.request
+
+        client.host_list(request)
+        host = client.host_get(request, '2')
+
+        self.assertEqual('compute-2', host.hypervisor_hostname)
+        blazarclient.return_value.host.get.assert_not_called()
+
+    @mock.patch.object(client, 'blazarclient')
+    def test_host_delete_discards_host(self, blazarclient):
+        blazarclient.return_value.host.get.return_value = (
+            blazar_data.host_sample1)
+        request = http.HttpRequest()
+
+        client.host_get(request, '1')
+        client.host_delete(request, '1')
+        client.host_get(request, '1')
+
+        self.assertEqual(2, blazarclient.return_value.host.get.call_count)
+
+
+class MetricsTests(test.TestCase):
+    def setUp(self):
+        super(MetricsTests, self).setUp()
+        metrics.registry.reset()
+
+    @mock.patch.dict(conf.metrics, {'enabled': False})
+    @mock.patch.object(client, 'blazarclient')
+    def test_disabled(self, blazarclient):
+        blazarclient.return_value.lease.list.return_value = []
+
+        client.lease_list(self.request)
+
+        self.assertEqual({}, metrics.registry.functions)
+
+    @mock.patch.dict(conf.metrics, {'enabled': True})
+    @mock.patch.object(client, 'blazarclient')
+    def test_calls_and_errors(self, blazarclient):
+        blazarclient.return_value.lease.list.return_value = [
+            blazar_data.lease_sample1, blazar_data.lease_sample2]
+        blazarclient.return_value.lease.delete.side_effect = (
+            self.exceptions.blazar)
+
+        client.lease_list(self.request)
+        self.assertRaises(type(self.exceptions.blazar),
+                          client.lease_delete, http.HttpRequest(), 'id')
+
+        lease_list = metrics.registry.functions['lease_list']
+        self.assertEqual((1, 0), (lease_list.calls, lease_list.errors))
+        self.assertEqual(2, lease_list.size.sum)
+        lease_delete = metrics.registry.functions['lease_delete']
+        self.assertEqual((1, 1), (lease_delete.calls, lease_delete.errors))
+        rendered = metrics.registry.render()
+        self.assertIn('blazar_dashboard_api_errors_total'
+                      '{function="lease_delete"} 1', rendered)
+        self.assertIn('blazar_dashboard_api_latency_seconds_count'
+                      '{function="lease_list"} 1', rendered)
+
+
+def _reservation(start, end):
+    return {'id': start, 'start_date': '%s:00:00.000000' % start,
+            'end_date': '%s:00:00.000000' % end}
+
+
+class UtilizationTests(test.TestCase):
+    @mock.patch.object(client, 'host_allocations_list')
+    @mock.patch.object(client, 'host_list')
+    def test_host_utilization(self, host_list, host_allocations_list):
+        host_list.return_value = [
+            client.Host(blazar_data.host_sample1),
+            client.Host(blazar_data.host_sample2)]
+        host_allocations_list.return_value = [client.Allocation({
+            'resource_id': '1',
+            'reservations': [
+                # Clipped to the start of the window: 1 day.
+                _reservation('2030-05-30T00', '2030-06-02T00'),
+                # Two overlapping reservations: 3 days.
+                _reservation('2030-06-05T00', '2030-06-07T00'),
+                _reservation('2030-06-06T00', '2030-06-08T00'),
+                # Outside of the window.
+                _reservation('2030-06-20T00', '2030-06-21T00'),
+            ]})]
+
+        utilization = client.host_utilization(
+            http.HttpRequest(), datetime.datetime(2030, 6, 1),
+            datetime.datetime(2030, 6, 11))
+
+        self.assertEqual(
+            [('1', 4 * 86400, 0.4), ('2', 0, 0)],
+            [(u.id, u.reserved_seconds, u.utilization) for u in utilization])
+
+    @mock.patch.object(client, 'host_allocations_list')
+    @mock.patch.object(client, 'host_list')
+    def test_host_utilization_malformed(self, host_list,
+                                        host_allocations_list):
+        host_list.return_value = [
+            client.Host(blazar_data.host_sample1),
+            client.Host(blazar_data.host_sample2)]
+        host_allocations_list.return_value = [
+            client.Allocation({
+                'resource_id': 1,
+                'reservations': [
+                    _reservation('2030-06-01T00', '2030-06-02T00'),
+                    {'id': 'no-dates'},
+                    _reservation('2030-06-03T00', 'invalid'),
+                ]}),
+            client.Allocation({'resource_id': 2, 'reservations': None})]
+
+        utilization = client.host_utilization(
+            http.HttpRequest(), datetime.datetime(2030, 6, 1),
+            datetime.datetime(2030, 6, 11))
+
+        self.assertEqual(
+            [('1', 86400), ('2', 0)],
+            [(u.id, u.reserved_seconds) for u in utilization])
+
+
+class ReservationCalendarTests(test.TestCase):
+    @mock.patch.object(client, 'host_allocations_list')
+    @mock.patch.object(client, 'host_list')
+    def test_reservation_calendar(self, host_list, host_allocations_list):
+        host_list.return_value = [
+            client.Host(blazar_data.host_sample1),
+            client.Host(blazar_data.host_sample2)]
+        reservation = {'id': 'r1', 'start_date': '2030-06-01T00:00:00.000000',
+                       'end_date': '2030-06-02T00:00:00.000000'}
+        host_allocations_list.return_value = [
+            client.Allocation({'resource_id': '1',
+                               'reservations': [reservation]}),
+            client.Allocation({'resource_id': '2',
+                               'reservations': [reservation]})]
+
+        hosts, reservations, skipped = client.reservation_calendar(
+            self.request)
+
+        self.assertEqual(['compute-1', 'compute-2'],
+                         [h['hypervisor_hostname'] for h in hosts])
+        self.assertEqual([{
+            'reservation_id': 'r1',
+            'start_date': datetime.datetime(
+                2030, 6, 1, tzinfo=datetime.timezone.utc),
+            'end_date': datetime.datetime(
+                2030, 6, 2, tzinfo=datetime.timezone.utc),
+            'hypervisor_hostname': name,
+        } for name in ('compute-1', 'compute-2')], reservations)
+        self.assertEqual({'hosts': 0, 'allocations': 0, 'reservations': 0},
+                         skipped)
+
+    @mock.patch.dict(conf.host_reservation, {'calendar_attribute': 'rack'})
+    @mock.patch.object(client, 'host_allocations_list')
+    @mock.patch.object(client, 'host_list')
+    def test_reservation_calendar_skips_malformed(self, host_list,
+                                                  host_allocations_list):
+        host_list.return_value = [
+            client.Host(dict(blazar_data.host_sample1, rack='r1')),
+            client.Host(blazar_data.host_sample2)]
+        valid = {'id': 'r1', 'start_date': '2030-06-01T00:00:00.000000',
+                 'end_date': '2030-06-02T00:00:00.000000'}
+        host_allocations_list.return_value = [
+            client.Allocation({'resource_id': '1', 'reservations': [
+                valid,
+                {'id': 'r2', 'start_date': None,
+                 'end_date': '2030-06-02T00:00:00.000000'},
+                {'id': 'r3', 'start_date': '2030-06-01T00:00:00.000000'},
+                {'start_date': '2030-06-01T00:00:00.000000',
+                 'end_date': '2030-06-02T00:00:00.000000'}]}),
+            # Host without the calendar attribute
+            client.Allocation({'resource_id': '2', 'reservations': [valid]}),
+            # Host deleted since
+            client.Allocation({'resource_id': '3', 'reservations': [valid]})]
+
+        hosts, reservations, skipped = client.reservation_calendar(
+            self.request)
+
+        self.assertEqual(['r1'], [h['rack'] for h in hosts])
+        self.assertEqual([('r1', 'r1')],
+                         [(r['reservation_id'], r['rack'])
+                          for r in reservations])
+        self.assertEqual({'hosts': 1, 'allocations': 1, 'reservations': 3},
+                         skipped)
+
+
+class CalendarOverviewTests(test.TestCase):
+    @mock.patch.object(client, 'host_allocations_list')
+    @mock.patch.object(client, 'host_list')
+    def test_reservation_calendar_overview(self, host_list,
+                                           host_allocations_list):
+        host_list.return_value = [
+            client.Host(blazar_data.host_sample1),
+            client.Host(blazar_data.host_sample2)]
+        host_allocations_list.return_value = [client.Allocation({
+            'resource_id': '1',
+            'reservations': [
+                # Clipped to the start of the window: cell 0.
+                _reservation('2030-05-30T00', '2030-06-02T00'),
+                # Cells 4 to 6, merged with cells 6 and 7.
+                _reservation('2030-06-09T00', '2030-06-14T12'),
+                _reservation('2030-06-13T00', '2030-06-17T00'),
+                # Outside of the window.
+                _reservation('2030-07-20T00', '2030-07-21T00'),
+            ]}), client.Allocation({
+                'resource_id': 'unknown',
+                'reservations': [
+                    _reservation('2030-06-01T00', '2030-06-02T00')]})]
+
+        rows, runs, skipped = client.reservation_calendar_overview(
+            http.HttpRequest(), datetime.datetime(2030, 6, 1),
+            datetime.datetime(2030, 6, 21), 10)
+
+        self.assertEqual(['compute-1', 'compute-2'], rows)
+        self.assertEqual([[0, 1, 4, 4], []], runs)
+        self.assertEqual({'hosts': 0, 'allocations': 1, 'reservations': 0},
+                         skipped)
+
+    @mock.patch.dict(conf.host_reservation, {'calendar_attribute': 'rack'})
+    @mock.patch.object(client, 'host_allocations_list')
+    @mock.patch.object(client, 'host_list')
+    def test_reservation_calendar_overview_skips_malformed(
+            self, host_list, host_allocations_list):
+        host_list.return_value = [
+            client.Host(dict(blazar_data.host_sample1, rack='r1')),
+            client.Host(blazar_data.host_sample2)]
+        host_allocations_list.return_value = [
+            client.Allocation({'resource_id': '1', 'reservations': [
+                _reservation('2030-06-01T00', '2030-06-03T00'),
+                {'id': 'r2', 'start_date': None,
+                 'end_date': '2030-06-02T00:00:00.000000'}]}),
+            client.Allocation({'resource_id': '2', 'reservations': [
+                _reservation('2030-06-05T00', '2030-06-07T00')]})]
+
+        rows, runs, skipped = client.reservation_calendar_overview(
+            http.HttpRequest(), datetime.datetime(2030, 6, 1),
+            datetime.datetime(2030, 6, 21), 10)
+
+        self.assertEqual(['r1'], rows)
+        self.assertEqual([[0, 1]], runs)
+        self.assertEqual({'hosts': 1, 'allocations': 0, 'reservations': 1},
+                         skipped)
+
+
+class CalendarGroupedTests(test.TestCase):
+    @mock.patch.object(client, 'host_allocations_list')
+    @mock.patch.object(client, 'host_list')
+    def test_reservation_calendar_grouped_skips_malformed(
+            self, host_list, host_allocations_list):
+        host_list.return_value = [
+            client.Host(dict(blazar_data.host_sample1, rack='r1')),
+            client.Host(blazar_data.host_sample2)]
+        host_allocations_list.return_value = [
+            client.Allocation({'resource_id': '1', 'reservations': [
+                _reservation('2030-06-01T00', '2030-06-03T00'),
+                {'id': 'r2', 'start_date': None,
+                 'end_date': '2030-06-02T00:00:00.000000'},
+                {'start_date': '2030-06-01T00:00:00.000000'}]}),
+            client.Allocation({'resource_id': '3', 'reservations': [
+                _reservation('2030-06-05T00', '2030-06-07T00')]})]
+
+        groups, skipped = client.reservation_calendar_grouped(
+            http.HttpRequest(), 'rack')
+
+        def ms(day):
+            return int(datetime.datetime(
+                2030, 6, day, tzinfo=datetime.timezone.utc).timestamp() *
+                1000)
+
+        self.assertEqual([
+            {'name': 'r1', 'total': 1, 'steps': [[ms(1), 1], [ms(3), 0]]},
+            {'name': None, 'total': 1, 'steps': []}], groups)
+        self.assertEqual({'hosts': 0, 'allocations': 1, 'reservations': 2},
+                         skipped)
+
+
+class SingleFlightTests(unittest.TestCase):
+    key = ('hosts', ('1', '1'))
+
+    def setUp(self):
+        super(SingleFlightTests, self).setUp()
+        self.group = singleflight.Group()
+        metrics.registry.reset()
+        patcher = mock.patch.dict(conf.metrics, {'enabled': True})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _call_concurrently(self, func, threads=50):
+        """Call func through the group from threads, returning outcomes.
+
+        func is only called once all the other threads wait for it.
+        """
+        waiting = threading.Semaphore(0)
+        coalesced = metrics.coalesced
+
+        def count_waiter(endpoint):
+            coalesced(endpoint)
+            waiting.release()
+
+        def leader():
+            for _ in range(threads - 1):
+                self.assertTrue(waiting.acquire(timeout=5))
+            return func()
+
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(self.group.do(self.key, leader))
+            except Exception as e:
+                outcomes.append(e)
+
+        with mock.patch.object(metrics, 'coalesced', count_waiter):
+            workers = [threading.Thread(target=call)
+                       for _ in range(threads)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        return outcomes
+
+    def test_concurrent_calls_coalesced(self):
+        func = mock.Mock(return_value='hosts')
+
+        outcomes = self._call_concurrently(func)
+
+        self.assertEqual(['hosts'] * 50, outcomes)
+        func.assert_called_once_with()
+        self.assertEqual({'hosts': 49}, metrics.registry.coalesced)
+        self.assertIn('blazar_dashboard_api_coalesced_calls_total'
+                      '{endpoint="hosts"} 49', metrics.registry.render())
+
+    def test_exception_shared(self):
+        error = ValueError('down')
+
+        outcomes = self._call_concurrently(mock.Mock(side_effect=error))
+
+        self.assertEqual([error] * 50, outcomes)
+
+    def test_sequential_calls_not_coalesced(self):
+        func = mock.Mock(side_effect=['first', 'second'])
+
+        self.assertEqual('first', self.group.do(self.key, func))
+        self.assertEqual('second', self.group.do(self.key, func))
+        self.assertEqual({}, metrics.registry.coalesced)
+
+    def test_scopes_not_coalesced(self):
+        def func():
+            return self.group.do(('hosts', ('2', '2')), lambda: 'other')
+
+        self.assertEqual('other', self.group.do(self.key, func))
+        self.assertEqual({}, metrics.registry.coalesced)
+
+    def test_forget(self):
+        def func():
+            self.group.forget('hosts')
+            self.assertFalse(self.group.in_flight(self.key))
+            return self.group.do(self.key, lambda: 'after')
+
+        self.assertEqual('after', self.group.do(self.key, func))
+
+
+class _ImmediateThread(object):
+    """Run the target of a thread when started, in the calling thread."""
+
+    def __init__(self, target, args, daemon):
+        self.target = target
+        self.args = args
+
+    def start(self):
+        self.target(*self.args)
+
+
+@mock.patch.object(snapshot.time, 'monotonic')
+class SnapshotStoreTests(unittest.TestCase):
+    key = ('hosts', ('1', '1'))
+
+    def setUp(self):
+        super(SnapshotStoreTests, self).setUp()
+        self.store = snapshot.SnapshotStore(singleflight.Group())
+
+    def test_fresh(self, monotonic):
+        fetch = mock.Mock(side_effect=['first', 'second'])
+        monotonic.return_value = 100
+
+        self.assertEqual('first', self.store.get(self.key, fetch, 30, 300))
+        monotonic.return_value = 129
+        self.assertEqual('first', self.store.get(self.key, fetch, 30, 300))
+
+        fetch.assert_called_once_with()
+
+    @mock.patch.object(snapshot.threading, 'Thread', _ImmediateThread)
+    def test_stale_refreshed_in_background(self, monotonic):
+        fetch = mock.Mock(side_effect=['first', 'second'])
+        monotonic.return_value = 100
+        self.store.get(self.key, fetch, 30, 300)
+
+        # The refresh happens after the stale snapshot was chosen.
+        monotonic.return_value = 200
+        self.assertEqual('first', self.store.get(self.key, fetch, 30, 300))
+        self.assertEqual('second', self.store.get(self.key, fetch, 30, 300))
+        self.assertEqual(2, fetch.call_count)
+
+    def test_expired(self, monotonic):
+        fetch = mock.Mock(side_effect=['first', 'second'])
+        monotonic.return_value = 100
+        self.store.get(self.key, fetch, 30, 300)
+
+        monotonic.return_value = 400
+        self.assertEqual('second', self.store.get(self.key, fetch, 30, 300))
+
+    def test_invalidate(self, monotonic):
+        fetch = mock.Mock(side_effect=['first', 'second'])
+        monotonic.return_value = 100
+        self.store.get(self.key, fetch, 30, 300)
+
+        self.store.invalidate('allocations')
+        self.assertEqual('first', self.store.get(self.key, fetch, 30, 300))
+        self.store.invalidate('hosts')
+        self.assertEqual('second', self.store.get(self.key, fetch, 30, 300))
+
+    def test_invalidated_by_other_worker(self, monotonic):
+        fetch = mock.Mock(side_effect=['first', 'second'])
+        monotonic.return_value = 100
+        self.store.get(self.key, fetch, 30, 300)
+
+        # Another worker process, sharing the Django cache.
+        snapshot.SnapshotStore(singleflight.Group()).invalidate('hosts')
+
+        self.assertEqual('second', self.store.get(self.key, fetch, 30, 300))
+
+    def test_refresh_started_before_invalidate_not_stored(self, monotonic):
+        monotonic.return_value = 100
+
+        def fetch():
+            self.store.invalidate('hosts')
+            return 'outdated'
+
+        self.assertEqual('outdated',
+                         self.store.get(self.key, fetch, 30, 300))
+        self.assertEqual('current', self.store.get(
+            self.key, lambda: 'current', 30, 300))
+
+    def test_failure(self, monotonic):
+        monotonic.return_value = 100
+        fetch = mock.Mock(side_effect=[ValueError('down'), 'hosts'])
+
+        self.assertRaises(ValueError, self.store.get, self.key, fetch, 30,
+                          300)
+        self.assertEqual('hosts', self.store.get(self.key, fetch, 30, 300))
+
+
+class SnapshotTests(test.TestCase):
+    @mock.patch.object(client, 'blazarclient')
+    def test_host_list_shared_between_requests(self, blazarclient):
+        blazarclient.return_value.host.list.return_value = [
+            blazar_data.host_sample1]
+        other = http.HttpRequest()
+        other.user = self.request.user
+
+        client.host_list(self.request)
+        client.host_list(other)
+
+        blazarclient.return_value.host.list.assert_called_once_with()
+
+    @mock.patch.object(client, 'blazarclient')
+    def test_host_update_invalidates_hosts(self, blazarclient):
+        blazarclient.return_value.host.list.return_value = [
+            blazar_data.host_sample1]
+        blazarclient.return_value.host.update.return_value = (
+            blazar_data.host_sample1)
+
+        client.host_list(self.request)
+        client.host_update(self.request, '1', {'reservable': False})
+        client.host_list(self.request)
+
+        self.assertEqual(2, blazarclient.return_value.host.list.call_count)
+
+    @mock.patch.object(snapshot.store, 'invalidate')
+    @mock.patch.object(client, 'blazarclient')
+    def test_host_update_many_invalidates_once(self, blazarclient,
+                                               invalidate):
+        blazarclient.return_value.host.update.return_value = (
+            blazar_data.host_sample1)
+
+        client.host_update_many(self.request, ['1', '2', '3'],
+                                {'reservable': False})
+
+        self.assertEqual(3, blazarclient.return_value.host.update.call_count)
+        invalidate.assert_called_once_with('hosts')
+
+    @mock.patch.object(client, 'blazarclient')
+    def test_allocation_index_rebuilt_on_change(self, blazarclient):
+        host = blazarclient.return_value.host
+        host.list.return_value = [blazar_data.host_sample1]
+        host.request_manager.get.return_value = (None, {'allocations': [
+            blazar_data.allocation_sample1]})
+
+        index = client.host_allocation_index(self.request)
+        self.assertIs(index, client.host_allocation_index(self.request))
+        self.assertEqual(
+            {'087bc740-6d2d-410b-9d47-c7b2b55a9d36': ['1']}, index[0])
+
+        snapshot.store.invalidate('allocations')
+        host.request_manager.get.return_value = (None, {'allocations': [
+            blazar_data.allocation_sample2]})
+
+        index = client.host_allocation_index(self.request)
+        self.assertEqual(
+            {'1b05370e-d92a-452d-80db-89842666b604': ['2']}, index[0])
+
+    @mock.patch.dict(conf.caching, {'inventory_ttl': 0})
+    @mock.patch.object(client, 'blazarclient')
+    def test_disabled(self, blazarclient):
+        blazarclient.return_value.host.list.return_value = []
+
+        client.host_list(self.request)
+        client.host_list(self.request)
+
+        self.assertEqual(2, blazarclient.return_value.host.list.call_count)
+
+
+class LastKnownGoodTests(test.TestCase):
+    def test_live_result(self):
+        fetch = mock.Mock(return_value=[1, 2])
+
+        self.assertEqual(([1, 2], None),
+                         client.last_known_good(self.request, 'calendar',
+                                                fetch))
+
+    @mock.patch.object(client.time, 'time', return_value=1000)
+    def test_saved_result_served_on_failure(self, time):
+        client.last_known_good(self.request, 'calendar', lambda: [1, 2])
+        fetch = mock.Mock(side_effect=self.exceptions.blazar)
+
+        self.assertEqual(([1, 2], 1000000),
+                         client.last_known_good(self.request, 'calendar',
+                                                fetch))
+
+    def test_failure_without_saved_result(self):
+        fetch = mock.Mock(side_effect=self.exceptions.blazar)
+
+        self.assertRaises(type(self.exceptions.blazar),
+                          client.last_known_good, self.request, 'calendar',
+                          fetch)
+
+    def test_saved_at_most_once_per_interval(self):
+        client.last_known_good(self.request, 'calendar', lambda: [1])
+        client.last_known_good(self.request, 'calendar', lambda: [2])
+        fetch = mock.Mock(side_effect=self.exceptions.blazar)
+
+        result, fetched_at = client.last_known_good(self.request,
+                                                    'calendar', fetch)
+
+        self.assertEqual([1], result)
+
+    @mock.patch.dict(conf.caching, {'calendar_last_known_good_ttl': 0})
+    def test_disabled(self):
+        client.last_known_good(self.request, 'calendar', lambda: [1])
+        fetch = mock.Mock(side_effect=self.exceptions.blazar)
+
+        self.assertRaises(type(self.exceptions.blazar),
+                          client.last_known_good, self.request, 'calendar',
+                          fetch)
+
+
+def _response(status_code):
+    return mock.Mock(status_code=status_code)
+
+
+@mock.patch.dict(conf.resilience, {'connect_timeout': 2, 'read_timeout': 7,
+                                   'retries': 2, 'backoff': 0.1})
+@mock.patch.object(resilience.time, 'sleep')
+class GuardedRequestTests(unittest.TestCase):
+    def setUp(self):
+        super(GuardedRequestTests, self).setUp()
+        self.circuit = resilience.CircuitBreaker(failure_threshold=10,
+                                                 reset_timeout=30)
+        self.request_func = mock.Mock(return_value=_response(200))
+        self.guarded = resilience.guarded(self.request_func, self.circuit)
+
+    def test_timeouts(self, sleep):
+        self.guarded('/leases', 'GET', endpoint_filter={})
+
+        self.request_func.assert_called_once_with(
+            '/leases', 'GET', endpoint_filter={}, timeout=(2, 7))
+
+    def test_keystone_calls_unchanged(self, sleep):
+        self.guarded('/v3/auth/tokens', 'POST', json={})
+
+        self.request_func.assert_called_once_with(
+            '/v3/auth/tokens', 'POST', json={})
+
+    def test_get_retried_on_server_error(self, sleep):
+        self.request_func.side_effect = [_response(503), _response(200)]
+
+        resp = self.guarded('/leases', 'GET', endpoint_filter={})
+
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual(2, self.request_func.call_count)
+        self.assertEqual(1, sleep.call_count)
+        self.assertFalse(self.circuit.is_open())
+
+    def test_get_retries_bounded(self, sleep):
+        self.request_func.side_effect = ks_exceptions.ConnectFailure()
+
+        self.assertRaises(ks_exceptions.ConnectFailure, self.guarded,
+                          '/leases', 'GET', endpoint_filter={})
+
+        self.assertEqual(3, self.request_func.call_count)
+        self.assertEqual(2, sleep.call_count)
+
+    def test_last_server_error_returned(self, sleep):
+        self.request_func.return_value = _response(500)
+
+        resp = self.guarded('/leases', 'GET', endpoint_filter={})
+
+        self.assertEqual(500, resp.status_code)
+        self.assertEqual(3, self.request_func.call_count)
+
+    def test_client_error_not_retried(self, sleep):
+        self.request_func.return_value = _response(404)
+
+        resp = self.guarded('/leases/1', 'GET', endpoint_filter={})
+
+        self.assertEqual(404, resp.status_code)
+        self.assertEqual(1, self.request_func.call_count)
+        sleep.assert_not_called()
+
+    def test_post_not_retried(self, sleep):
+        self.request_func.side_effect = ks_exceptions.ConnectTimeout()
+
+        self.assertRaises(ks_exceptions.ConnectTimeout, self.guarded,
+                          '/leases', 'POST', endpoint_filter={})
+
+        self.assertEqual(1, self.request_func.call_count)
+        sleep.assert_not_called()
+
+    @mock.patch.object(resilience.random, 'uniform',
+                       side_effect=lambda a, b: b)
+    def test_backoff_jitter(self, uniform, sleep):
+        self.request_func.return_value = _response(502)
+
+        self.guarded('/leases', 'GET', endpoint_filter={})
+
+        self.assertEqual([mock.call(0, 0.1), mock.call(0, 0.2)],
+                         uniform.call_args_list)
+        self.assertEqual([mock.call(0.1), mock.call(0.2)],
+                         sleep.call_args_list)
+
+    def test_fails_fast_when_open(self, sleep):
+        self.circuit.failure_threshold = 2
+        self.request_func.return_value = _response(500)
+
+        self.assertRaises(resilience.BlazarUnavailable, self.guarded,
+                          '/leases', 'GET', endpoint_filter={})
+
+        self.assertEqual(2, self.request_func.call_count)
+        self.assertTrue(self.circuit.is_open())
+
+    @mock.patch.object(resilience.time, 'monotonic', return_value=100)
+    def test_probe_raising_other_error_released(self, monotonic, sleep):
+        self.circuit.failure_threshold = 1
+        self.circuit.reset_timeout = 0
+        self.request_func.side_effect = [
+            ks_exceptions.ConnectFailure(), ks_exceptions.Unauthorized(),
+            _response(200)]
+
+        self.assertRaises(ks_exceptions.ConnectFailure, self.guarded,
+                          '/leases', 'POST', endpoint_filter={})
+        self.assertRaises(ks_exceptions.Unauthorized, self.guarded,
+                          '/leases', 'GET', endpoint_filter={})
+        self.assertTrue(self.circuit.is_open())
+        resp = self.guarded('/leases', 'GET', endpoint_filter={})
+
+        self.assertEqual(200, resp.status_code)
+        self.assertFalse(self.circuit.is_open())
+
+
+@mock.patch.object(resilience.time, 'monotonic')
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        super(CircuitBreakerTests, self).setUp()
+        self.circuit = resilience.CircuitBreaker(failure_threshold=3,
+                                                 reset_timeout=30)
+
+    def _fail(self, times):
+        for _ in range(times):
+            self.circuit.before_call()
+            self.circuit.record_failure()
+
+    def test_opens_after_consecutive_failures(self, monotonic):
+        monotonic.return_value = 100
+        self._fail(2)
+        self.circuit.record_success()
+        self._fail(2)
+        self.assertFalse(self.circuit.is_open())
+
+        self._fail(1)
+
+        self.assertTrue(self.circuit.is_open())
+        self.assertRaises(resilience.BlazarUnavailable,
+                          self.circuit.before_call)
+
+    def test_half_open_probe_closes(self, monotonic):
+        monotonic.return_value = 100
+        self._fail(3)
+        monotonic.return_value = 131
+
+        self.circuit.before_call()
+        # Only one call probes Blazar.
+        self.assertRaises(resilience.BlazarUnavailable,
+                          self.circuit.before_call)
+        self.circuit.record_success()
+
+        self.assertFalse(self.circuit.is_open())
+        self.circuit.before_call()
+
+    def test_half_open_probe_reopens(self, monotonic):
+        monotonic.return_value = 100
+        self._fail(3)
+        monotonic.return_value = 131
+
+        self._fail(1)
+
+        monotonic.return_value = 160
+        self.assertRaises(resilience.BlazarUnavailable,
+                          self.circuit.before_call)
+        monotonic.return_value = 162
+        self.circuit.before_call()
+
+    def test_disabled(self, monotonic):
+        monotonic.return_value = 100
+        self.circuit.failure_threshold = 0
+
+        self._fail(10)
+
+        self.circuit.before_call()
+
+
+class FakeBlazarServerTests(unittest.TestCase):
+    # Not a Horizon TestCase, which forbids real HTTP connections.
+
+    def setUp(self):
+        super(FakeBlazarServerTests, self).setUp()
+        self.dataset = synthetic.generate(20, 30, 40)
+        self.fake = fake_blazar.FakeBlazarServer(self.dataset).start()
+        self.addCleanup(self.fake.stop)
+        patcher = mock.patch.object(
+            client, 'blazarclient',
+            return_value=fake_blazar.make_client(self.fake.url))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        snapshot.store.clear()
+
+    def test_client_path(self):
+        request = http.HttpRequest()
+        request.user = mock.Mock(id='1', project_id='1')
+
+        leases = client.lease_list(request)
+        hosts, reservations, skipped = client.reservation_calendar(request)
+
+        self.assertEqual(30, len(leases))
+        self.assertEqual(
+            len([h for h in self.dataset.hosts if h['reservable']]),
+            len(hosts))
+        self.assertEqual({'hosts': 0, 'allocations': 0, 'reservations': 0},
+                         skipped)
+        self.assertEqual(1, self.fake.requests['GET /leases'])
+        self.assertEqual(1, self.fake.requests['GET /os-hosts/allocations'])
+
+    @mock.patch.object(resilience.time, 'sleep')
+    def test_client_session_guarded(self, sleep):
+        self.addCleanup(resilience.breaker.reset)
+        self.fake.error_rate = 1
+        sess = fake_blazar.make_client(
+            self.fake.url).lease.request_manager.session
+        blazar = adapter.Adapter(sess, service_type='reservation',
+                                 endpoint_override=self.fake.url)
+
+        resp = blazar.get('/leases', raise_exc=False)
+
+        self.assertEqual(500, resp.status_code)
+        self.assertEqual(1 + conf.resilience.get('retries', 2),
+                         self.fake.requests['GET /leases'])
+
+    def test_error_injection(self):
+        self.fake.error_rate = 1
+
+        resp = session.Session().get(self.fake.url + '/os-hosts',
+                                     raise_exc=False)
+
+        self.assertEqual(500, resp.status_code)
+
+    @mock.patch.object(resilience.time, 'sleep')
+    def test_guarded_client(self, sleep):
+        self.fake.error_rate = 1
+        circuit = resilience.CircuitBreaker(failure_threshold=3,
+                                            reset_timeout=30)
+        sess = session.Session()
+        sess.request = resilience.guarded(sess.request, circuit)
+        blazar = adapter.Adapter(sess, endpoint_override=self.fake.url)
+
+        resp = blazar.get('/leases', raise_exc=False)
+
+        self.assertEqual(500, resp.status_code)
+        self.assertRaises(resilience.BlazarUnavailable, blazar.get, '/leases')
+
+        self.assertEqual(3, self.fake.requests['GET /leases'])
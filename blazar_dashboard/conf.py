@@ -21,3 +21,33 @@ host_reservation = (
 floatingip_reservation = (
     getattr(settings, 'OPENSTACK_BLAZAR_FLOATINGIP_RESERVATION', {
         'enabled': False, }))
+
+metrics = (
+    getattr(settings, 'OPENSTACK_BLAZAR_METRICS', {
+        'enabled': False, }))
+
+profiling = (
+    getattr(settings, 'OPENSTACK_BLAZAR_PROFILING', {
+        'enabled': False, }))
+
+bulk_operations = (
+    getattr(settings, 'OPENSTACK_BLAZAR_BULK_OPERATIONS', {
+        'max_workers': 10,
+        'background_threshold': 100,
+        'job_ttl': 86400,
+        'max_batch_leases': 100, }))
+
+caching = (
+    getattr(settings, 'OPENSTACK_BLAZAR_CACHING', {
+        'inventory_ttl': 30,
+        'inventory_max_stale': 300,
+        'calendar_last_known_good_ttl': 86400, }))
+
+resilience = (
+    getattr(settings, 'OPENSTACK_BLAZAR_RESILIENCE', {
+        'connect_timeout': 5,
+        'read_timeout': 30,
+        'retries': 2,
+        'backoff': 0.2,
+        'failure_threshold': 5,
+        'reset_timeout': 30, }))
@@ -0,0 +1,87 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from functools import partial
+
+from django.template import defaultfilters as django_filters
+from django.utils.translation import gettext_lazy as _
+from horizon import tables
+from horizon.utils import filters
+
+# Statuses with a column of their own, the others are counted together.
+MAIN_STATUSES = ('PENDING', 'ACTIVE', 'TERMINATED', 'ERROR')
+
+
+def _project_name(summary):
+    return getattr(summary, 'project_name', None) or summary.project_id
+
+
+def _status_count(status):
+    def count(summary):
+        return summary.statuses.get(status, 0)
+    return count
+
+
+def _resource_type_count(resource_type):
+    def count(summary):
+        return summary.resource_types.get(resource_type, 0)
+    return count
+
+
+def _other_status_count(summary):
+    return sum(count for status, count in summary.statuses.items()
+               if status not in MAIN_STATUSES)
+
+
+class LeaseSummaryTable(tables.DataTable):
+    project = tables.Column(_project_name, verbose_name=_("Project"),
+                            link="horizon:admin:leases:project")
+    leases = tables.Column("leases", verbose_name=_("Leases"))
+    pending = tables.Column(_status_count('PENDING'),
+                            verbose_name=_("Pending"))
+    active = tables.Column(_status_count('ACTIVE'), verbose_name=_("Active"))
+    terminated = tables.Column(_status_count('TERMINATED'),
+                               verbose_name=_("Terminated"))
+    error = tables.Column(_status_count('ERROR'), verbose_name=_("Error"))
+    other = tables.Column(_other_status_count,
+                          verbose_name=_("Other Statuses"))
+    hosts = tables.Column(_resource_type_count('physical:host'),
+                          verbose_name=_("Host Leases"))
+    instances = tables.Column(_resource_type_count('virtual:instance'),
+                              verbose_name=_("Instance Leases"))
+    floatingips = tables.Column(_resource_type_count('virtual:floatingip'),
+                                verbose_name=_("Floating IP Leases"))
+
+    class Meta(object):
+        name = "lease_summaries"
+        verbose_name = _("Leases by Project")
+
+
+class ProjectLeasesTable(tables.DataTable):
+    name = tables.Column("name", verbose_name=_("Lease name"),
+                         link="horizon:project:leases:detail")
+    start_date = tables.Column("start_date", verbose_name=_("Start date"),
+                               filters=(filters.parse_isotime,
+                                        partial(django_filters.date,
+                                                arg='Y-m-d H:i T')),)
+    end_date = tables.Column("end_date", verbose_name=_("End date"),
+                             filters=(filters.parse_isotime,
+                                      partial(django_filters.date,
+                                              arg='Y-m-d H:i T')),)
+    status = tables.Column("status", verbose_name=_("Status"),)
+    degraded = tables.Column("degraded", verbose_name=_("Degraded"),
+                             filters=(django_filters.yesno,
+                                      django_filters.capfirst),)
+
+    class Meta(object):
+        name = "leases"
+        verbose_name = _("Leases")
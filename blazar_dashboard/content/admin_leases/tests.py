@@ -0,0 +1,87 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from unittest import mock
+
+from django.test.utils import override_settings
+from django.urls import reverse
+from openstack_dashboard import api
+
+from blazar_dashboard import api as blazar_api
+from blazar_dashboard.test import helpers as test
+
+INDEX_TEMPLATE = 'admin/leases/index.html'
+INDEX_URL = reverse('horizon:admin:leases:index')
+PROJECT_TEMPLATE = 'admin/leases/project.html'
+PROJECT_ID = 'aa45f56901ef45ee95e3d211097c0ea3'
+PROJECT_URL = reverse('horizon:admin:leases:project', args=[PROJECT_ID])
+
+
+class AdminLeasesTests(test.BaseAdminViewTests):
+    @mock.patch.object(api.keystone, 'tenant_list')
+    @mock.patch.object(blazar_api.client, 'lease_list')
+    def test_index(self, lease_list, tenant_list):
+        lease_list.return_value = self.leases.list()
+        project = mock.Mock(id=PROJECT_ID)
+        project.name = 'training'
+        tenant_list.return_value = ([project], False)
+
+        res = self.client.get(INDEX_URL)
+
+        lease_list.assert_called_once_with(test.IsHttpRequest())
+        self.assertTemplateUsed(res, INDEX_TEMPLATE)
+        self.assertNoMessages(res)
+        summaries = res.context['table'].data
+        self.assertEqual(1, len(summaries))
+        self.assertEqual(2, summaries[0].leases)
+        self.assertEqual({'physical:host': 2}, summaries[0].resource_types)
+        self.assertContains(res, 'training')
+        self.assertContains(res, PROJECT_URL)
+
+    @mock.patch.object(blazar_api.client, 'lease_list')
+    def test_index_error(self, lease_list):
+        lease_list.side_effect = self.exceptions.blazar
+
+        res = self.client.get(INDEX_URL)
+
+        self.assertTemplateUsed(res, INDEX_TEMPLATE)
+        self.assertMessageCount(res, error=1)
+
+    @override_settings(API_RESULT_PAGE_SIZE=1)
+    @mock.patch.object(blazar_api.client, 'lease_list')
+    def test_project_pagination(self, lease_list):
+        lease_list.return_value = self.leases.list()
+        first, second = sorted(self.leases.list(),
+                               key=lambda lease: (lease.start_date, lease.id),
+                               reverse=True)
+
+        res = self.client.get(PROJECT_URL)
+
+        self.assertTemplateUsed(res, PROJECT_TEMPLATE)
+        self.assertEqual([first.id],
+                         [lease.id for lease in res.context['table'].data])
+        self.assertTrue(res.context['table'].has_more_data())
+
+        res = self.client.get(PROJECT_URL, {'marker': first.id})
+
+        self.assertEqual([second.id],
+                         [lease.id for lease in res.context['table'].data])
+        self.assertFalse(res.context['table'].has_more_data())
+
+    @mock.patch.object(blazar_api.client, 'lease_list')
+    def test_project_other_project(self, lease_list):
+        lease_list.return_value = self.leases.list()
+
+        res = self.client.get(reverse('horizon:admin:leases:project',
+                                      args=['other']))
+
+        self.assertEqual([], res.context['table'].data)
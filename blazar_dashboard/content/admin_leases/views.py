@@ -0,0 +1,79 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from django.utils.translation import gettext_lazy as _
+from horizon import exceptions
+from horizon import tables
+from horizon.utils import functions as utils
+from openstack_dashboard import api
+
+from blazar_dashboard import api as blazar_api
+from blazar_dashboard.content.admin_leases import tables as admin_tables
+
+
+class IndexView(tables.DataTableView):
+    table_class = admin_tables.LeaseSummaryTable
+    template_name = 'admin/leases/index.html'
+
+    def get_data(self):
+        try:
+            summaries = blazar_api.client.lease_summary(self.request)
+        except Exception:
+            summaries = []
+            exceptions.handle(self.request,
+                              _('Unable to retrieve lease information.'))
+        if summaries:
+            try:
+                projects, has_more = api.keystone.tenant_list(self.request)
+            except Exception:
+                projects = []
+                exceptions.handle(self.request,
+                                  _('Unable to retrieve project list.'))
+            names = {p.id: p.name for p in projects}
+            for summary in summaries:
+                summary.project_name = names.get(summary.project_id)
+        return summaries
+
+
+class ProjectView(tables.DataTableView):
+    table_class = admin_tables.ProjectLeasesTable
+    template_name = 'admin/leases/project.html'
+    page_title = _("Leases of Project {{ project_id }}")
+
+    def has_more_data(self, table):
+        return self._more
+
+    def get_data(self):
+        project_id = self.kwargs['project_id']
+        marker = self.request.GET.get(
+            admin_tables.ProjectLeasesTable._meta.pagination_param)
+        try:
+            leases = [lease for lease in
+                      blazar_api.client.lease_list(self.request)
+                      if lease.project_id == project_id]
+        except Exception:
+            leases = []
+            exceptions.handle(self.request,
+                              _('Unable to retrieve lease information.'))
+        leases.sort(key=lambda lease: (lease.start_date, lease.id),
+                    reverse=True)
+        if marker:
+            ids = [lease.id for lease in leases]
+            leases = leases[ids.index(marker) + 1:] if marker in ids else []
+        page_size = utils.get_page_size(self.request)
+        self._more = len(leases) > page_size
+        return leases[:page_size]
+
+    def get_context_data(self, **kwargs):
+        context = super(ProjectView, self).get_context_data(**kwargs)
+        context['project_id'] = self.kwargs['project_id']
+        return context
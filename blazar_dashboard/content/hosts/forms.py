@@ -12,16 +12,22 @@
 
 import json
 import logging
+import re
 
 from django.utils.translation import gettext_lazy as _
+from django.utils.translation import ngettext
 from horizon import exceptions
 from horizon import forms
 from horizon import messages
 
 from blazar_dashboard import api
+from blazar_dashboard.api import jobs
+from blazar_dashboard import conf
 
 LOG = logging.getLogger(__name__)
 
+HOST_ID_RE = re.compile(r'^[\w-]+$')
+
 
 class UpdateForm(forms.SelfHandlingForm):
 
@@ -63,3 +69,83 @@ class UpdateForm(forms.SelfHandlingForm):
             )
 
         return cleaned_data
+
+
+class BulkUpdateForm(forms.SelfHandlingForm):
+
+    class Meta(object):
+        name = _('Update Hosts Parameters')
+
+    host_ids = forms.CharField(
+        label=_('Host IDs'), widget=forms.widgets.HiddenInput, required=True)
+    values = forms.CharField(
+        label=_("Values to Update"),
+        required=True,
+        help_text=_('Enter values to update in JSON. They are applied to '
+                    'every selected host.'),
+        widget=forms.Textarea(
+            attrs={'rows': 5}),
+        max_length=511)
+
+    def handle(self, request, data):
+        host_ids = data['host_ids']
+        values = data['values']
+
+        if len(host_ids) > conf.bulk_operations.get('background_threshold',
+                                                    100):
+            # The view redirects to the page of the job.
+            job_id = jobs.start(
+                request, 'host_update', host_ids,
+                lambda job_request, items, on_result:
+                    api.client.host_update_many(job_request, items, values,
+                                                on_result))
+            messages.info(request, _('Updating %d hosts in the background.')
+                          % len(host_ids))
+            return job_id
+
+        failed = _update_hosts(request, host_ids, values)
+        updated = len(host_ids) - len(failed)
+        if updated:
+            messages.success(request, ngettext(
+                '%d host was successfully updated.',
+                '%d hosts were successfully updated.', updated) % updated)
+        for host_id, e in failed:
+            messages.error(request, _('Unable to update host %(host)s: '
+                                      '%(error)s.') % {'host': host_id,
+                                                       'error': e})
+        return True
+
+    def clean(self):
+        cleaned_data = super(BulkUpdateForm, self).clean()
+
+        host_ids = [host_id for host_id in
+                    cleaned_data.get('host_ids', '').split(',') if host_id]
+        # Host IDs end up in URLs of the job page.
+        if not host_ids or not all(HOST_ID_RE.match(h) for h in host_ids):
+            raise forms.ValidationError(_('Invalid host IDs.'))
+        cleaned_data['host_ids'] = host_ids
+        if 'values' in self.errors:
+            return cleaned_data
+        try:
+            values = json.loads(cleaned_data['values'])
+        except (TypeError, ValueError):
+            raise forms.ValidationError(
+                _('Values must be written in JSON')
+            )
+        if not isinstance(values, dict):
+            raise forms.ValidationError(
+                _('Values must be a JSON object'))
+        cleaned_data['values'] = values
+
+        return cleaned_data
+
+
+def _update_hosts(request, host_ids, values):
+    """Update hosts concurrently and return the (host_id, error) failures."""
+    results = api.client.host_update_many(request, host_ids, values)
+    failed = [(host_id, e) for host_id, host, e in results if e]
+    for host_id, e in failed:
+        LOG.error('Error updating host %s: %s', host_id, e)
+    LOG.info('Updated %d of %d hosts', len(host_ids) - len(failed),
+             len(host_ids))
+    return failed
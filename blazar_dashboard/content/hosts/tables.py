@@ -10,11 +10,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from functools import partial
+from urllib import parse
+
+from django import shortcuts
 from django.template import defaultfilters as filters
+from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from django.utils.translation import ngettext_lazy
 from horizon import tables
 from horizon.templatetags import sizeformat
+from horizon.utils import filters as utils_filters
 
 from blazar_dashboard import api
 
@@ -34,6 +40,98 @@ class UpdateHost(tables.LinkAction):
     classes = ("btn-create", "ajax-modal")
 
 
+class BulkUpdateHosts(tables.Action):
+    name = "bulk_update"
+    verbose_name = _("Update Hosts")
+    verbose_name_plural = _("Update Hosts")
+    classes = ("btn-create",)
+    icon = "pencil"
+
+    def handle(self, data_table, request, object_ids):
+        url = reverse("horizon:admin:hosts:bulk_update")
+        query = parse.urlencode({'host_ids': ','.join(object_ids)})
+        return shortcuts.redirect('%s?%s' % (url, query))
+
+
+class _SetReservable(tables.BatchAction):
+    """Set the reservable flag of the selected hosts concurrently.
+
+    All hosts are updated at once before the per-host bookkeeping of
+    BatchAction, which then only reports the outcome of each update.
+    """
+    reservable = None
+
+    def handle(self, table, request, obj_ids):
+        self._errors = {
+            host_id: exception
+            for host_id, host, exception in api.client.host_update_many(
+                request, obj_ids, {'reservable': self.reservable})}
+        return super(_SetReservable, self).handle(table, request, obj_ids)
+
+    def action(self, request, host_id):
+        exception = self._errors.get(host_id)
+        if exception is not None:
+            raise exception
+
+
+class MarkReservable(_SetReservable):
+    name = "mark_reservable"
+    reservable = True
+
+    @staticmethod
+    def action_present(count):
+        return ngettext_lazy(
+            "Mark Host Reservable",
+            "Mark Hosts Reservable",
+            count
+        )
+
+    @staticmethod
+    def action_past(count):
+        return ngettext_lazy(
+            "Marked Host Reservable",
+            "Marked Hosts Reservable",
+            count
+        )
+
+
+class MarkNonReservable(_SetReservable):
+    name = "mark_non_reservable"
+    reservable = False
+
+    @staticmethod
+    def action_present(count):
+        return ngettext_lazy(
+            "Mark Host Non-reservable",
+            "Mark Hosts Non-reservable",
+            count
+        )
+
+    @staticmethod
+    def action_past(count):
+        return ngettext_lazy(
+            "Marked Host Non-reservable",
+            "Marked Hosts Non-reservable",
+            count
+        )
+
+
+class ViewUtilization(tables.LinkAction):
+    name = "utilization"
+    verbose_name = _("View Utilization")
+    url = "horizon:admin:hosts:utilization"
+    icon = "bar-chart"
+
+
+class ExportHosts(tables.LinkAction):
+    name = "export"
+    verbose_name = _("Export CSV")
+    icon = "download"
+
+    def get_link_url(self, datum=None):
+        return reverse("horizon:admin:hosts:export", args=['csv'])
+
+
 class DeleteHost(tables.DeleteAction):
     name = "delete"
     data_type_singular = _("Host")
@@ -75,5 +173,65 @@ class HostsTable(tables.DataTable):
     class Meta(object):
         name = "hosts"
         verbose_name = _("Hosts")
-        table_actions = (CreateHosts, DeleteHost,)
+        table_actions = (ViewUtilization, ExportHosts, CreateHosts,
+                         BulkUpdateHosts, MarkReservable, MarkNonReservable,
+                         DeleteHost,)
         row_actions = (UpdateHost, DeleteHost,)
+
+
+def _hours(seconds):
+    return '%.1f' % (seconds / 3600)
+
+
+def _percentage(fraction):
+    return '%.1f%%' % (fraction * 100)
+
+
+class UtilizationTable(tables.DataTable):
+    name = tables.Column("hypervisor_hostname", verbose_name=_("Host name"),
+                         link="horizon:admin:hosts:detail")
+    reservable = tables.Column("reservable", verbose_name=_("Reservable"),
+                               filters=(filters.yesno, filters.capfirst))
+    reserved_hours = tables.Column("reserved_seconds",
+                                   verbose_name=_("Reserved Hours"),
+                                   filters=(_hours,))
+    utilization = tables.Column("utilization", verbose_name=_("Utilization"),
+                                filters=(_percentage,))
+
+    class Meta(object):
+        name = "utilization"
+        verbose_name = _("Host Utilization")
+
+
+class HostReservationsTable(tables.DataTable):
+    lease_id = tables.Column(
+        "lease_id", verbose_name=_("Lease"),
+        link=lambda reservation: reverse("horizon:project:leases:detail",
+                                         args=[reservation['lease_id']]))
+    id = tables.Column("id", verbose_name=_("Reservation"))
+    start_date = tables.Column("start_date", verbose_name=_("Start date"),
+                               filters=(utils_filters.parse_isotime,
+                                        partial(filters.date,
+                                                arg='Y-m-d H:i T')))
+    end_date = tables.Column("end_date", verbose_name=_("End date"),
+                             filters=(utils_filters.parse_isotime,
+                                      partial(filters.date,
+                                              arg='Y-m-d H:i T')))
+
+    # Query string selecting the tab showing the table, if any, so that it
+    # stays selected when following the pagination link.
+    tab_query = None
+
+    def get_object_id(self, datum):
+        return datum['id']
+
+    def get_pagination_string(self):
+        pagination = super(HostReservationsTable,
+                           self).get_pagination_string()
+        if self.tab_query:
+            return '%s&%s' % (self.tab_query, pagination)
+        return pagination
+
+    class Meta(object):
+        name = "reservations"
+        verbose_name = _("Reservations")
@@ -13,12 +13,20 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from horizon import exceptions
 from horizon import tabs
+from horizon.utils import functions as utils
 
 from blazar_dashboard.api import client
+from blazar_dashboard.content.hosts import tables as project_tables
+
+# Reserved periods closer than this, in percent of the timeline, are drawn
+# as one segment.
+TIMELINE_RESOLUTION = 0.5
 
 
 class OverviewTab(tabs.Tab):
@@ -38,6 +46,92 @@ class OverviewTab(tabs.Tab):
         return {'host': host}
 
 
+class ReservationsTab(tabs.TableTab):
+    name = _("Reservations")
+    slug = "reservations"
+    table_classes = (project_tables.HostReservationsTable,)
+    template_name = "admin/hosts/_detail_reservations.html"
+    preload = False
+
+    def __init__(self, tab_group, request):
+        super(ReservationsTab, self).__init__(tab_group, request)
+        self._tables['reservations'].tab_query = self.get_query_string()
+        self._reservations = []
+        self._more = False
+
+    def get_reservations_data(self):
+        host_id = self.tab_group.kwargs['host_id']
+        try:
+            allocation = client.host_allocation_get(self.request, host_id)
+        except Exception:
+            exceptions.handle(self.request,
+                              _('Unable to retrieve host reservations.'))
+            return []
+        # Blazar dates are ISO 8601 strings, which sort chronologically.
+        self._reservations = sorted(
+            allocation.reservations,
+            key=lambda r: (r['start_date'], r['id']), reverse=True)
+
+        reservations = self._reservations
+        table = self._tables['reservations']
+        marker = self.request.GET.get(table._meta.pagination_param)
+        if marker:
+            ids = [r['id'] for r in reservations]
+            reservations = (reservations[ids.index(marker) + 1:]
+                            if marker in ids else [])
+        page_size = utils.get_page_size(self.request)
+        self._more = len(reservations) > page_size
+        return reservations[:page_size]
+
+    def has_more_data(self, table):
+        return self._more
+
+    def get_context_data(self, request, **kwargs):
+        context = super(ReservationsTab, self).get_context_data(request,
+                                                                **kwargs)
+        context['timeline'] = _timeline(self._reservations)
+        return context
+
+
+def _timeline(reservations):
+    """Lay out reserved periods on a timeline spanning all reservations.
+
+    Returns None without reservations. Otherwise returns a dictionary with
+    the first and last dates of the timeline, the position of the current
+    time, if within the timeline, and the reserved segments, as left and
+    width percentages.
+    """
+    if not reservations:
+        return None
+    parse = datetime.datetime.fromisoformat
+    intervals = sorted((parse(r['start_date']), parse(r['end_date']))
+                       for r in reservations)
+    start = intervals[0][0]
+    end = max(interval_end for interval_start, interval_end in intervals)
+    span = (end - start).total_seconds() or 1
+
+    def percent(date):
+        return (date - start).total_seconds() / span * 100
+
+    segments = []
+    for interval_start, interval_end in intervals:
+        left, right = percent(interval_start), percent(interval_end)
+        if segments and left <= segments[-1][1] + TIMELINE_RESOLUTION:
+            segments[-1][1] = max(segments[-1][1], right)
+        else:
+            segments.append([left, right])
+
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return {
+        'start': start,
+        'end': end,
+        'now': '%.2f' % percent(now) if start <= now <= end else None,
+        'segments': [
+            ('%.2f' % left, '%.2f' % max(right - left, TIMELINE_RESOLUTION))
+            for left, right in segments],
+    }
+
+
 class HostDetailTabs(tabs.TabGroup):
     slug = "host_details"
-    tabs = (OverviewTab,)
+    tabs = (OverviewTab, ReservationsTab)
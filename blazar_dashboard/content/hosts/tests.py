@@ -10,12 +10,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import csv
+import json
 from unittest import mock
 
+from django.test.utils import override_settings
 from django.urls import reverse
 from openstack_dashboard import api
 
 from blazar_dashboard import api as blazar_api
+from blazar_dashboard.api import jobs
+from blazar_dashboard.api import metrics
+from blazar_dashboard import conf
 from blazar_dashboard.test import helpers as test
 
 import logging
@@ -29,6 +35,12 @@ CREATE_URL = reverse('horizon:admin:hosts:create')
 CREATE_TEMPLATE = 'admin/hosts/create.html'
 UPDATE_URL_BASE = 'horizon:admin:hosts:update'
 UPDATE_TEMPLATE = 'admin/hosts/update.html'
+METRICS_URL = reverse('horizon:admin:hosts:metrics')
+BULK_UPDATE_URL = reverse('horizon:admin:hosts:bulk_update')
+BULK_UPDATE_TEMPLATE = 'admin/hosts/bulk_update.html'
+UTILIZATION_URL = reverse('horizon:admin:hosts:utilization')
+UTILIZATION_TEMPLATE = 'admin/hosts/utilization.html'
+JOB_TEMPLATE = 'admin/hosts/job.html'
 
 
 class HostsTests(test.BaseAdminViewTests):
@@ -219,3 +231,398 @@ class HostsTests(test.BaseAdminViewTests):
         host_delete.assert_called_once_with(test.IsHttpRequest(), host['id'])
         self.assertMessageCount(error=1)
         self.assertRedirectsNoFollow(res, INDEX_URL)
+
+    @mock.patch.dict(conf.metrics, {'enabled': True})
+    @mock.patch.object(blazar_api.client, 'blazarclient')
+    def test_metrics(self, blazarclient):
+        blazarclient.return_value.host.list.return_value = []
+        metrics.registry.reset()
+
+        self.client.get(INDEX_URL)
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(200, res.status_code)
+        self.assertContains(
+            res, 'blazar_dashboard_api_calls_total{function="host_list"} 1')
+        self.assertContains(
+            res, 'blazar_dashboard_api_result_items_bucket'
+                 '{function="host_list",le="1"} 1')
+
+    def test_metrics_disabled(self):
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(404, res.status_code)
+
+    @mock.patch.object(blazar_api.client, 'host_list')
+    def test_bulk_update_action(self, host_list):
+        host_list.return_value = self.hosts.list()
+        form_data = {'action': 'hosts__bulk_update',
+                     'object_ids': ['1', '2']}
+
+        res = self.client.post(INDEX_URL, form_data)
+
+        self.assertRedirectsNoFollow(res, BULK_UPDATE_URL + '?host_ids=1%2C2')
+
+    def test_bulk_update_form(self):
+        res = self.client.get(BULK_UPDATE_URL, {'host_ids': '1,2'})
+
+        self.assertTemplateUsed(res, BULK_UPDATE_TEMPLATE)
+        self.assertContains(res, 'the 2 selected hosts')
+
+    @mock.patch.object(blazar_api.client, 'host_update')
+    def test_bulk_update_hosts(self, host_update):
+        form_data = {
+            'host_ids': '1,2',
+            'values': '{"key": "updated"}'
+        }
+
+        res = self.client.post(BULK_UPDATE_URL, form_data)
+
+        host_update.assert_has_calls([
+            mock.call(test.IsHttpRequest(), '1', {"key": "updated"},
+                      invalidate=False),
+            mock.call(test.IsHttpRequest(), '2', {"key": "updated"},
+                      invalidate=False)],
+            any_order=True)
+        self.assertNoFormErrors(res)
+        self.assertMessageCount(success=1)
+        self.assertRedirectsNoFollow(res, INDEX_URL)
+
+    @mock.patch.object(blazar_api.client, 'host_update')
+    def test_bulk_update_hosts_partial_failure(self, host_update):
+        form_data = {
+            'host_ids': '1,2',
+            'values': '{"key": "updated"}'
+        }
+
+        def update(request, host_id, values, invalidate=True):
+            if host_id == '2':
+                raise self.exceptions.blazar
+
+        host_update.side_effect = update
+
+        res = self.client.post(BULK_UPDATE_URL, form_data)
+
+        self.assertEqual(2, host_update.call_count)
+        self.assertNoFormErrors(res)
+        self.assertMessageCount(success=1, error=1)
+        self.assertRedirectsNoFollow(res, INDEX_URL)
+
+    @mock.patch.object(blazar_api.client, 'host_update')
+    def test_bulk_update_hosts_invalid_json(self, host_update):
+        form_data = {
+            'host_ids': '1,2',
+            'values': '{"key": '
+        }
+
+        res = self.client.post(BULK_UPDATE_URL, form_data)
+
+        host_update.assert_not_called()
+        self.assertContains(res, 'Values must be written in JSON')
+
+    @mock.patch.object(blazar_api.client, 'host_update')
+    def test_bulk_update_hosts_no_values(self, host_update):
+        form_data = {
+            'host_ids': '1,2',
+            'values': ''
+        }
+
+        res = self.client.post(BULK_UPDATE_URL, form_data)
+
+        host_update.assert_not_called()
+        self.assertContains(res, 'This field is required.')
+
+    @mock.patch.object(blazar_api.client, 'host_update')
+    def test_bulk_update_hosts_values_not_object(self, host_update):
+        form_data = {
+            'host_ids': '1,2',
+            'values': '[1, 2]'
+        }
+
+        res = self.client.post(BULK_UPDATE_URL, form_data)
+
+        host_update.assert_not_called()
+        self.assertContains(res, 'Values must be a JSON object')
+
+    @mock.patch.object(blazar_api.client, 'host_update')
+    def test_bulk_update_hosts_invalid_host_ids(self, host_update):
+        form_data = {
+            'host_ids': '1,2/update',
+            'values': '{"key": "updated"}'
+        }
+
+        res = self.client.post(BULK_UPDATE_URL, form_data)
+
+        host_update.assert_not_called()
+        self.assertContains(res, 'Invalid host IDs.')
+
+    @mock.patch.dict(conf.bulk_operations, {'background_threshold': 1})
+    @mock.patch.object(blazar_api.client, 'host_update')
+    def test_bulk_update_hosts_background(self, host_update):
+        form_data = {
+            'host_ids': '1,2',
+            'values': '{"key": "updated"}'
+        }
+
+        def update(request, host_id, values, invalidate=True):
+            if host_id == '2':
+                raise self.exceptions.blazar
+
+        host_update.side_effect = update
+
+        with mock.patch.object(jobs.threading, 'Thread') as thread:
+            res = self.client.post(BULK_UPDATE_URL, form_data)
+
+        host_update.assert_not_called()
+        job_request = thread.call_args[1]['args'][1]
+        self.assertIsInstance(job_request, jobs.JobRequest)
+        job_url = res['Location']
+        self.assertMessageCount(info=1)
+        res = self.client.get(job_url)
+        self.assertTemplateUsed(res, JOB_TEMPLATE)
+        self.assertContains(res, '0 of 2 done')
+        self.assertContains(res, 'window.location.reload')
+
+        # Run the job thread.
+        thread.call_args[1]['target'](*thread.call_args[1]['args'])
+
+        host_update.assert_has_calls([
+            mock.call(job_request, '1', {"key": "updated"},
+                      invalidate=False),
+            mock.call(job_request, '2', {"key": "updated"},
+                      invalidate=False)],
+            any_order=True)
+        res = self.client.get(job_url)
+        self.assertContains(res, '1 of 2 hosts were successfully updated')
+        self.assertContains(res, 'Expected failure')
+        self.assertNotContains(res, 'window.location.reload')
+
+    def test_job_not_found(self):
+        res = self.client.get(reverse('horizon:admin:hosts:job',
+                                      args=['0' * 32]))
+
+        self.assertEqual(404, res.status_code)
+
+    @mock.patch.object(blazar_api.client, 'host_update')
+    @mock.patch.object(blazar_api.client, 'host_list')
+    def test_mark_non_reservable(self, host_list, host_update):
+        host_list.return_value = self.hosts.list()
+        form_data = {'action': 'hosts__mark_non_reservable',
+                     'object_ids': ['1', '2']}
+
+        res = self.client.post(INDEX_URL, form_data)
+
+        host_update.assert_has_calls([
+            mock.call(test.IsHttpRequest(), '1', {'reservable': False},
+                      invalidate=False),
+            mock.call(test.IsHttpRequest(), '2', {'reservable': False},
+                      invalidate=False)],
+            any_order=True)
+        self.assertMessageCount(success=1)
+        self.assertRedirectsNoFollow(res, INDEX_URL)
+
+    @mock.patch.object(blazar_api.client, 'host_update')
+    @mock.patch.object(blazar_api.client, 'host_list')
+    def test_mark_reservable_partial_failure(self, host_list, host_update):
+        host_list.return_value = self.hosts.list()
+        form_data = {'action': 'hosts__mark_reservable',
+                     'object_ids': ['1', '2']}
+
+        def update(request, host_id, values, invalidate=True):
+            if host_id == '1':
+                raise self.exceptions.blazar
+
+        host_update.side_effect = update
+
+        res = self.client.post(INDEX_URL, form_data)
+
+        self.assertEqual(2, host_update.call_count)
+        self.assertMessageCount(info=1, error=1)
+        self.assertRedirectsNoFollow(res, INDEX_URL)
+
+    def _utilization(self):
+        return [blazar_api.client.HostUtilization({
+            'id': '1',
+            'hypervisor_hostname': 'compute-1',
+            'reservable': True,
+            'reserved_seconds': 36000.0,
+            'utilization': 0.5,
+        })]
+
+    @mock.patch.object(blazar_api.client, 'host_utilization')
+    def test_utilization(self, host_utilization):
+        host_utilization.return_value = self._utilization()
+
+        res = self.client.get(UTILIZATION_URL, {'days': 7})
+
+        host_utilization.assert_called_once_with(
+            test.IsHttpRequest(), mock.ANY, mock.ANY)
+        start, end = host_utilization.call_args[0][1:]
+        self.assertEqual(7, (end - start).days)
+        self.assertTemplateUsed(res, UTILIZATION_TEMPLATE)
+        self.assertContains(res, '10.0')
+        self.assertContains(res, '50.0%')
+
+    def test_utilization_invalid_days(self):
+        res = self.client.get(UTILIZATION_URL, {'days': 'many'})
+
+        self.assertEqual(404, res.status_code)
+
+    @mock.patch.object(blazar_api.client, 'host_utilization')
+    def test_utilization_export_csv(self, host_utilization):
+        host_utilization.return_value = self._utilization()
+
+        res = self.client.get(reverse('horizon:admin:hosts:utilization_export',
+                                      args=['csv']))
+
+        self.assertEqual('text/csv', res['Content-Type'])
+        self.assertEqual(
+            'id,hypervisor_hostname,reservable,reserved_seconds,'
+            'utilization\r\n1,compute-1,True,36000.0,0.5\r\n',
+            b''.join(res.streaming_content).decode())
+
+    @mock.patch.object(blazar_api.client, 'host_utilization')
+    def test_utilization_export_json(self, host_utilization):
+        host_utilization.return_value = self._utilization()
+
+        res = self.client.get(reverse('horizon:admin:hosts:utilization_export',
+                                      args=['json']), {'days': 90})
+
+        data = res.json()
+        self.assertEqual(['end', 'hosts', 'start'], sorted(data))
+        self.assertEqual(0.5, data['hosts'][0]['utilization'])
+
+    @mock.patch.object(blazar_api.client, 'host_utilization')
+    def test_utilization_export_error(self, host_utilization):
+        host_utilization.side_effect = self.exceptions.blazar
+
+        res = self.client.get(reverse('horizon:admin:hosts:utilization_export',
+                                      args=['csv']))
+
+        self.assertMessageCount(error=1)
+        self.assertRedirectsNoFollow(
+            res, reverse('horizon:admin:hosts:utilization'))
+
+    @mock.patch.object(blazar_api.client, 'host_list')
+    def test_export_ndjson(self, host_list):
+        host_list.return_value = self.hosts.list()
+
+        res = self.client.get(reverse('horizon:admin:hosts:export',
+                                      args=['ndjson']))
+
+        self.assertTrue(res.streaming)
+        self.assertEqual('application/x-ndjson', res['Content-Type'])
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(['compute-1', 'compute-2'],
+                         [json.loads(line)['hypervisor_hostname']
+                          for line in lines])
+
+    @mock.patch.object(blazar_api.client, 'host_list')
+    def test_export_csv(self, host_list):
+        host_list.return_value = self.hosts.list()
+
+        res = self.client.get(reverse('horizon:admin:hosts:export',
+                                      args=['csv']))
+
+        rows = list(csv.DictReader(
+            b''.join(res.streaming_content).decode().splitlines()))
+        self.assertEqual(2, len(rows))
+        self.assertEqual('compute-1', rows[0]['hypervisor_hostname'])
+        self.assertEqual(self.hosts.first().extra_capabilities(),
+                         json.loads(rows[0]['extra_capabilities']))
+
+    @mock.patch.object(blazar_api.client, 'host_allocations_list')
+    def test_export_allocations_csv(self, host_allocations_list):
+        host_allocations_list.return_value = self.allocations.list()
+
+        res = self.client.get(reverse('horizon:admin:hosts:export_allocations',
+                                      args=['csv']))
+
+        self.assertEqual('attachment; filename="host-allocations.csv"',
+                         res['Content-Disposition'])
+        rows = list(csv.DictReader(
+            b''.join(res.streaming_content).decode().splitlines()))
+        self.assertEqual(['1', '2'], [row['resource_id'] for row in rows])
+        self.assertEqual('2030-06-27T18:00:00.000000', rows[0]['start_date'])
+
+    @mock.patch.object(blazar_api.client, 'host_allocations_list')
+    def test_export_allocations_malformed(self, host_allocations_list):
+        allocations = self.allocations.list()
+        host_allocations_list.return_value = [
+            blazar_api.client.Allocation({'resource_id': '3',
+                                          'reservations': None}),
+            blazar_api.client.Allocation({'resource_id': '4',
+                                          'reservations': [{}]}),
+            blazar_api.client.Allocation(dict(
+                allocations[0].to_dict(),
+                reservations=[{'id': 'reservation-1'}]))]
+
+        res = self.client.get(reverse('horizon:admin:hosts:export_allocations',
+                                      args=['csv']))
+
+        rows = list(csv.DictReader(
+            b''.join(res.streaming_content).decode().splitlines()))
+        self.assertEqual(['reservation-1'],
+                         [row['reservation_id'] for row in rows])
+
+    @mock.patch.object(blazar_api.client, 'host_allocations_list')
+    def test_export_allocations_error(self, host_allocations_list):
+        host_allocations_list.side_effect = self.exceptions.blazar
+
+        res = self.client.get(reverse('horizon:admin:hosts:export_allocations',
+                                      args=['csv']))
+
+        self.assertMessageCount(error=1)
+        self.assertRedirectsNoFollow(res, INDEX_URL)
+
+    def _host_allocation(self):
+        return blazar_api.client.Allocation({
+            'resource_id': '1',
+            'reservations': [{
+                'id': 'reservation-%d' % day,
+                'lease_id': 'lease-%d' % day,
+                'start_date': '2030-06-%02dT00:00:00.000000' % day,
+                'end_date': '2030-06-%02dT12:00:00.000000' % day,
+            } for day in (2, 1, 3)]})
+
+    @override_settings(API_RESULT_PAGE_SIZE=2)
+    @mock.patch.object(blazar_api.client, 'host_allocation_get')
+    @mock.patch.object(blazar_api.client, 'host_get')
+    def test_host_detail_reservations(self, host_get, host_allocation_get):
+        host_get.return_value = self.hosts.get(hypervisor_hostname='compute-1')
+        host_allocation_get.return_value = self._host_allocation()
+        url = reverse(DETAIL_URL_BASE, args=['1'])
+
+        res = self.client.get(url, {'tab': 'host_details__reservations'},
+                              HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        host_allocation_get.assert_called_once_with(test.IsHttpRequest(),
+                                                    '1')
+        table = res.context['reservations_table']
+        self.assertEqual(['reservation-3', 'reservation-2'],
+                         [r['id'] for r in table.data])
+        self.assertTrue(table.has_more_data())
+        self.assertEqual('tab=host_details__reservations&marker=reservation-2',
+                         table.get_pagination_string())
+        timeline = res.context['timeline']
+        self.assertEqual(3, len(timeline['segments']))
+        self.assertEqual('0.00', timeline['segments'][0][0])
+
+        res = self.client.get(url, {'tab': 'host_details__reservations',
+                                    'marker': 'reservation-2'})
+
+        self.assertTemplateUsed(res, DETAIL_TEMPLATE)
+        table = res.context['reservations_table']
+        self.assertEqual(['reservation-1'], [r['id'] for r in table.data])
+        self.assertFalse(table.has_more_data())
+
+    @mock.patch.object(blazar_api.client, 'host_allocation_get')
+    @mock.patch.object(blazar_api.client, 'host_get')
+    def test_host_detail_reservations_lazy(self, host_get,
+                                           host_allocation_get):
+        host_get.return_value = self.hosts.get(hypervisor_hostname='compute-1')
+
+        res = self.client.get(reverse(DETAIL_URL_BASE, args=['1']))
+
+        self.assertTemplateUsed(res, DETAIL_TEMPLATE)
+        host_allocation_get.assert_not_called()
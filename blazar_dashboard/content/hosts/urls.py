@@ -13,13 +13,29 @@
 from django.urls import re_path
 
 from blazar_dashboard.content.hosts import views
+from blazar_dashboard import profiling
 
 
 urlpatterns = [
     re_path(r'^$', views.IndexView.as_view(), name='index'),
     re_path(r'^create/$', views.CreateView.as_view(), name='create'),
+    re_path(r'^metrics$', views.metrics_view, name='metrics'),
+    re_path(r'^export\.(?P<export_format>csv|ndjson)$', views.export_view,
+            name='export'),
+    re_path(r'^allocations\.(?P<export_format>csv|ndjson)$',
+            views.export_allocations_view, name='export_allocations'),
+    re_path(r'^utilization/$', views.UtilizationView.as_view(),
+            name='utilization'),
+    re_path(r'^utilization\.(?P<export_format>json|csv)$',
+            views.utilization_export_view, name='utilization_export'),
+    re_path(r'^bulk_update$', views.BulkUpdateView.as_view(),
+            name='bulk_update'),
+    re_path(r'^jobs/(?P<job_id>[0-9a-f]{32})/$', views.JobView.as_view(),
+            name='job'),
     re_path(r'^(?P<host_id>[^/]+)/$', views.DetailView.as_view(),
             name='detail'),
     re_path(r'^(?P<host_id>[^/]+)/update$', views.UpdateView.as_view(),
             name='update'),
 ]
+
+profiling.profile_urlpatterns(urlpatterns)
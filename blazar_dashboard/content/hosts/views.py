@@ -10,6 +10,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+import logging
+
+from django.http import HttpResponse
+from django.http import JsonResponse
+from django.urls import reverse
 from django.urls import reverse_lazy
 from django.utils.translation import gettext_lazy as _
 from horizon import exceptions
@@ -17,13 +23,20 @@ from horizon import forms
 from horizon import tables
 from horizon import tabs
 from horizon.utils import memoized
+from horizon import views
 from horizon import workflows
 
 from blazar_dashboard import api
+from blazar_dashboard.api import jobs
+from blazar_dashboard.api import metrics
+from blazar_dashboard import conf
 from blazar_dashboard.content.hosts import forms as project_forms
 from blazar_dashboard.content.hosts import tables as project_tables
 from blazar_dashboard.content.hosts import tabs as project_tabs
 from blazar_dashboard.content.hosts import workflows as project_workflows
+from blazar_dashboard import export
+
+LOG = logging.getLogger(__name__)
 
 
 class IndexView(tables.DataTableView):
@@ -40,6 +53,176 @@ class IndexView(tables.DataTableView):
         return hosts
 
 
+class BulkUpdateView(forms.ModalFormView):
+    form_class = project_forms.BulkUpdateForm
+    template_name = 'admin/hosts/bulk_update.html'
+    success_url = reverse_lazy('horizon:admin:hosts:index')
+    modal_header = _("Update Hosts")
+
+    def get_initial(self):
+        initial = super(BulkUpdateView, self).get_initial()
+        initial['host_ids'] = self.request.GET.get('host_ids', '')
+        return initial
+
+    def get_context_data(self, **kwargs):
+        context = super(BulkUpdateView, self).get_context_data(**kwargs)
+        host_ids = (self.request.POST.get('host_ids') or
+                    self.request.GET.get('host_ids', ''))
+        context['host_count'] = len([h for h in host_ids.split(',') if h])
+        return context
+
+    def get_success_url_from_handled(self, handled):
+        # Updates run in the background return the id of their job.
+        if handled is True:
+            return self.get_success_url()
+        return reverse('horizon:admin:hosts:job', args=[handled])
+
+
+class JobView(views.HorizonTemplateView):
+    template_name = 'admin/hosts/job.html'
+    page_title = _("Host Update")
+
+    def get_context_data(self, **kwargs):
+        context = super(JobView, self).get_context_data(**kwargs)
+        job = jobs.get(self.request, kwargs['job_id'])
+        if job is None:
+            raise exceptions.NotFound
+        context['job'] = job
+        context['running'] = job.status == jobs.RUNNING
+        return context
+
+
+# Report windows offered on the utilization page, in days.
+UTILIZATION_DAYS = (7, 30, 90, 365)
+UTILIZATION_FIELDS = ('id', 'hypervisor_hostname', 'reservable',
+                      'reserved_seconds', 'utilization')
+
+
+def _utilization_window(request):
+    """Return the days, start and end of the requested report window."""
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        raise exceptions.NotFound
+    if not 0 < days <= 366:
+        raise exceptions.NotFound
+    end = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return days, end - datetime.timedelta(days=days), end
+
+
+class UtilizationView(tables.DataTableView):
+    table_class = project_tables.UtilizationTable
+    template_name = 'admin/hosts/utilization.html'
+    page_title = _("Host Utilization")
+
+    def get_data(self):
+        days, start, end = _utilization_window(self.request)
+        try:
+            utilization = api.client.host_utilization(self.request, start,
+                                                      end)
+        except Exception:
+            utilization = []
+            msg = _('Unable to retrieve host utilization.')
+            exceptions.handle(self.request, msg)
+        return utilization
+
+    def get_context_data(self, **kwargs):
+        context = super(UtilizationView, self).get_context_data(**kwargs)
+        context['days'], context['start'], context['end'] = (
+            _utilization_window(self.request))
+        context['day_choices'] = UTILIZATION_DAYS
+        return context
+
+
+def utilization_export_view(request, export_format):
+    """Export the host utilization report as JSON or CSV."""
+    days, start, end = _utilization_window(request)
+    try:
+        utilization = api.client.host_utilization(request, start, end)
+    except Exception:
+        exceptions.handle(request, _('Unable to export host utilization.'),
+                          redirect=reverse('horizon:admin:hosts:utilization'))
+    if export_format == 'json':
+        return JsonResponse({
+            'start': start,
+            'end': end,
+            'hosts': [u.to_dict() for u in utilization],
+        })
+    return export.stream((u.to_dict() for u in utilization),
+                         UTILIZATION_FIELDS, export_format,
+                         'host-utilization-%dd' % days)
+
+
+HOST_EXPORT_FIELDS = api.client.Host._attrs + ['extra_capabilities']
+ALLOCATION_EXPORT_FIELDS = ('resource_id', 'reservation_id', 'lease_id',
+                            'start_date', 'end_date')
+
+
+def export_view(request, export_format):
+    """Stream all hosts as CSV or NDJSON."""
+    try:
+        hosts = api.client.host_list(request)
+    except Exception:
+        exceptions.handle(request, _('Unable to export hosts.'),
+                          redirect=reverse('horizon:admin:hosts:index'))
+    if export_format == 'csv':
+        rows = (dict(h.to_dict(), extra_capabilities=h.extra_capabilities())
+                for h in hosts)
+    else:
+        rows = (h.to_dict() for h in hosts)
+    return export.stream(rows, HOST_EXPORT_FIELDS, export_format, 'hosts')
+
+
+def _allocation_rows(allocations):
+    """Yield one row per reservation of each allocation.
+
+    Malformed allocations and reservations are skipped, as a response
+    already being streamed cannot report an error.
+    """
+    skipped = 0
+    for allocation in allocations:
+        allocation = allocation.to_dict()
+        reservations = allocation.get('reservations')
+        if not isinstance(reservations, list):
+            skipped += 1
+            continue
+        for reservation in reservations:
+            if not isinstance(reservation, dict) or 'id' not in reservation:
+                skipped += 1
+                continue
+            yield {
+                'resource_id': allocation.get('resource_id'),
+                'reservation_id': reservation['id'],
+                'lease_id': reservation.get('lease_id'),
+                'start_date': reservation.get('start_date'),
+                'end_date': reservation.get('end_date'),
+            }
+    if skipped:
+        LOG.warning('Exported host allocations without %d malformed '
+                    'entries', skipped)
+
+
+def export_allocations_view(request, export_format):
+    """Stream one row per host allocation as CSV or NDJSON."""
+    try:
+        allocations = api.client.host_allocations_list(request)
+    except Exception:
+        exceptions.handle(request, _('Unable to export host allocations.'),
+                          redirect=reverse('horizon:admin:hosts:index'))
+    return export.stream(_allocation_rows(allocations),
+                         ALLOCATION_EXPORT_FIELDS, export_format,
+                         'host-allocations')
+
+
+def metrics_view(request):
+    """Expose Blazar API call metrics in the Prometheus text format."""
+    if not conf.metrics.get('enabled'):
+        raise exceptions.NotFound
+    return HttpResponse(metrics.registry.render(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
+
+
 class DetailView(tabs.TabView):
     tab_group_class = project_tabs.HostDetailTabs
     template_name = 'admin/hosts/detail.html'
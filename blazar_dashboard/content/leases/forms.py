@@ -13,21 +13,27 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import csv
 import datetime
+import io
 import json
 import logging
 import re
 from zoneinfo import ZoneInfo
 
 from django.utils.translation import gettext_lazy as _
+from django.utils.translation import ngettext
 from horizon import exceptions
 from horizon import forms
 from horizon import messages
 
 from blazar_dashboard import api
+from blazar_dashboard import conf
 
 LOG = logging.getLogger(__name__)
 
+OFFSET_UNITS = {'d': 'days', 'h': 'hours', 'm': 'minutes'}
+
 
 class CreateForm(forms.SelfHandlingForm):
     # General fields
@@ -170,30 +176,7 @@ class CreateForm(forms.SelfHandlingForm):
     )
 
     def handle(self, request, data):
-        if data['resource_type'] == 'host':
-            reservations = [
-                {
-                    'resource_type': 'physical:host',
-                    'min': data['min_hosts'],
-                    'max': data['max_hosts'],
-                    'hypervisor_properties': (data['hypervisor_properties'] or
-                                              ''),
-                    'resource_properties': data['resource_properties'] or ''
-                }
-            ]
-        elif data['resource_type'] == 'instance':
-            reservations = [
-                {
-                    'resource_type': 'virtual:instance',
-                    'amount': data['amount'],
-                    'vcpus': data['vcpus'],
-                    'memory_mb': data['memory_mb'],
-                    'disk_gb': data['disk_gb'],
-                    'affinity': data['affinity'],
-                    'resource_properties': data['resource_properties'] or ''
-                }
-            ]
-
+        reservations = _reservations(data)
         events = []
 
         try:
@@ -234,6 +217,135 @@ class CreateForm(forms.SelfHandlingForm):
                                         datetime.timedelta(days=1))
 
 
+def _reservations(data):
+    """Build the reservation spec of a lease from create form data."""
+    if data['resource_type'] == 'host':
+        reservations = [
+            {
+                'resource_type': 'physical:host',
+                'min': data['min_hosts'],
+                'max': data['max_hosts'],
+                'hypervisor_properties': data['hypervisor_properties'] or '',
+                'resource_properties': data['resource_properties'] or ''
+            }
+        ]
+    elif data['resource_type'] == 'instance':
+        reservations = [
+            {
+                'resource_type': 'virtual:instance',
+                'amount': data['amount'],
+                'vcpus': data['vcpus'],
+                'memory_mb': data['memory_mb'],
+                'disk_gb': data['disk_gb'],
+                'affinity': data['affinity'],
+                'resource_properties': data['resource_properties'] or ''
+            }
+        ]
+    return reservations
+
+
+class BatchCreateForm(CreateForm):
+    count = forms.IntegerField(
+        label=_('Number of Leases'),
+        required=False,
+        help_text=_('Create this many leases named after the lease name, '
+                    'e.g. training-1, training-2, ...'),
+        min_value=1,
+        max_value=conf.bulk_operations.get('max_batch_leases', 100))
+    leases = forms.CharField(
+        label=_('Leases'),
+        required=False,
+        help_text=_('Or enter one lease per line as "name,start offset". '
+                    'The offset is relative to the start date, with a d/h/m '
+                    'suffix (e.g. +2h), and every lease keeps the duration '
+                    'between the start and end dates.'),
+        widget=forms.Textarea(attrs={
+            'rows': 6,
+            'placeholder': 'e.g.\n'
+                           'training-alice,+0h\n'
+                           'training-bob,+2h'}))
+
+    def __init__(self, request, *args, **kwargs):
+        super(BatchCreateForm, self).__init__(request, *args, **kwargs)
+        self.fields['name'].required = False
+
+    def handle(self, request, data):
+        reservations = _reservations(data)
+        leases = [(name, start.strftime('%Y-%m-%d %H:%M'),
+                   end.strftime('%Y-%m-%d %H:%M'))
+                  for name, start, end in data['batch']]
+        results = api.client.lease_create_many(request, leases,
+                                               reservations, [])
+
+        failed = [(lease[0], e) for lease, created, e in results if e]
+        for name, e in failed:
+            LOG.error('Error submitting lease %s: %s', name, e)
+        created = len(results) - len(failed)
+        if created:
+            messages.success(request, ngettext(
+                'Created %(created)d of %(total)d lease.',
+                'Created %(created)d of %(total)d leases.',
+                len(results)) % {'created': created, 'total': len(results)})
+        if failed:
+            messages.error(request, _('Unable to create leases: %s.') %
+                           '; '.join('%s (%s)' % f for f in failed))
+        return bool(created)
+
+    def clean(self):
+        super(BatchCreateForm, self).clean()
+        cleaned_data = self.cleaned_data
+        count = cleaned_data.get('count')
+        rows = cleaned_data.get('leases')
+        if bool(count) == bool(rows):
+            raise forms.ValidationError(
+                _('Enter either a number of leases or a list of leases.'))
+
+        # A blank start date defaults to a naive now, while dates entered
+        # in the form are aware.
+        start, end = (
+            date if date.tzinfo else date.replace(tzinfo=datetime.timezone.utc)
+            for date in (cleaned_data['start_date'], cleaned_data['end_date']))
+        duration = end - start
+        if count:
+            if not cleaned_data.get('name'):
+                raise forms.ValidationError(
+                    _('A lease name is required to number the leases.'))
+            starts = [('%s-%d' % (cleaned_data['name'], i), start)
+                      for i in range(1, count + 1)]
+        else:
+            starts = self._parse_leases(rows, start)
+
+        cleaned_data['batch'] = [(name, lease_start, lease_start + duration)
+                                 for name, lease_start in starts]
+        return cleaned_data
+
+    def _parse_leases(self, rows, start):
+        limit = self.fields['count'].max_value
+        starts = []
+        names = set()
+        for number, row in enumerate(csv.reader(io.StringIO(rows)), 1):
+            if not row:
+                continue
+            if len(starts) == limit:
+                raise forms.ValidationError(
+                    _('At most %d leases can be created at once.') % limit)
+            row = [column.strip() for column in row]
+            match = (len(row) == 2 and row[0] and
+                     re.match(r'^\+?(\d+)([dhm])$', row[1]))
+            if not match:
+                raise forms.ValidationError(
+                    _('Line %d must be "name,start offset", e.g. '
+                      '"training-1,+2h".') % number)
+            if row[0] in names:
+                raise forms.ValidationError(
+                    _('Lease name %s is used more than once.') % row[0])
+            names.add(row[0])
+            offset = datetime.timedelta(
+                **{OFFSET_UNITS[match.group(2)]: int(match.group(1))})
+            starts.append((row[0], start + offset))
+        return starts
+
+
 class UpdateForm(forms.SelfHandlingForm):
 
     class Meta(object):
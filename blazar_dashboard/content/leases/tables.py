@@ -19,9 +19,11 @@ from datetime import timezone
 from functools import partial
 
 from django.template import defaultfilters as django_filters
+from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from django.utils.translation import ngettext_lazy
 from horizon import tables
+from horizon.templatetags import sizeformat
 from horizon.utils import filters
 
 from blazar_dashboard import api
@@ -36,6 +38,23 @@ class CreateLease(tables.LinkAction):
     icon = "plus"
 
 
+class CreateLeasesBatch(tables.LinkAction):
+    name = "create_batch"
+    verbose_name = _("Create Leases in Batch")
+    url = "horizon:project:leases:create_batch"
+    classes = ("ajax-modal",)
+    icon = "plus"
+
+
+class ExportLeases(tables.LinkAction):
+    name = "export"
+    verbose_name = _("Export CSV")
+    icon = "download"
+
+    def get_link_url(self, datum=None):
+        return reverse("horizon:project:leases:export", args=['csv'])
+
+
 class UpdateLease(tables.LinkAction):
     name = "update"
     verbose_name = _("Update Lease")
@@ -43,10 +62,10 @@ class UpdateLease(tables.LinkAction):
     classes = ("btn-create", "ajax-modal")
 
     def allowed(self, request, lease):
-        if datetime.datetime.strptime(lease.end_date, '%Y-%m-%dT%H:%M:%S.%f').\
-                replace(tzinfo=timezone.utc) > datetime.now(timezone.utc):
-            return True
-        return False
+        end_date = datetime.datetime.strptime(
+            lease.end_date, '%Y-%m-%dT%H:%M:%S.%f')
+        end_date = end_date.replace(tzinfo=timezone.utc)
+        return end_date > datetime.datetime.now(timezone.utc)
 
 
 class ViewHostReservationCalendar(tables.LinkAction):
@@ -102,7 +121,27 @@ class LeasesTable(tables.DataTable):
     class Meta(object):
         name = "leases"
         verbose_name = _("Leases")
-        table_actions = [CreateLease, DeleteLease, ]
+        table_actions = [CreateLease, CreateLeasesBatch, ExportLeases,
+                         DeleteLease, ]
         if conf.host_reservation.get('enabled'):
             table_actions.insert(0, ViewHostReservationCalendar)
         row_actions = (UpdateLease, DeleteLease, )
+
+
+class AllocatedHostsTable(tables.DataTable):
+    name = tables.Column("hypervisor_hostname", verbose_name=_("Host name"))
+    vcpus = tables.Column("vcpus", verbose_name=_("vCPUs"))
+    memory_mb = tables.Column("memory_mb", verbose_name=_("RAM"),
+                              filters=(sizeformat.mb_float_format,))
+    local_gb = tables.Column("local_gb", verbose_name=_("Local Storage"),
+                             filters=(sizeformat.diskgbformat,))
+    reservation_id = tables.Column("reservation_id",
+                                   verbose_name=_("Reservation"))
+
+    class Meta(object):
+        name = "allocated_hosts"
+        verbose_name = _("Allocated Hosts")
+
+    def get_object_id(self, datum):
+        # A host can be allocated to several reservations of a lease.
+        return '%s:%s' % (datum.id, datum.reservation_id)
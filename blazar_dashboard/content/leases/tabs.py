@@ -13,12 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from django.conf import settings
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from horizon import exceptions
 from horizon import tabs
 
 from blazar_dashboard.api import client
+from blazar_dashboard import conf
+from blazar_dashboard.content.leases import tables as project_tables
 
 RESERVATION_GENERALS = (
     'id',
@@ -33,24 +36,87 @@ RESERVATION_GENERALS = (
 )
 
 
-class OverviewTab(tabs.Tab):
-    name = _("Overview")
-    slug = "overview"
-    template_name = "project/leases/_detail_overview.html"
+class LeaseTab(tabs.Tab):
+    """Base class of the lease detail tabs.
 
-    def get_context_data(self, request):
+    The lease is fetched at most once per request, whichever tabs are
+    rendered.
+    """
+
+    def get_lease(self, request):
         lease_id = self.tab_group.kwargs['lease_id']
         try:
-            lease = client.lease_get(self.request, lease_id)
+            return client.lease_get(self.request, lease_id)
         except Exception:
             redirect = reverse('horizon:project:leases:index')
             msg = _('Unable to retrieve lease details.')
             exceptions.handle(request, msg, redirect=redirect)
 
-        return {'lease': lease,
-                'reservation_generals': RESERVATION_GENERALS}
+
+class OverviewTab(LeaseTab):
+    name = _("Overview")
+    slug = "overview"
+    template_name = "project/leases/_detail_overview.html"
+
+    def get_context_data(self, request):
+        return {'lease': self.get_lease(request)}
+
+
+class ReservationsTab(LeaseTab):
+    name = _("Reservations")
+    slug = "reservations"
+    template_name = "project/leases/_detail_reservations.html"
+    preload = False
+
+    def get_context_data(self, request):
+        generals = set(RESERVATION_GENERALS)
+        reservations = [
+            (reservation,
+             [(key, value) for key, value in reservation.items()
+              if key not in generals])
+            for reservation in self.get_lease(request).reservations]
+        return {'reservations': reservations}
+
+
+class EventsTab(LeaseTab):
+    name = _("Events")
+    slug = "events"
+    template_name = "project/leases/_detail_events.html"
+    preload = False
+
+    def get_context_data(self, request):
+        return {'events': self.get_lease(request).events}
+
+
+class AllocatedHostsTab(tabs.TableTab, LeaseTab):
+    name = _("Allocated Hosts")
+    slug = "allocated_hosts"
+    table_classes = (project_tables.AllocatedHostsTable,)
+    template_name = "horizon/common/_detail_table.html"
+    preload = False
+    policy_rules = (('reservation', 'blazar:oshosts:get'),
+                    ('reservation', 'blazar:oshosts:get_allocations'))
+
+    def allowed(self, request):
+        if not conf.host_reservation.get('enabled'):
+            return False
+        # Policy checks pass for every user when Horizon has no Blazar
+        # policy file, while Blazar only lets admins list hosts and their
+        # allocations by default.
+        if 'reservation' not in getattr(settings, 'POLICY_FILES', {}):
+            return request.user.is_superuser
+        return super(AllocatedHostsTab, self).allowed(request)
+
+    def get_allocated_hosts_data(self):
+        try:
+            return client.lease_allocated_hosts(
+                self.request, self.get_lease(self.request))
+        except Exception:
+            exceptions.handle(self.request,
+                              _('Unable to retrieve allocated hosts.'))
+            return []
 
 
 class LeaseDetailTabs(tabs.TabGroup):
     slug = "lease_details"
-    tabs = (OverviewTab,)
+    tabs = (OverviewTab, ReservationsTab, EventsTab, AllocatedHostsTab)
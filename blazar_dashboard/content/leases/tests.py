@@ -10,13 +10,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import csv
 from datetime import datetime
 from datetime import timezone
+import json
 from unittest import mock
 
 from django.urls import reverse
 
 from blazar_dashboard import api
+from blazar_dashboard.api import resilience
+from blazar_dashboard import conf
+from blazar_dashboard.content.leases import views
 from blazar_dashboard.test import helpers as test
 
 import logging
@@ -28,8 +33,13 @@ DETAIL_TEMPLATE = 'project/leases/detail.html'
 DETAIL_URL_BASE = 'horizon:project:leases:detail'
 CREATE_URL = reverse('horizon:project:leases:create')
 CREATE_TEMPLATE = 'project/leases/create.html'
+CREATE_BATCH_URL = reverse('horizon:project:leases:create_batch')
 UPDATE_URL_BASE = 'horizon:project:leases:update'
 UPDATE_TEMPLATE = 'project/leases/update.html'
+CALENDAR_URL = reverse('horizon:project:leases:calendar', args=['host'])
+CALENDAR_TEMPLATE = 'project/leases/calendar.html'
+CALENDAR_DATA_URL = reverse('horizon:project:leases:calendar_data',
+                            args=['host'])
 
 
 class LeasesTests(test.TestCase):
@@ -45,6 +55,8 @@ class LeasesTests(test.TestCase):
         self.assertNoMessages(res)
         self.assertContains(res, 'lease-2')
         self.assertContains(res, 'lease-1')
+        self.assertNotContains(res, 'apexcharts')
+        self.assertNotContains(res, 'lease_chart.js')
 
     @mock.patch.object(api.client, 'lease_list')
     def test_index_no_leases(self, lease_list):
@@ -68,6 +80,26 @@ class LeasesTests(test.TestCase):
         self.assertTemplateUsed(res, INDEX_TEMPLATE)
         self.assertMessageCount(res, error=1)
 
+    @mock.patch.object(api.client, 'lease_list')
+    def test_index_circuit_open(self, lease_list):
+        lease_list.side_effect = resilience.BlazarUnavailable()
+        for _ in range(resilience.breaker.failure_threshold):
+            resilience.breaker.record_failure()
+
+        res = self.client.get(INDEX_URL)
+
+        self.assertTemplateUsed(res, INDEX_TEMPLATE)
+        self.assertMessageCount(res, error=1)
+        self.assertContains(res, 'blazar-degraded')
+
+    @mock.patch.object(api.client, 'lease_list')
+    def test_index_no_degraded_banner(self, lease_list):
+        lease_list.return_value = self.leases.list()
+
+        res = self.client.get(INDEX_URL)
+
+        self.assertNotContains(res, 'blazar-degraded')
+
     @mock.patch.object(api.client, 'lease_get')
     def test_lease_detail(self, lease_get):
         lease = self.leases.get(name='lease-1')
@@ -79,6 +111,63 @@ class LeasesTests(test.TestCase):
         self.assertTemplateUsed(res, DETAIL_TEMPLATE)
         self.assertContains(res, 'lease-1')
 
+    @mock.patch.object(api.client, 'lease_get')
+    def test_lease_detail_lazy_tabs(self, lease_get):
+        lease = self.leases.get(name='lease-1')
+        lease_get.return_value = lease
+        url = reverse(DETAIL_URL_BASE, args=[lease['id']])
+        reservation_id = lease['reservations'][0]['id']
+
+        res = self.client.get(url)
+
+        self.assertNotContains(res, reservation_id)
+
+        res = self.client.get(url, {'tab': 'lease_details__reservations'},
+                              HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertTemplateUsed(res,
+                                'project/leases/_detail_reservations.html')
+        self.assertContains(res, reservation_id)
+        self.assertContains(res, 'hypervisor_properties')
+        self.assertNotContains(res, '<dt>lease_id</dt>')
+
+        res = self.client.get(url, {'tab': 'lease_details__events'},
+                              HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertTemplateUsed(res, 'project/leases/_detail_events.html')
+        self.assertContains(res, 'start_lease')
+
+    @mock.patch.object(api.client, 'host_allocations_list')
+    @mock.patch.object(api.client, 'lease_get')
+    def test_lease_detail_allocated_hosts_not_admin(self, lease_get,
+                                                    host_allocations_list):
+        lease = self.leases.get(name='lease-1')
+        lease_get.return_value = lease
+
+        res = self.client.get(reverse(DETAIL_URL_BASE, args=[lease['id']]))
+
+        self.assertTemplateUsed(res, DETAIL_TEMPLATE)
+        self.assertNotContains(res, 'Allocated Hosts')
+        host_allocations_list.assert_not_called()
+
+    @mock.patch.object(api.client, 'lease_get')
+    def test_lease_detail_allocated_hosts_policy(self, lease_get):
+        lease = self.leases.get(name='lease-1')
+        lease_get.return_value = lease
+        policy_check = mock.Mock(return_value=True)
+        policy_files = {'reservation': 'blazar_policy.yaml'}
+
+        with self.settings(POLICY_FILES=policy_files,
+                           POLICY_CHECK_FUNCTION=policy_check):
+            res = self.client.get(reverse(DETAIL_URL_BASE,
+                                          args=[lease['id']]))
+
+        self.assertContains(res, 'Allocated Hosts')
+        policy_check.assert_any_call(
+            (('reservation', 'blazar:oshosts:get'),
+             ('reservation', 'blazar:oshosts:get_allocations')),
+            test.IsHttpRequest())
+
     @mock.patch.object(api.client, 'lease_get')
     def test_lease_detail_error(self, lease_get):
         lease_get.side_effect = self.exceptions.blazar
@@ -90,6 +179,56 @@ class LeasesTests(test.TestCase):
         self.assertMessageCount(error=1)
         self.assertRedirectsNoFollow(res, INDEX_URL)
 
+    @mock.patch.object(api.client, 'lease_list')
+    def test_export_ndjson(self, lease_list):
+        leases = self.leases.list()
+        lease_list.return_value = leases
+
+        res = self.client.get(reverse('horizon:project:leases:export',
+                                      args=['ndjson']))
+
+        self.assertTrue(res.streaming)
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual([lease.id for lease in leases],
+                         [json.loads(line)['id'] for line in lines])
+
+    @mock.patch.object(api.client, 'lease_list')
+    def test_export_csv(self, lease_list):
+        lease_list.return_value = self.leases.list()
+
+        res = self.client.get(reverse('horizon:project:leases:export',
+                                      args=['csv']))
+
+        self.assertEqual('text/csv', res['Content-Type'])
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual('id,name,start_date,end_date,user_id,project_id,'
+                         'before_end_date,status,degraded,reservations',
+                         lines[0])
+        self.assertEqual(3, len(lines))
+
+    @mock.patch.object(api.client, 'lease_list')
+    def test_export_csv_formula(self, lease_list):
+        lease = self.leases.first()
+        lease_list.return_value = [api.client.Lease(
+            dict(lease.to_dict(), name='=HYPERLINK("http://x")'))]
+
+        res = self.client.get(reverse('horizon:project:leases:export',
+                                      args=['csv']))
+
+        rows = list(csv.DictReader(
+            b''.join(res.streaming_content).decode().splitlines()))
+        self.assertEqual('\'=HYPERLINK("http://x")', rows[0]['name'])
+
+    @mock.patch.object(api.client, 'lease_list')
+    def test_export_error(self, lease_list):
+        lease_list.side_effect = self.exceptions.blazar
+
+        res = self.client.get(reverse('horizon:project:leases:export',
+                                      args=['csv']))
+
+        self.assertMessageCount(error=1)
+        self.assertRedirectsNoFollow(res, INDEX_URL)
+
     @mock.patch.object(api.client, 'lease_create')
     def test_create_lease_host_reservation(self, lease_create):
         start_date = datetime(2030, 6, 27, 18, 0, tzinfo=timezone.utc)
@@ -169,6 +308,150 @@ class LeasesTests(test.TestCase):
         self.assertMessageCount(success=1)
         self.assertRedirectsNoFollow(res, INDEX_URL)
 
+    @mock.patch.object(api.client, 'lease_create')
+    def test_create_leases_batch_count(self, lease_create):
+        form_data = {
+            'name': 'training',
+            'start_date': '2030-06-27 18:00',
+            'end_date': '2030-06-27 20:00',
+            'resource_type': 'host',
+            'min_hosts': 1,
+            'max_hosts': 1,
+            'count': 3,
+        }
+        lease_create.return_value = self.leases.first()
+
+        res = self.client.post(CREATE_BATCH_URL, form_data)
+
+        reservations = [{
+            'min': 1,
+            'max': 1,
+            'hypervisor_properties': '',
+            'resource_properties': '',
+            'resource_type': 'physical:host',
+        }]
+        lease_create.assert_has_calls([
+            mock.call(test.IsHttpRequest(), 'training-%d' % i,
+                      '2030-06-27 18:00', '2030-06-27 20:00',
+                      reservations, [])
+            for i in (1, 2, 3)], any_order=True)
+        self.assertEqual(3, lease_create.call_count)
+        self.assertNoFormErrors(res)
+        self.assertMessageCount(success=1)
+        self.assertRedirectsNoFollow(res, INDEX_URL)
+
+    @mock.patch.object(api.client, 'lease_create')
+    def test_create_leases_batch_count_no_start_date(self, lease_create):
+        form_data = {
+            'name': 'training',
+            'end_date': '2030-06-27 20:00',
+            'resource_type': 'host',
+            'min_hosts': 1,
+            'max_hosts': 1,
+            'count': 2,
+        }
+        lease_create.return_value = self.leases.first()
+
+        res = self.client.post(CREATE_BATCH_URL, form_data)
+
+        lease_create.assert_has_calls([
+            mock.call(test.IsHttpRequest(), 'training-%d' % i, mock.ANY,
+                      '2030-06-27 20:00', mock.ANY, [])
+            for i in (1, 2)], any_order=True)
+        self.assertNoFormErrors(res)
+        self.assertRedirectsNoFollow(res, INDEX_URL)
+
+    @mock.patch.object(api.client, 'lease_create')
+    def test_create_leases_batch_list(self, lease_create):
+        form_data = {
+            'start_date': '2030-06-27 18:00',
+            'end_date': '2030-06-27 20:00',
+            'resource_type': 'host',
+            'min_hosts': 1,
+            'max_hosts': 1,
+            'leases': 'alice,+0h\n\nbob, +1d\n',
+        }
+
+        def create(request, name, start, end, reservations, events):
+            if name == 'bob':
+                raise self.exceptions.blazar
+            return self.leases.first()
+
+        lease_create.side_effect = create
+
+        res = self.client.post(CREATE_BATCH_URL, form_data)
+
+        lease_create.assert_has_calls([
+            mock.call(test.IsHttpRequest(), 'alice', '2030-06-27 18:00',
+                      '2030-06-27 20:00', mock.ANY, []),
+            mock.call(test.IsHttpRequest(), 'bob', '2030-06-28 18:00',
+                      '2030-06-28 20:00', mock.ANY, [])], any_order=True)
+        self.assertNoFormErrors(res)
+        self.assertMessageCount(success=1, error=1)
+        self.assertRedirectsNoFollow(res, INDEX_URL)
+
+    @mock.patch.object(api.client, 'lease_create')
+    def test_create_leases_batch_invalid_list(self, lease_create):
+        form_data = {
+            'start_date': '2030-06-27 18:00',
+            'end_date': '2030-06-27 20:00',
+            'resource_type': 'host',
+            'min_hosts': 1,
+            'max_hosts': 1,
+            'leases': 'alice,+0h\nbob,tomorrow',
+        }
+
+        res = self.client.post(CREATE_BATCH_URL, form_data)
+
+        lease_create.assert_not_called()
+        self.assertContains(res, 'Line 2 must be')
+
+    @mock.patch.object(api.client, 'lease_create')
+    def test_create_leases_batch_count_too_large(self, lease_create):
+        form_data = {
+            'name': 'training',
+            'resource_type': 'host',
+            'min_hosts': 1,
+            'max_hosts': 1,
+            'count': 101,
+        }
+
+        res = self.client.post(CREATE_BATCH_URL, form_data)
+
+        lease_create.assert_not_called()
+        self.assertContains(res, 'less than or equal to 100')
+
+    @mock.patch.object(api.client, 'lease_create')
+    def test_create_leases_batch_list_too_long(self, lease_create):
+        form_data = {
+            'resource_type': 'host',
+            'min_hosts': 1,
+            'max_hosts': 1,
+            'leases': '\n'.join('lease-%d,+%dh' % (i, i)
+                                for i in range(101)),
+        }
+
+        res = self.client.post(CREATE_BATCH_URL, form_data)
+
+        lease_create.assert_not_called()
+        self.assertContains(res, 'At most 100 leases can be created at once.')
+
+    @mock.patch.object(api.client, 'lease_create')
+    def test_create_leases_batch_count_and_list(self, lease_create):
+        form_data = {
+            'name': 'training',
+            'resource_type': 'host',
+            'min_hosts': 1,
+            'max_hosts': 1,
+            'count': 2,
+            'leases': 'alice,+0h',
+        }
+
+        res = self.client.post(CREATE_BATCH_URL, form_data)
+
+        lease_create.assert_not_called()
+        self.assertContains(res, 'Enter either a number of leases')
+
     @mock.patch.object(api.client, 'lease_create')
     def test_create_lease_client_error(self, lease_create):
         start_date = datetime(2030, 6, 27, 18, 0, tzinfo=timezone.utc)
@@ -308,3 +591,198 @@ class LeasesTests(test.TestCase):
         lease_delete.assert_called_once_with(test.IsHttpRequest(), lease['id'])
         self.assertMessageCount(error=1)
         self.assertRedirectsNoFollow(res, INDEX_URL)
+
+    def test_calendar(self):
+        res = self.client.get(CALENDAR_URL)
+
+        self.assertTemplateUsed(res, CALENDAR_TEMPLATE)
+        self.assertContains(res, 'leases/js/vendor/apexcharts-4.7.0.min.js')
+        self.assertContains(res, 'leases/js/calendar/lease_chart.js')
+        # Loaded as a script, and as a worker through the data attribute.
+        self.assertContains(res, 'leases/js/calendar/lease_chart_data.js',
+                            count=2)
+        self.assertContains(res, 'data-tile-ms="604800000"')
+
+    @mock.patch.dict(conf.host_reservation, {'calendar_tile_days': 1})
+    @mock.patch.object(api.client, 'host_allocations_list')
+    @mock.patch.object(api.client, 'host_list')
+    def test_calendar_data_tiles(self, host_list, host_allocations_list):
+        host_list.return_value = self.hosts.list()
+        host_allocations_list.return_value = self.allocations.list()
+        day = 24 * 3600 * 1000
+        june_27 = datetime(2030, 6, 27, tzinfo=timezone.utc)
+        june_27 = int(june_27.timestamp() * 1000) // day
+
+        res = self.client.get(CALENDAR_DATA_URL, {
+            'tiles': '%d,%d,%d' % (june_27 + 3, june_27, june_27 + 4),
+            'resources': 1})
+
+        self.assertEqual(200, res.status_code)
+        data = res.json()
+        self.assertEqual(day, data['tile_ms'])
+        self.assertEqual(2, len(data['resources']))
+        self.assertNotIn('reservations', data)
+        # The first reservation covers June 27 to 29, the second one June 28
+        # to 30, both from and to 18:00.
+        tiles = {key: [r['reservation_id'] for r in reservations]
+                 for key, reservations in data['tiles'].items()}
+        self.assertEqual({
+            str(june_27): ['087bc740-6d2d-410b-9d47-c7b2b55a9d36'],
+            str(june_27 + 3): ['1b05370e-d92a-452d-80db-89842666b604'],
+            str(june_27 + 4): [],
+        }, tiles)
+
+    @mock.patch.object(api.client, 'host_allocations_list')
+    @mock.patch.object(api.client, 'host_list')
+    def test_calendar_data_tiles_without_resources(self, host_list,
+                                                   host_allocations_list):
+        host_list.return_value = self.hosts.list()
+        host_allocations_list.return_value = self.allocations.list()
+
+        res = self.client.get(CALENDAR_DATA_URL, {'tiles': '3156'})
+
+        data = res.json()
+        self.assertNotIn('resources', data)
+        self.assertEqual(2, len(data['tiles']['3156']))
+
+    @mock.patch.object(api.client, 'host_allocations_list')
+    @mock.patch.object(api.client, 'host_list')
+    def test_calendar_data_last_known_good(self, host_list,
+                                           host_allocations_list):
+        host_list.return_value = self.hosts.list()
+        host_allocations_list.return_value = self.allocations.list()
+        live = self.client.get(CALENDAR_DATA_URL, {'tiles': '3156'}).json()
+        host_list.side_effect = self.exceptions.blazar
+
+        res = self.client.get(CALENDAR_DATA_URL, {'tiles': '3156'})
+
+        self.assertEqual(200, res.status_code)
+        data = res.json()
+        self.assertIn('fetched_at', data.pop('stale'))
+        self.assertEqual(live, data)
+        self.assertNotIn('stale', live)
+
+    @mock.patch.object(api.client, 'host_list')
+    def test_calendar_data_invalid_tiles(self, host_list):
+        too_many = ','.join(str(k) for k in range(views.MAX_TILES + 1))
+        for tiles in ('a', '1,,2', too_many):
+            res = self.client.get(CALENDAR_DATA_URL, {'tiles': tiles})
+            self.assertEqual(404, res.status_code)
+        host_list.assert_not_called()
+
+    @mock.patch.object(api.client, 'reservation_calendar_overview')
+    def test_calendar_data_overview(self, reservation_calendar_overview):
+        reservation_calendar_overview.return_value = (
+            ['compute-1', 'compute-2'], [[0, 3], []],
+            {'hosts': 0, 'allocations': 0, 'reservations': 0})
+        start = datetime(2030, 6, 1, tzinfo=timezone.utc)
+        end = datetime(2030, 7, 1, tzinfo=timezone.utc)
+        params = {'overview': 1, 'start': int(start.timestamp() * 1000),
+                  'end': int(end.timestamp() * 1000), 'columns': 600}
+
+        res = self.client.get(CALENDAR_DATA_URL, params)
+
+        self.assertEqual(200, res.status_code)
+        reservation_calendar_overview.assert_called_once_with(
+            test.IsHttpRequest(), datetime(2030, 6, 1), datetime(2030, 7, 1),
+            600)
+        self.assertEqual({
+            'overview': {'start': params['start'], 'end': params['end'],
+                         'columns': 600, 'rows': ['compute-1', 'compute-2'],
+                         'runs': [[0, 3], []]},
+            'skipped': {'hosts': 0, 'allocations': 0, 'reservations': 0},
+            'row_attr': 'hypervisor_hostname'}, res.json())
+
+    @mock.patch.object(api.client, 'reservation_calendar_overview')
+    def test_calendar_data_overview_last_known_good(
+            self, reservation_calendar_overview):
+        reservation_calendar_overview.return_value = (
+            ['compute-1'], [[0, 3]],
+            {'hosts': 0, 'allocations': 0, 'reservations': 0})
+        params = {'overview': 1, 'start': 1900000000000,
+                  'end': 1902592000000, 'columns': 600}
+        live = self.client.get(CALENDAR_DATA_URL, params).json()
+        reservation_calendar_overview.side_effect = self.exceptions.blazar
+
+        res = self.client.get(CALENDAR_DATA_URL, params)
+
+        self.assertEqual(200, res.status_code)
+        data = res.json()
+        self.assertIn('fetched_at', data.pop('stale'))
+        self.assertEqual(live, data)
+        self.assertNotIn('stale', live)
+
+    @mock.patch.object(api.client, 'reservation_calendar_overview')
+    def test_calendar_data_overview_invalid(self,
+                                            reservation_calendar_overview):
+        for params in ({'start': 2, 'end': 1, 'columns': 10},
+                       {'start': 1, 'end': 2, 'columns': 0},
+                       {'start': 1, 'end': 2,
+                        'columns': views.MAX_OVERVIEW_COLUMNS + 1},
+                       {'start': 1, 'end': 10 ** 20, 'columns': 10},
+                       {'start': 1, 'columns': 10}):
+            res = self.client.get(CALENDAR_DATA_URL, dict(params, overview=1))
+            self.assertEqual(404, res.status_code)
+        reservation_calendar_overview.assert_not_called()
+
+    @mock.patch.dict(views.group_attribute_mapping,
+                     {'host': ['hypervisor_type']})
+    @mock.patch.object(api.client, 'host_allocations_list')
+    @mock.patch.object(api.client, 'host_list')
+    def test_calendar_data_grouped(self, host_list, host_allocations_list):
+        host_list.return_value = self.hosts.list()
+        host_allocations_list.return_value = self.allocations.list()
+
+        res = self.client.get(CALENDAR_DATA_URL,
+                              {'group_by': 'hypervisor_type'})
+
+        def ms(day):
+            return int(datetime(2030, 6, day, 18, 0,
+                                tzinfo=timezone.utc).timestamp() * 1000)
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(
+            {'groups': [{'name': 'QEMU', 'total': 2,
+                         'steps': [[ms(27), 1], [ms(28), 2],
+                                   [ms(29), 1], [ms(30), 0]]}],
+             'skipped': {'hosts': 0, 'allocations': 0, 'reservations': 0},
+             'row_attr': 'hypervisor_type'},
+            res.json())
+
+    @mock.patch.object(api.client, 'host_list')
+    def test_calendar_data_grouped_unknown_attribute(self, host_list):
+        res = self.client.get(CALENDAR_DATA_URL, {'group_by': 'trust_id'})
+
+        self.assertEqual(404, res.status_code)
+        host_list.assert_not_called()
+
+
+class AdminLeaseDetailTests(test.BaseAdminViewTests):
+    @mock.patch.object(api.client, 'blazarclient')
+    @mock.patch.object(api.client, 'lease_get')
+    def test_lease_detail_allocated_hosts(self, lease_get, blazarclient):
+        lease = self.leases.get(name='lease-1')
+        lease_get.return_value = lease
+        host = blazarclient.return_value.host
+        host.request_manager.get.return_value = (None, {'allocations': [
+            a.to_dict() for a in self.allocations.list()]})
+        host.list.return_value = [h.to_dict() for h in self.hosts.list()]
+        url = reverse(DETAIL_URL_BASE, args=[lease['id']])
+
+        for _ in range(2):
+            res = self.client.get(url, {'tab': 'lease_details__'
+                                               'allocated_hosts'},
+                                  HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+            hosts = res.context['allocated_hosts_table'].data
+            self.assertEqual(['compute-1'],
+                             [h.hypervisor_hostname for h in hosts])
+            self.assertEqual(lease['reservations'][0]['id'],
+                             hosts[0].reservation_id)
+            self.assertContains(
+                res, 'allocated_hosts__row__1:%s' % hosts[0].reservation_id)
+
+        # Hosts and allocations are served from their snapshots.
+        host.request_manager.get.assert_called_once_with(
+            '/os-hosts/allocations')
+        host.list.assert_called_once_with()
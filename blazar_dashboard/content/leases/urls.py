@@ -16,6 +16,7 @@
 from django.urls import re_path
 
 from blazar_dashboard.content.leases import views as leases_views
+from blazar_dashboard import profiling
 
 
 urlpatterns = [
@@ -26,9 +27,15 @@ urlpatterns = [
             name='calendar_data'),
     re_path(r'^$', leases_views.IndexView.as_view(), name='index'),
     re_path(r'^create/$', leases_views.CreateView.as_view(), name='create'),
+    re_path(r'^export\.(?P<export_format>csv|ndjson)$',
+            leases_views.export_view, name='export'),
+    re_path(r'^create_batch/$', leases_views.BatchCreateView.as_view(),
+            name='create_batch'),
     re_path(r'^(?P<lease_id>[^/]+)/$', leases_views.DetailView.as_view(),
             name='detail'),
     re_path(r'^(?P<lease_id>[^/]+)/update$',
             leases_views.UpdateView.as_view(),
             name='update'),
 ]
+
+profiling.profile_urlpatterns(urlpatterns)
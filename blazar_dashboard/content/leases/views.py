@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
 from django.http import JsonResponse
 from django.urls import reverse
 from django.urls import reverse_lazy
@@ -29,6 +31,7 @@ from blazar_dashboard import conf
 from blazar_dashboard.content.leases import forms as project_forms
 from blazar_dashboard.content.leases import tables as project_tables
 from blazar_dashboard.content.leases import tabs as project_tabs
+from blazar_dashboard import export
 
 
 class IndexView(tables.DataTableView):
@@ -56,27 +59,174 @@ class CalendarView(views.APIView):
         if context["resource_type"] not in self.titles:
             raise exceptions.NotFound
         context["calendar_title"] = self.titles[context["resource_type"]]
+        context["group_attributes"] = group_attribute_mapping.get(
+            context["resource_type"], ())
+        context["tile_ms"] = _calendar_tile_ms()
+        context["max_tiles"] = MAX_TILES
+        context["overview_days"] = conf.host_reservation.get(
+            'calendar_overview_days', 30)
+        context["overview_max_columns"] = MAX_OVERVIEW_COLUMNS
         return context
 
 
+group_attribute_mapping = {
+    "host": conf.host_reservation.get('calendar_group_attributes', ()),
+}
+
+
 def calendar_data_view(request, resource_type):
     api_mapping = {
         "host": api.client.reservation_calendar,
     }
+    grouped_api_mapping = {
+        "host": api.client.reservation_calendar_grouped,
+    }
     attribute_mapping = {
         "host": conf.host_reservation.get('calendar_attribute'),
     }
     data = {}
     if resource_type not in api_mapping:
         raise exceptions.NotFound
-    resources, reservations = api_mapping[resource_type](request)
-    data['resources'] = resources
-    data['reservations'] = reservations
+    group_by = request.GET.get('group_by')
+    if group_by:
+        if group_by not in group_attribute_mapping.get(resource_type, ()):
+            raise exceptions.NotFound
+        (data['groups'], data['skipped']), fetched_at = (
+            api.client.last_known_good(
+                request, 'calendar:%s:%s' % (resource_type, group_by),
+                lambda: grouped_api_mapping[resource_type](request,
+                                                           group_by)))
+        data['row_attr'] = group_by
+        _mark_stale(data, fetched_at)
+        return JsonResponse(data)
+    if request.GET.get('overview'):
+        (data['overview'], data['skipped']), fetched_at = (
+            _calendar_overview(request, resource_type))
+        data['row_attr'] = attribute_mapping[resource_type]
+        _mark_stale(data, fetched_at)
+        return JsonResponse(data)
+    tiles = request.GET.get('tiles')
+    keys = _tile_keys(tiles) if tiles is not None else None
+    (resources, reservations, skipped), fetched_at = (
+        api.client.last_known_good(
+            request, 'calendar:%s' % resource_type,
+            lambda: api_mapping[resource_type](request)))
     # Which attribute to use to determine calendar rows
     data['row_attr'] = attribute_mapping[resource_type]
+    # Resources and reservations which could not be displayed
+    data['skipped'] = skipped
+    _mark_stale(data, fetched_at)
+    if keys is None:
+        data['resources'] = resources
+        data['reservations'] = reservations
+        return JsonResponse(data)
+    tile_ms = _calendar_tile_ms()
+    data['tile_ms'] = tile_ms
+    data['tiles'] = _tile_reservations(reservations, keys, tile_ms)
+    if request.GET.get('resources'):
+        data['resources'] = resources
     return JsonResponse(data)
 
 
+def _mark_stale(data, fetched_at):
+    """Flag calendar data saved before Blazar became unavailable."""
+    if fetched_at is not None:
+        data['stale'] = {'fetched_at': fetched_at}
+
+
+# Largest number of tiles returned by one calendar data request.
+MAX_TILES = 53
+
+# Largest number of time columns of a calendar overview.
+MAX_OVERVIEW_COLUMNS = 4096
+
+
+def _calendar_overview(request, resource_type):
+    """Return the occupancy overview of the requested window, and skipped data.
+
+    The window is given by its ``start`` and ``end`` in milliseconds since
+    the epoch, and its resolution by a number of ``columns``, usually the
+    width of the calendar in pixels. Like the other calendar data, the
+    result comes with the time it was fetched at if Blazar is unavailable,
+    see :func:`api.client.last_known_good`.
+    """
+    try:
+        start = int(request.GET['start'])
+        end = int(request.GET['end'])
+        columns = int(request.GET['columns'])
+        window = _utc_datetime(start), _utc_datetime(end)
+    except (KeyError, ValueError, OverflowError, OSError):
+        raise exceptions.NotFound
+    if start >= end or not 0 < columns <= MAX_OVERVIEW_COLUMNS:
+        raise exceptions.NotFound
+
+    def fetch():
+        rows, runs, skipped = api.client.reservation_calendar_overview(
+            request, window[0], window[1], columns)
+        overview = {'start': start, 'end': end, 'columns': columns,
+                    'rows': rows, 'runs': runs}
+        return overview, skipped
+
+    name = 'calendar:%s:overview:%d:%d:%d' % (resource_type, start, end,
+                                              columns)
+    return api.client.last_known_good(request, name, fetch)
+
+
+def _utc_datetime(milliseconds):
+    return datetime.datetime.fromtimestamp(
+        milliseconds / 1000, datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _calendar_tile_ms():
+    days = conf.host_reservation.get('calendar_tile_days', 7)
+    return days * 24 * 3600 * 1000
+
+
+def _tile_keys(tiles):
+    try:
+        keys = sorted({int(key) for key in tiles.split(',')})
+    except ValueError:
+        raise exceptions.NotFound
+    if len(keys) > MAX_TILES:
+        raise exceptions.NotFound
+    return keys
+
+
+def _tile_reservations(reservations, keys, tile_ms):
+    """Bucket reservations into the time tiles listed in keys.
+
+    Tile ``k`` covers ``[k * tile_ms, (k + 1) * tile_ms)`` in milliseconds
+    since the epoch. Each reservation is listed in every requested tile it
+    overlaps, so that any set of tiles can be displayed on its own.
+    """
+    tiles = {key: [] for key in keys}
+    first, last = keys[0], keys[-1]
+    for reservation in reservations:
+        if 'start_date' not in reservation or 'end_date' not in reservation:
+            continue
+        start = int(reservation['start_date'].timestamp() * 1000)
+        end = int(reservation['end_date'].timestamp() * 1000)
+        for key in range(max(start // tile_ms, first),
+                         min((end - 1) // tile_ms, last) + 1):
+            if key in tiles:
+                tiles[key].append(reservation)
+    return tiles
+
+
+LEASE_EXPORT_FIELDS = api.client.Lease._attrs + ['reservations']
+
+
+def export_view(request, export_format):
+    """Stream all leases as CSV or NDJSON."""
+    try:
+        leases = api.client.lease_list(request)
+    except Exception:
+        exceptions.handle(request, _('Unable to export leases.'),
+                          redirect=reverse('horizon:project:leases:index'))
+    return export.stream((lease.to_dict() for lease in leases),
+                         LEASE_EXPORT_FIELDS, export_format, 'leases')
+
+
 class DetailView(tabs.TabView):
     tab_group_class = project_tabs.LeaseDetailTabs
     template_name = 'project/leases/detail.html'
@@ -92,6 +242,16 @@ class CreateView(forms.ModalFormView):
     submit_url = reverse_lazy('horizon:project:leases:create')
 
 
+class BatchCreateView(forms.ModalFormView):
+    form_class = project_forms.BatchCreateForm
+    template_name = 'project/leases/create_batch.html'
+    success_url = reverse_lazy('horizon:project:leases:index')
+    modal_id = "create_leases_batch_modal"
+    modal_header = _("Create Leases in Batch")
+    submit_label = _("Create Leases")
+    submit_url = reverse_lazy('horizon:project:leases:create_batch')
+
+
 class UpdateView(forms.ModalFormView):
     form_class = project_forms.UpdateForm
     template_name = 'project/leases/update.html'
@@ -24,7 +24,5 @@ ADD_SCSS_FILES = [
     'leases/scss/calendar.scss',
 ]
 
-ADD_JS_FILES = [
-    'leases/js/calendar/lease_chart.js',
-    'leases/js/vendor/apexcharts.js',
-]
+# The calendar scripts are not added to ADD_JS_FILES: they are only needed
+# by the calendar page, which loads them itself.
@@ -0,0 +1,85 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Streaming CSV and NDJSON exports of Blazar resources.
+
+Rows are written to the response as they are produced by a generator, so
+that exports of large clouds are neither rendered nor buffered as a whole.
+"""
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _Echo(object):
+    """File-like object returning what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+# Leading characters which make spreadsheets evaluate a cell as a formula.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_lines(rows, fields):
+    """Yield a CSV header line, then one line for each row.
+
+    Values of nested lists and dictionaries are written as JSON. Strings
+    which a spreadsheet would evaluate as a formula, e.g. lease names chosen
+    by tenants, are prefixed with a quote.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_csv_value(row.get(field))
+                               for field in fields])
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def ndjson_lines(rows):
+    """Yield each row as a line of JSON."""
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream(rows, fields, export_format, filename):
+    """Return a response streaming rows as CSV or NDJSON.
+
+    :param rows: an iterable of dictionaries, consumed lazily.
+    :param fields: the CSV columns. NDJSON rows are written whole.
+    :param export_format: one of :data:`FORMATS`.
+    """
+    if export_format == 'csv':
+        lines = csv_lines(rows, fields)
+    else:
+        lines = ndjson_lines(rows)
+    response = StreamingHttpResponse(lines,
+                                     content_type=FORMATS[export_format])
+    response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (
+        filename, export_format)
+    return response
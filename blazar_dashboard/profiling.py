@@ -0,0 +1,174 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Opt-in profiling of blazar_dashboard views.
+
+When ``OPENSTACK_BLAZAR_PROFILING['enabled']`` is set, administrators can
+add ``?blazar_profile=1`` to any Blazar dashboard URL to get the time spent
+in each stage of the request in a ``Server-Timing`` response header, or
+``?blazar_profile=cprofile`` to get a cProfile report instead of the page.
+When the setting is off, the decorators return the functions unchanged.
+"""
+
+import contextvars
+import functools
+import io
+import logging
+import time
+
+from django.http import HttpResponse
+
+from blazar_dashboard import conf
+
+LOG = logging.getLogger(__name__)
+
+QUERY_PARAM = 'blazar_profile'
+
+# Stages reported in the Server-Timing header, in order.
+STAGES = ('keystone_session', 'blazar_http', 'api', 'wrap', 'render')
+
+_current = contextvars.ContextVar('blazar_profile', default=None)
+
+
+class Profile(object):
+    """Span timings collected while serving one request."""
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+        self._depth = {}
+
+    def enter(self, stage):
+        depth = self._depth.get(stage, 0)
+        self._depth[stage] = depth + 1
+        return depth == 0
+
+    def exit(self, stage, elapsed, outermost):
+        self._depth[stage] -= 1
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+        if outermost:
+            self.durations[stage] = self.durations.get(stage, 0) + elapsed
+
+    def summary(self):
+        """Return (stage, seconds, count) tuples for each recorded stage.
+
+        The ``wrap`` stage is derived: it is the time spent in API functions
+        outside of keystone session creation and Blazar HTTP calls, i.e.
+        mostly wrapping responses into ``Lease`` and ``Host`` objects.
+        """
+        durations = dict(self.durations)
+        if 'api' in durations:
+            durations['wrap'] = max(
+                0, durations['api'] - durations.get('blazar_http', 0) -
+                durations.get('keystone_session', 0))
+        return [(stage, durations[stage], self.counts.get(stage, 1))
+                for stage in STAGES if stage in durations]
+
+    def server_timing(self, total):
+        entries = ['%s;dur=%.1f;desc="%d calls"' % (
+            stage, seconds * 1000, count)
+            for stage, seconds, count in self.summary()]
+        entries.append('total;dur=%.1f' % (total * 1000))
+        return ', '.join(entries)
+
+
+def _traced(stage, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        outermost = profile.enter(stage)
+        start = time.monotonic()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.exit(stage, time.monotonic() - start, outermost)
+
+    return wrapper
+
+
+def traced(stage):
+    """Record the time spent in the decorated function as ``stage``."""
+    def decorator(func):
+        if not conf.profiling.get('enabled'):
+            return func
+        return _traced(stage, func)
+    return decorator
+
+
+def _profiled(view_func):
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        mode = request.GET.get(QUERY_PARAM)
+        if not mode or not request.user.is_superuser:
+            return view_func(request, *args, **kwargs)
+        if mode == 'cprofile':
+            return _cprofile_view(view_func, request, *args, **kwargs)
+
+        profile = Profile()
+        token = _current.set(profile)
+        start = time.monotonic()
+        try:
+            response = _render(view_func(request, *args, **kwargs), profile)
+        finally:
+            _current.reset(token)
+        total = time.monotonic() - start
+        response['Server-Timing'] = profile.server_timing(total)
+        LOG.info('Profile of %s: %s', request.path, response['Server-Timing'])
+        return response
+
+    return wrapper
+
+
+def _render(response, profile):
+    if getattr(response, 'is_rendered', True):
+        return response
+    outermost = profile.enter('render')
+    start = time.monotonic()
+    response.render()
+    profile.exit('render', time.monotonic() - start, outermost)
+    return response
+
+
+def _cprofile_view(view_func, request, *args, **kwargs):
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        response = view_func(request, *args, **kwargs)
+        if not getattr(response, 'is_rendered', True):
+            response.render()
+    finally:
+        profiler.disable()
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats('cumulative').print_stats(50)
+    return HttpResponse(output.getvalue(), content_type='text/plain')
+
+
+def profiled(view_func):
+    """Allow administrators to profile the decorated view on demand."""
+    if not conf.profiling.get('enabled'):
+        return view_func
+    return _profiled(view_func)
+
+
+def profile_urlpatterns(urlpatterns):
+    """Apply :func:`profiled` to every view of a URLconf."""
+    if not conf.profiling.get('enabled'):
+        return
+    for pattern in urlpatterns:
+        if getattr(pattern, 'callback', None):
+            pattern.callback = _profiled(pattern.callback)
@@ -3,49 +3,343 @@
 
   const CHART_TITLE_HEIGHT = 68;
   const ROW_HEIGHT = 60;
+  const OVERVIEW_ROW_HEIGHT = 12;
+  const OVERVIEW_LABEL_WIDTH = 160;
+  const OVERVIEW_AXIS_HEIGHT = 20;
+  // Browsers refuse to draw canvases taller than 32767 pixels, or larger
+  // than 16777216 pixels in Safari.
+  const OVERVIEW_MAX_HEIGHT = 32767;
+  const OVERVIEW_MAX_AREA = 16777216;
+  // Rows thinner than this are drawn without labels and gaps.
+  const OVERVIEW_MIN_LABELLED_ROW_HEIGHT = 8;
 
   const selector = '#blazar-calendar-host';
   const pluralResourceType = gettext("Hosts");
   if ($(selector).length < 1) return;
   const calendarElement = $(selector);
   const form = $('form[name="blazar-calendar-controls"]');
+  const staleNotice = $('.calendar-stale');
 
   function init() {
     calendarElement.addClass('loaded');
-    $.getJSON("resources.json")
-      .done(function(resp) {
-        const rowAttr = resp.row_attr;
-        // For this row shows up at all, we need at least 1 data point.
-        const reservationsById = {}
-        resp.reservations.forEach(function(reservation){
-          if(!(reservation.reservation_id in reservationsById)){
-            reservationsById[reservation.reservation_id] = reservation
-            reservation.name = reservation.reservation_id
-            reservation.data = []
+    // Reservations are loaded in tiles covering fixed time windows, which
+    // are kept by the data store, so that moving the time window only
+    // fetches the tiles not seen yet.
+    const tileMs = calendarElement.data('tile-ms');
+    const maxTiles = calendarElement.data('tile-max');
+    // Periods at least this long are drawn from an occupancy overview
+    // rasterized by the server, as reservation bars would be sub-pixel.
+    const overviewMs = calendarElement.data('overview-days') * 24 * 3600 * 1000;
+    const overviewMaxColumns = calendarElement.data('overview-max-columns');
+    const tileRequests = new Map();
+    let resourcesRequested = false;
+    let chart = null;
+    let rows = [];
+    let rowCount = 0;
+    let latestRender = 0;
+    const postData = startData();
+    bindControls();
+    loadCalendar();
+
+    function bindControls() {
+      // Bound once, as the first period may be drawn as an overview, or
+      // fail to load, before any chart is built.
+      $('input[data-datepicker]', form).datepicker({
+        dateFormat: 'mm/dd/yyyy'
+      });
+      setTimeDomain(computeTimeDomain(7));
+
+      $('input', form).on('change', function() {
+        if (form.hasClass('time-domain-processed')) {
+          const timeDomain = getTimeDomain();
+          // If invalid ordering is chosen, set period to 1 day
+          if (timeDomain[0] >= timeDomain[1]) {
+            timeDomain[1] = d3.time.day.offset(timeDomain[0], +1);
           }
-          const newReservation = {
-            'start_date': new Date(reservation.start_date),
-            'end_date': new Date(reservation.end_date),
-            'x': reservation[rowAttr],
-            'y': [
-              new Date(reservation.start_date).getTime(),
-              new Date(reservation.end_date).getTime()
-            ],
+          changeTimeDomain(timeDomain);
+        }
+      });
+
+      $('.calendar-quickdays').on('click', function() {
+        const days = parseInt($(this).data("calendar-days"));
+        if (!isNaN(days)) {
+          changeTimeDomain(computeTimeDomain(days));
+        }
+      });
+      $('#groupBy', form).on('change', loadCalendar);
+    }
+
+    function startData() {
+      // Prepare the chart data in a worker if possible, on the page if not.
+      const url = calendarElement.data('worker');
+      if (url && typeof window.Worker !== 'undefined') {
+        try {
+          const worker = new Worker(url);
+          worker.onmessage = function(event) {
+            showPrepared(event.data);
+          };
+          return function(message) {
+            worker.postMessage(message);
+          };
+        } catch (error) {
+          // Fall back to the data store on the page.
+        }
+      }
+      const store = new window.blazarCalendarData.Store();
+      return function(message) {
+        showPrepared(store.handle(message));
+      };
+    }
+
+    function loadCalendar() {
+      const groupBy = $('#groupBy', form).val();
+      if (!groupBy) {
+        showPeriod(getTimeDomain());
+        return;
+      }
+      // Grouped occupancy is summarised by the server and is not tiled.
+      const id = ++latestRender;
+      fetchText({group_by: groupBy})
+        .done(function(text) {
+          postData({id: id, text: text, ungroupedLabel: gettext("Ungrouped")});
+        })
+        .fail(function() {
+          showPrepared({id: id, error: "request failed"});
+        });
+    }
+
+    function fetchText(params) {
+      // Parsing the payload is left to the data store, so that large
+      // calendars do not block the page.
+      return $.ajax({url: "resources.json", data: params, dataType: "text"});
+    }
+
+    function tileKeys(timeDomain) {
+      const keys = [];
+      const first = Math.floor(timeDomain[0].getTime() / tileMs);
+      const last = Math.floor((timeDomain[1].getTime() - 1) / tileMs);
+      for (let key = first; key <= last; key++) {
+        keys.push(key);
+      }
+      return keys;
+    }
+
+    function fetchTiles(keys) {
+      // Request the tiles neither loaded nor being loaded, and return a
+      // promise of all of keys being in the data store.
+      const missing = keys.filter(function(key) { return !tileRequests.has(key); });
+      for (let i = 0; i < missing.length; i += maxTiles) {
+        const chunk = missing.slice(i, i + maxTiles);
+        const params = {tiles: chunk.join(',')};
+        if (!resourcesRequested) {
+          params.resources = 1;
+          resourcesRequested = true;
+        }
+        const request = fetchText(params);
+        request.done(function(text) {
+          postData({text: text});
+        });
+        request.fail(function() {
+          chunk.forEach(function(key) { tileRequests.delete(key); });
+          if (params.resources) {
+            resourcesRequested = false;
           }
-          reservationsById[reservation.reservation_id].data.push(newReservation)
+        });
+        chunk.forEach(function(key) { tileRequests.set(key, request); });
+      }
+      const requests = new Set(keys.map(function(key) { return tileRequests.get(key); }));
+      return $.when.apply($, Array.from(requests));
+    }
+
+    function showTiles(timeDomain) {
+      const keys = tileKeys(timeDomain);
+      const id = ++latestRender;
+      fetchTiles(keys)
+        .done(function() {
+          postData({id: id, tiles: keys});
+          // Load the windows on either side in the background, so that
+          // panning and zooming out is served from the data store.
+          const width = timeDomain[1] - timeDomain[0];
+          fetchTiles(tileKeys([new Date(timeDomain[0].getTime() - width),
+                               new Date(timeDomain[1].getTime() + width)]));
         })
-        reservationsById["0"] = {"name": "0", "data": []}
-        resp.resources.forEach(function(resource){
-          reservationsById["0"].data.push({x: resource[rowAttr], y: [0, 0]})
+        .fail(function() {
+          showPrepared({id: id, error: "request failed"});
+        });
+    }
+
+    function showPeriod(timeDomain) {
+      if (timeDomain[1] - timeDomain[0] >= overviewMs) {
+        showOverview(timeDomain);
+      } else {
+        showTiles(timeDomain);
+      }
+    }
+
+    function showOverview(timeDomain) {
+      const id = ++latestRender;
+      const columns = Math.max(1, Math.min(
+        overviewMaxColumns,
+        Math.floor(calendarElement.width()) - OVERVIEW_LABEL_WIDTH));
+      const params = {
+        overview: 1,
+        start: timeDomain[0].getTime(),
+        end: timeDomain[1].getTime(),
+        columns: columns
+      };
+      $.getJSON("resources.json", params)
+        .done(function(resp) {
+          if (id === latestRender) {
+            drawOverview(resp.overview, resp.stale);
+          }
         })
-        const allReservations = Object.values(reservationsById)
-        constructCalendar(allReservations, computeTimeDomain(7), resp.resources)
-    })
-    .fail(function() {
-      calendarElement.html(`<div class="alert alert-danger">${gettext("Unable to load reservations")}.</div>`);
-    });
-
-    function constructCalendar(rows, timeDomain, resources){
+        .fail(function() {
+          showPrepared({id: id, error: "request failed"});
+        });
+    }
+
+    function drawOverview(overview, stale) {
+      // Draw the occupancy as one canvas, replacing the chart. The chart is
+      // built again when zooming back in.
+      showStale(stale);
+      if (chart) {
+        chart.destroy();
+        chart = null;
+      }
+      const canvas = document.createElement('canvas');
+      canvas.className = 'calendar-overview';
+      canvas.width = OVERVIEW_LABEL_WIDTH + overview.columns;
+      // On large clouds, rows are made thinner so that the canvas can be
+      // drawn, down to several hosts per pixel.
+      const maxHeight = Math.min(OVERVIEW_MAX_HEIGHT,
+                                 Math.floor(OVERVIEW_MAX_AREA / canvas.width));
+      const rowHeight = Math.min(
+        OVERVIEW_ROW_HEIGHT,
+        (maxHeight - OVERVIEW_AXIS_HEIGHT) / Math.max(1, overview.rows.length));
+      const labelled = rowHeight >= OVERVIEW_MIN_LABELLED_ROW_HEIGHT;
+      const gap = labelled ? 1 : 0;
+      canvas.height = OVERVIEW_AXIS_HEIGHT + Math.ceil(rowHeight * overview.rows.length);
+      calendarElement.empty().append(canvas);
+
+      const context = canvas.getContext('2d');
+      const span = overview.end - overview.start;
+      context.font = '10px sans-serif';
+      context.textBaseline = 'middle';
+      context.fillStyle = '#333';
+      context.fillText(new Date(overview.start).toLocaleString(),
+                       OVERVIEW_LABEL_WIDTH, OVERVIEW_AXIS_HEIGHT / 2);
+      context.textAlign = 'right';
+      context.fillText(new Date(overview.end).toLocaleString(),
+                       canvas.width, OVERVIEW_AXIS_HEIGHT / 2);
+      overview.rows.forEach(function(label, i) {
+        const top = OVERVIEW_AXIS_HEIGHT + i * rowHeight;
+        if (labelled) {
+          context.fillStyle = '#333';
+          context.fillText(String(label), OVERVIEW_LABEL_WIDTH - 4,
+                           top + rowHeight / 2);
+        }
+        context.fillStyle = '#008FFB';
+        const runs = overview.runs[i];
+        for (let j = 0; j < runs.length; j += 2) {
+          context.fillRect(OVERVIEW_LABEL_WIDTH + runs[j], top + gap,
+                           runs[j + 1], rowHeight - 2 * gap);
+        }
+      });
+
+      const now = Date.now();
+      if (now > overview.start && now < overview.end) {
+        context.fillStyle = '#00E396';
+        context.fillRect(OVERVIEW_LABEL_WIDTH +
+                         Math.floor((now - overview.start) * overview.columns / span),
+                         OVERVIEW_AXIS_HEIGHT, 1, canvas.height);
+      }
+    }
+
+    function showPrepared(reply) {
+      if (!reply || reply.id !== latestRender) {
+        // Nothing to show, or a newer view was requested meanwhile.
+        return;
+      }
+      if (reply.error) {
+        calendarElement.html(`<div class="alert alert-danger">${gettext("Unable to load reservations")}.</div>`);
+        if (chart) {
+          chart.destroy();
+          chart = null;
+        }
+        return;
+      }
+      showStale(reply.stale);
+      rows = chartRows(reply.prepared);
+      if (chart && reply.prepared.rows === rowCount) {
+        chart.updateSeries(rows);
+        return;
+      }
+      rowCount = reply.prepared.rows;
+      constructCalendar(getTimeDomain());
+    }
+
+    function showStale(stale) {
+      if (!stale) {
+        staleNotice.addClass('hidden');
+        return;
+      }
+      // Blazar is unavailable and the server sent the data it last got.
+      // Forget the tiles, so that they are fetched again on the next move.
+      tileRequests.clear();
+      resourcesRequested = false;
+      staleNotice.text(interpolate(
+        gettext("The Reservation service is unavailable. Showing reservations as of %s."),
+        [new Date(stale.fetched_at).toLocaleString()])).removeClass('hidden');
+    }
+
+    function chartRows(prepared) {
+      // Build the objects ApexCharts expects from the columnar series.
+      return prepared.series.map(function(column) {
+        const data = new Array(column.x.length);
+        for (let i = 0; i < data.length; i++) {
+          data[i] = {x: column.x[i], y: [column.start[i], column.end[i]]};
+          if (prepared.grouped && column.count[i] > 0) {
+            data[i].count = column.count[i];
+            data[i].total = column.total[i];
+            data[i].fillColor = '#008FFB' + occupancyAlpha(column.count[i] / column.total[i]);
+          }
+        }
+        return {
+          name: column.name,
+          start_date: column.start_date,
+          end_date: column.end_date,
+          data: data
+        };
+      });
+    }
+
+    function occupancyAlpha(fraction) {
+      const alpha = Math.round(64 + 191 * Math.min(fraction, 1));
+      return alpha.toString(16).padStart(2, '0');
+    }
+
+    function groupTooltip(datum) {
+      const reserved = interpolate(gettext("%(count)s of %(total)s reserved"),
+                                   {count: datum.count, total: datum.total}, true);
+      return `<div class='tooltip-content'><dl>
+        <dt>${pluralResourceType}</dt>
+          <dd>${reserved}</dd>
+        <dt>${gettext("Reserved")}</dt>
+          <dd>${new Date(datum.y[0])} <strong>${gettext("to")}</strong> ${new Date(datum.y[1])}</dd>
+      </dl></div>`;
+    }
+
+    function changeTimeDomain(timeDomain) {
+      setTimeDomain(timeDomain, chart);
+      if (!$('#groupBy', form).val()) {
+        showPeriod(timeDomain);
+      }
+    }
+
+    function constructCalendar(timeDomain){
+      if (chart) {
+        chart.destroy();
+      }
       calendarElement.empty();
       const options = {
         series: rows,
@@ -53,7 +347,7 @@
           type: 'rangeBar',
           toolbar: {show: false},
           zoom: {enabled: false, type: 'xy'},
-          height: ROW_HEIGHT * resources.length + CHART_TITLE_HEIGHT,
+          height: ROW_HEIGHT * rowCount + CHART_TITLE_HEIGHT,
           width: "100%",
         },
         plotOptions: { bar: {horizontal: true, rangeBarGroupRows: true}},
@@ -61,15 +355,12 @@
         legend: { show: false },
         tooltip: {
           custom: function({series, seriesIndex, dataPointIndex, w}) {
+            if (rows[seriesIndex].name === "occupancy") {
+              return groupTooltip(rows[seriesIndex].data[dataPointIndex]);
+            }
             const datum = rows[seriesIndex];
             const resourcesReserved = datum.data.map(function(el){ return el.x }).join("<br>");
-            const project_dt = "";
-            if(datum.project_id){
-              project_dt = `<dt>${gettext("Project")}</dt>
-                <dd>${datum.project_id}</dd>`;
-            }
             return `<div class='tooltip-content'><dl>
-              ${project_dt}
               <dt>${pluralResourceType}</dt>
                 <dd>${resourcesReserved}</dd>
               <dt>${gettext("Reserved")}</dt>
@@ -86,33 +377,10 @@
           ]
         },
       }
-      const chart = new ApexCharts(document.querySelector(selector), options);
+      chart = new ApexCharts(document.querySelector(selector), options);
       chart.render();
 
       setTimeDomain(timeDomain, chart); // Also sets the yaxis limits
-
-      $('input[data-datepicker]', form).datepicker({
-        dateFormat: 'mm/dd/yyyy'
-      });
-
-      $('input', form).on('change', function() {
-        if (form.hasClass('time-domain-processed')) {
-          const timeDomain = getTimeDomain();
-          // If invalid ordering is chosen, set period to 1 day
-          if (timeDomain[0] >= timeDomain[1]) {
-            timeDomain[1] = d3.time.day.offset(timeDomain[0], +1);
-          }
-          setTimeDomain(timeDomain, chart);
-        }
-      });
-
-      $('.calendar-quickdays').click(function() {
-        const days = parseInt($(this).data("calendar-days"));
-        if (!isNaN(days)) {
-          const timeDomain = computeTimeDomain(days);
-          setTimeDomain(timeDomain, chart);
-        }
-      })
     }
 
     function computeTimeDomain(days) {
@@ -131,8 +399,10 @@
       $('#dateEnd').datepicker('setDate', timeDomain[1]);
       $('#timeEndHours').val(timeDomain[1].getHours());
       form.addClass('time-domain-processed');
-      const options = { yaxis: {min: timeDomain[0].getTime(), max: timeDomain[1].getTime()}}
-      chart.updateOptions(options)
+      if (chart) {
+        const options = { yaxis: {min: timeDomain[0].getTime(), max: timeDomain[1].getTime()}}
+        chart.updateOptions(options)
+      }
     }
 
     function getTimeDomain() {
@@ -0,0 +1,183 @@
+// Keep calendar tiles and turn them into chart series.
+//
+// The series are columnar: row labels in an array, and start and end
+// timestamps (and occupancy counts when grouped) in typed arrays whose
+// buffers can be transferred without copying. This file is run as a Web
+// Worker by lease_chart.js, and also loaded on the page as a fallback for
+// browsers without workers.
+(function(self) {
+  'use strict';
+
+  function reservationSeries(reservations, resources, rowAttr) {
+    const series = [];
+    const indexById = new Map();
+    const counts = [];
+    const seriesOf = new Int32Array(reservations.length);
+
+    // First pass: one series per reservation, sized for its allocations.
+    reservations.forEach(function(reservation, i) {
+      let index = indexById.get(reservation.reservation_id);
+      if (index === undefined) {
+        index = series.length;
+        indexById.set(reservation.reservation_id, index);
+        series.push({
+          name: reservation.reservation_id,
+          start_date: reservation.start_date,
+          end_date: reservation.end_date,
+          x: []
+        });
+        counts.push(0);
+      }
+      seriesOf[i] = index;
+      counts[index]++;
+    });
+    series.forEach(function(column, index) {
+      column.start = new Float64Array(counts[index]);
+      column.end = new Float64Array(counts[index]);
+    });
+
+    // Second pass: parse each date once, straight into the typed arrays.
+    reservations.forEach(function(reservation, i) {
+      const column = series[seriesOf[i]];
+      const j = column.x.length;
+      column.x.push(reservation[rowAttr]);
+      column.start[j] = Date.parse(reservation.start_date);
+      column.end[j] = Date.parse(reservation.end_date);
+    });
+
+    // A zero-length bar per resource, so that every resource gets a row.
+    series.push({
+      name: "0",
+      x: resources.map(function(resource) { return resource[rowAttr]; }),
+      start: new Float64Array(resources.length),
+      end: new Float64Array(resources.length)
+    });
+    return {series: series, rows: resources.length, grouped: false};
+  }
+
+  function groupSeries(groups, ungroupedLabel) {
+    // Each group has a zero-length bar, plus one bar per step during which
+    // at least one of its hosts is reserved.
+    let length = 0;
+    groups.forEach(function(group) {
+      length++;
+      group.steps.forEach(function(step, i) {
+        if (step[1] > 0 && i + 1 < group.steps.length) {
+          length++;
+        }
+      });
+    });
+
+    const column = {
+      name: "occupancy",
+      x: new Array(length),
+      start: new Float64Array(length),
+      end: new Float64Array(length),
+      count: new Int32Array(length),
+      total: new Int32Array(length)
+    };
+    let j = 0;
+    groups.forEach(function(group) {
+      const name = group.name === null ? ungroupedLabel : String(group.name);
+      column.x[j] = name;
+      column.total[j++] = group.total;
+      group.steps.forEach(function(step, i) {
+        if (step[1] > 0 && i + 1 < group.steps.length) {
+          column.x[j] = name;
+          column.start[j] = step[0];
+          column.end[j] = group.steps[i + 1][0];
+          column.count[j] = step[1];
+          column.total[j++] = group.total;
+        }
+      });
+    });
+    return {series: [column], rows: groups.length, grouped: true};
+  }
+
+  function Store() {
+    // Reservations of each loaded tile, by tile key.
+    this.tiles = new Map();
+    this.resources = [];
+    this.rowAttr = null;
+    // Set while the server sends data saved before Blazar was unavailable.
+    this.stale = null;
+  }
+
+  Store.prototype.add = function(resp) {
+    const tiles = this.tiles;
+    if (resp.resources) {
+      this.resources = resp.resources;
+    }
+    this.rowAttr = resp.row_attr;
+    this.stale = resp.stale || null;
+    Object.keys(resp.tiles).forEach(function(key) {
+      tiles.set(Number(key), resp.tiles[key]);
+    });
+  };
+
+  Store.prototype.series = function(keys) {
+    // A reservation spanning several tiles is in each of them.
+    const rowAttr = this.rowAttr;
+    const seen = new Set();
+    const reservations = [];
+    keys.forEach(function(key) {
+      (this.tiles.get(key) || []).forEach(function(reservation) {
+        const id = reservation.reservation_id + '\u0000' + reservation[rowAttr];
+        if (!seen.has(id)) {
+          seen.add(id);
+          reservations.push(reservation);
+        }
+      });
+    }, this);
+    return reservationSeries(reservations, this.resources, rowAttr);
+  };
+
+  Store.prototype.handle = function(message) {
+    // Messages may carry a resources.json payload to parse, and tile keys
+    // to build series from. The reply is null if there is nothing to show.
+    try {
+      const resp = message.text ? JSON.parse(message.text) : null;
+      if (resp && resp.groups) {
+        return {id: message.id,
+                prepared: groupSeries(resp.groups, message.ungroupedLabel),
+                stale: resp.stale || null};
+      }
+      if (resp) {
+        this.add(resp);
+      }
+      if (!message.tiles) {
+        return null;
+      }
+      return {id: message.id, prepared: this.series(message.tiles),
+              stale: this.stale};
+    } catch (error) {
+      return {id: message.id, error: String(error)};
+    }
+  };
+
+  function transferables(prepared) {
+    const buffers = [];
+    prepared.series.forEach(function(column) {
+      ['start', 'end', 'count', 'total'].forEach(function(key) {
+        if (column[key]) {
+          buffers.push(column[key].buffer);
+        }
+      });
+    });
+    return buffers;
+  }
+
+  self.blazarCalendarData = {Store: Store};
+
+  if (typeof window === 'undefined' && typeof importScripts === 'function') {
+    const store = new Store();
+    self.onmessage = function(event) {
+      const reply = store.handle(event.data);
+      if (reply) {
+        self.postMessage(reply,
+                         reply.prepared ? transferables(reply.prepared) : []);
+      }
+    };
+  }
+
+})(self);
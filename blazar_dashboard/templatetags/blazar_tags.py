@@ -0,0 +1,30 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from blazar_dashboard.api import resilience
+from django import template
+from django.utils.html import format_html
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+@register.simple_tag
+def blazar_degraded_banner():
+    """Warn that Blazar is unhealthy while the circuit breaker is open."""
+    if not resilience.breaker.is_open():
+        return ''
+    return format_html(
+        '<div class="alert alert-warning blazar-degraded" role="alert">'
+        '{}</div>',
+        _('The Reservation service is not responding. Reservation data may '
+          'be missing or out of date until it recovers.'))
@@ -0,0 +1,221 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the dashboard's data paths against synthetic data sets.
+
+Run with ``tox -e benchmark`` or
+``python -m blazar_dashboard.test.benchmarks``. Results are written as JSON,
+one entry per (case, scale), so that runs from different releases can be
+compared.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from unittest import mock
+
+SCALES = ('100x500x1000', '1000x5000x10000')
+
+
+def parse_scale(scale):
+    hosts, leases, allocations = (int(n) for n in scale.split('x'))
+    return hosts, leases, allocations
+
+
+def make_request():
+    from django.test import RequestFactory
+    from openstack_auth import user as auth_user
+    from openstack_dashboard.test.test_data import utils
+
+    test_data = utils.load_test_data()
+    request = RequestFactory().get('/')
+    request.user = auth_user.User(
+        id='1', token=test_data.tokens.first(), user='admin',
+        tenant_id='1', service_catalog=test_data.service_catalog,
+        roles=[{'name': 'admin'}], authorized_tenants=[], enabled=True,
+        domain_id='1')
+    request.session = {}
+    return request
+
+
+def calendar_json(request):
+    from django.core.serializers.json import DjangoJSONEncoder
+
+    from blazar_dashboard.api import client
+
+    return json.dumps(client.reservation_calendar(request),
+                      cls=DjangoJSONEncoder)
+
+
+def calendar_overview(request):
+    import datetime
+
+    from blazar_dashboard.api import client
+
+    # A year of the synthetic data sets, 1000 pixels wide.
+    return client.reservation_calendar_overview(
+        request, datetime.datetime(2030, 1, 1), datetime.datetime(2031, 1, 1),
+        1000)
+
+
+def lease_table(request):
+    from blazar_dashboard.api import client
+    from blazar_dashboard.content.leases import tables
+
+    return tables.LeasesTable(request, client.lease_list(request)).render()
+
+
+def host_table(request):
+    from blazar_dashboard.api import client
+    from blazar_dashboard.content.hosts import tables
+
+    return tables.HostsTable(request, client.host_list(request)).render()
+
+
+def host_utilization(request):
+    import datetime
+
+    from blazar_dashboard.api import client
+
+    # Synthetic data sets cover the year 2030.
+    return client.host_utilization(request, datetime.datetime(2030, 1, 1),
+                                   datetime.datetime(2031, 1, 1))
+
+
+def select_hosts_workflow(request):
+    from blazar_dashboard.content.hosts import workflows
+
+    return workflows.SelectHostsAction(request, {})
+
+
+CASES = {
+    'calendar_json': calendar_json,
+    'calendar_overview': calendar_overview,
+    'lease_table_render': lease_table,
+    'host_table_render': host_table,
+    'host_utilization': host_utilization,
+    'select_hosts_workflow': select_hosts_workflow,
+}
+
+
+class Hypervisor(object):
+    def __init__(self, hostname):
+        self.hypervisor_hostname = hostname
+
+
+def run_case(func, dataset, repeat, blazar=None):
+    """Time func against dataset.
+
+    :param blazar: Blazar client to use. Defaults to a stub serving dataset
+        without any HTTP round-trip.
+    """
+    from blazar_dashboard.api import client
+    from blazar_dashboard.api import snapshot
+    from blazar_dashboard.test.benchmarks import synthetic
+
+    stub = blazar or synthetic.StubBlazarClient(dataset)
+    # Every Blazar host is a hypervisor, plus 10% not yet in Blazar.
+    hypervisors = [Hypervisor(h['hypervisor_hostname'])
+                   for h in dataset.hosts]
+    hypervisors.extend(Hypervisor('new-compute-%d' % i)
+                       for i in range(len(dataset.hosts) // 10))
+    timings = []
+    with mock.patch.object(client, 'blazarclient', return_value=stub), \
+            mock.patch('openstack_dashboard.api.nova.hypervisor_list',
+                       return_value=hypervisors):
+        for _ in range(repeat):
+            # A new request each time so that request-scoped caches start
+            # empty, as they would in production. Inventory snapshots are
+            # dropped too, to measure the full data path.
+            request = make_request()
+            snapshot.store.clear()
+            start = time.perf_counter()
+            func(request)
+            timings.append(time.perf_counter() - start)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'max': max(timings),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', action='append', dest='scales',
+                        help='HOSTSxLEASESxALLOCATIONS, may be repeated. '
+                             'Defaults to %s.' % ', '.join(SCALES))
+    parser.add_argument('--case', action='append', dest='cases',
+                        choices=sorted(CASES),
+                        help='Case to run, may be repeated. Defaults to all.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--http', action='store_true',
+                        help='Go through blazarclient and HTTP to a local '
+                             'fake Blazar server instead of a stub client.')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Latency in seconds of the fake Blazar server.')
+    parser.add_argument('--output', help='File to write JSON results to. '
+                                         'Defaults to standard output.')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE',
+                          'blazar_dashboard.test.settings')
+    import django
+    django.setup()
+
+    from blazar_dashboard.test.benchmarks import synthetic
+    from blazar_dashboard.test import fake_blazar
+    from blazar_dashboard import version
+
+    results = []
+    for scale in args.scales or SCALES:
+        n_hosts, n_leases, n_allocations = parse_scale(scale)
+        dataset = synthetic.generate(n_hosts, n_leases, n_allocations)
+        fake = blazar = None
+        if args.http:
+            fake = fake_blazar.FakeBlazarServer(dataset,
+                                                latency=args.latency).start()
+            blazar = fake_blazar.make_client(fake.url)
+        for name in args.cases or sorted(CASES):
+            seconds = run_case(CASES[name], dataset, args.repeat, blazar)
+            print('%-24s %-20s %8.3fs' % (name, scale, seconds['median']),
+                  file=sys.stderr)
+            results.append({
+                'case': name,
+                'hosts': n_hosts,
+                'leases': n_leases,
+                'allocations': n_allocations,
+                'repeat': args.repeat,
+                'http': args.http,
+                'latency': args.latency if args.http else None,
+                'seconds': seconds,
+            })
+        if fake:
+            fake.stop()
+
+    report = {
+        'version': version.version_info.version_string(),
+        'python': platform.python_version(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the cost of loading the plugin into a Horizon worker.
+
+Each measurement runs in a fresh interpreter: Django and Horizon are set up
+first, then the modules Horizon loads for the Blazar panels when building
+its URLconf are imported, and the import time and resident memory growth
+are reported. Run with
+``python -m blazar_dashboard.test.benchmarks.startup``.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules loaded by Horizon for the Blazar panels, panels first.
+MODULES = (
+    'blazar_dashboard.content.leases.panel',
+    'blazar_dashboard.content.hosts.panel',
+    'blazar_dashboard.content.admin_leases.panel',
+    'blazar_dashboard.content.leases.urls',
+    'blazar_dashboard.content.hosts.urls',
+    'blazar_dashboard.content.admin_leases.urls',
+)
+
+
+def _rss_kb():
+    """Return the resident set size of this process, in KiB."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        # Not Linux: fall back to the peak resident set size.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure():
+    """Import the plugin in this process and return its cost."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE',
+                          'blazar_dashboard.test.settings')
+    import django
+    django.setup()
+    # Loaded by any Horizon worker, with or without the plugin.
+    import horizon.tables  # noqa
+    import horizon.tabs  # noqa
+    import horizon.workflows  # noqa
+    import openstack_dashboard.api.base  # noqa
+
+    modules = len(sys.modules)
+    rss = _rss_kb()
+    start = time.perf_counter()
+    for module in MODULES:
+        importlib.import_module(module)
+    return {
+        'import_seconds': time.perf_counter() - start,
+        'rss_kb': _rss_kb() - rss,
+        'modules': len(sys.modules) - modules,
+        'blazarclient_loaded': 'blazarclient.client' in sys.modules,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--child', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        json.dump(measure(), sys.stdout)
+        return
+
+    runs = []
+    for _ in range(args.repeat):
+        output = subprocess.run(
+            [sys.executable, '-m', __spec__.name, '--child'],
+            check=True, stdout=subprocess.PIPE).stdout
+        runs.append(json.loads(output))
+    report = {
+        'import_seconds': statistics.median(
+            r['import_seconds'] for r in runs),
+        'rss_kb': statistics.median(r['rss_kb'] for r in runs),
+        'modules': runs[0]['modules'],
+        'blazarclient_loaded': runs[0]['blazarclient_loaded'],
+        'repeat': args.repeat,
+    }
+    json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
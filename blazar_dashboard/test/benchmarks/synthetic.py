@@ -0,0 +1,167 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Synthetic Blazar data sets and a stubbed Blazar client."""
+
+import datetime
+import json
+import random
+import re
+import uuid
+
+API_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+class Dataset(object):
+    """Hosts, leases and host allocations as returned by the Blazar API."""
+
+    def __init__(self, hosts, leases, allocations):
+        self.hosts = hosts
+        self.leases = leases
+        self.allocations = allocations
+
+
+def generate(n_hosts, n_leases, n_allocations, seed=0,
+             start=datetime.datetime(2030, 1, 1), days=365):
+    """Generate a reproducible data set.
+
+    :param n_hosts: number of hosts, spread over racks of 40 hosts.
+    :param n_leases: number of leases, each with one host reservation.
+    :param n_allocations: total number of (host, reservation) allocations.
+    """
+    rand = random.Random(seed)
+
+    def new_id():
+        return str(uuid.UUID(int=rand.getrandbits(128)))
+
+    hosts = []
+    for i in range(n_hosts):
+        hosts.append({
+            'id': str(i + 1),
+            'hypervisor_hostname': 'compute-%d' % (i + 1),
+            'hypervisor_type': 'QEMU',
+            'hypervisor_version': 2005000,
+            'vcpus': rand.choice((32, 64, 128)),
+            'cpu_info': json.dumps({'arch': 'x86_64'}),
+            'memory_mb': rand.choice((131072, 262144)),
+            'local_gb': rand.choice((480, 960)),
+            'status': None,
+            'created_at': '2029-01-01 00:00:00',
+            'updated_at': None,
+            'service_name': 'compute-%d' % (i + 1),
+            'trust_id': new_id(),
+            'reservable': rand.random() > 0.05,
+            'rack': 'rack-%d' % (i // 40),
+        })
+
+    leases = []
+    for _ in range(n_leases):
+        lease_id = new_id()
+        lease_start = start + datetime.timedelta(
+            hours=rand.randrange(days * 24))
+        lease_end = lease_start + datetime.timedelta(
+            hours=rand.randrange(1, 14 * 24))
+        leases.append({
+            'id': lease_id,
+            'name': 'lease-%s' % lease_id[:8],
+            'project_id': 'project-%d' % rand.randrange(50),
+            'user_id': new_id(),
+            'start_date': lease_start.strftime(API_DATE_FORMAT),
+            'end_date': lease_end.strftime(API_DATE_FORMAT),
+            'before_end_date': None,
+            'status': rand.choice(('PENDING', 'ACTIVE', 'TERMINATED')),
+            'degraded': False,
+            'trust_id': new_id(),
+            'created_at': '2029-01-01 00:00:00',
+            'updated_at': None,
+            'events': [],
+            'reservations': [{
+                'id': new_id(),
+                'lease_id': lease_id,
+                'resource_id': new_id(),
+                'resource_type': 'physical:host',
+                'status': 'pending',
+                'min': 1,
+                'max': 1,
+                'hypervisor_properties': '',
+                'resource_properties': '',
+                'missing_resources': False,
+                'resources_changed': False,
+                'created_at': '2029-01-01 00:00:00',
+                'updated_at': None,
+            }],
+        })
+
+    by_host = {}
+    for _ in range(n_allocations if leases and hosts else 0):
+        lease = rand.choice(leases)
+        host = rand.choice(hosts)
+        by_host.setdefault(host['id'], []).append({
+            'id': lease['reservations'][0]['id'],
+            'lease_id': lease['id'],
+            'start_date': lease['start_date'],
+            'end_date': lease['end_date'],
+        })
+    allocations = [{'resource_id': host_id, 'reservations': reservations}
+                   for host_id, reservations in by_host.items()]
+
+    return Dataset(hosts, leases, allocations)
+
+
+class _LeaseManager(object):
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def list(self):
+        return self.dataset.leases
+
+    def get(self, lease_id):
+        return next(lease for lease in self.dataset.leases
+                    if lease['id'] == lease_id)
+
+
+class _RequestManager(object):
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def get(self, url):
+        if url == '/os-hosts/allocations':
+            return None, {'allocations': self.dataset.allocations}
+        match = re.match(r'^/os-hosts/([^/]+)/allocation$', url)
+        if match:
+            allocation = next(
+                (a for a in self.dataset.allocations
+                 if a['resource_id'] == match.group(1)),
+                {'resource_id': match.group(1), 'reservations': []})
+            return None, {'allocation': allocation}
+        raise ValueError('Unsupported URL %s' % url)
+
+
+class _HostManager(object):
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.request_manager = _RequestManager(dataset)
+
+    def list(self):
+        return self.dataset.hosts
+
+    def get(self, host_id):
+        return next(host for host in self.dataset.hosts
+                    if host['id'] == str(host_id))
+
+
+class StubBlazarClient(object):
+    """Serve a :class:`Dataset` through the blazarclient interface."""
+
+    def __init__(self, dataset):
+        self.lease = _LeaseManager(dataset)
+        self.host = _HostManager(dataset)
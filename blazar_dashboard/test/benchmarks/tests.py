@@ -0,0 +1,47 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import subprocess
+import sys
+
+from blazar_dashboard.test.benchmarks import __main__ as benchmarks
+from blazar_dashboard.test.benchmarks import startup
+from blazar_dashboard.test.benchmarks import synthetic
+from blazar_dashboard.test import helpers as test
+
+
+class BenchmarkTests(test.TestCase):
+    def test_generate(self):
+        dataset = synthetic.generate(10, 20, 30)
+
+        self.assertEqual(10, len(dataset.hosts))
+        self.assertEqual(20, len(dataset.leases))
+        self.assertEqual(30, sum(len(a['reservations'])
+                                 for a in dataset.allocations))
+        self.assertEqual(dataset.hosts, synthetic.generate(10, 20, 30).hosts)
+
+    def test_cases_run(self):
+        dataset = synthetic.generate(5, 10, 10)
+
+        for name, func in benchmarks.CASES.items():
+            seconds = benchmarks.run_case(func, dataset, repeat=1)
+            self.assertLessEqual(seconds['min'], seconds['max'], name)
+
+    def test_startup_defers_blazarclient(self):
+        output = subprocess.run(
+            [sys.executable, '-m', startup.__name__, '--child'],
+            check=True, stdout=subprocess.PIPE).stdout
+
+        result = json.loads(output)
+        self.assertFalse(result['blazarclient_loaded'])
+        self.assertGreater(result['modules'], 0)
@@ -0,0 +1,208 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""A lightweight stand-in for the Blazar API, for load and latency testing.
+
+The server covers the parts of the Blazar v1 API used by the dashboard:
+leases, os-hosts and host allocations. It serves a synthetic data set and
+can add latency and inject errors, so the whole client path (blazarclient,
+keystoneauth and JSON decoding) can be exercised without a cloud::
+
+    python -m blazar_dashboard.test.fake_blazar --hosts 1000 --latency 0.05
+"""
+
+import argparse
+from http import server
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+from blazar_dashboard.test.benchmarks import synthetic
+
+
+class FakeBlazarServer(object):
+    """Serve a synthetic data set over HTTP on a background thread.
+
+    :param dataset: a :class:`synthetic.Dataset`.
+    :param latency: seconds to wait before answering each request.
+    :param jitter: maximum number of seconds added at random to latency.
+    :param error_rate: fraction of requests answered with a 500 error.
+    """
+
+    def __init__(self, dataset, latency=0, jitter=0, error_rate=0, seed=0,
+                 host='127.0.0.1', port=0):
+        self.dataset = dataset
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = server.ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _delay_and_fail(self, method, path):
+        with self._lock:
+            key = '%s %s' % (method, path)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def handle(self, method, path, body):
+        """Return (status, body) for a request."""
+        dataset = self.dataset
+        path = re.sub(r'^/v1(?=/)', '', path.split('?')[0]).rstrip('/')
+        if self._delay_and_fail(method, path):
+            return 500, {'error_message': 'Injected failure.'}
+
+        if path == '/leases':
+            if method == 'GET':
+                return 200, {'leases': dataset.leases}
+            if method == 'POST':
+                lease = dict(body, id=str(uuid.uuid4()), status='PENDING',
+                             reservations=body.get('reservations', []))
+                with self._lock:
+                    dataset.leases.append(lease)
+                return 201, {'lease': lease}
+        if path == '/os-hosts':
+            if method == 'GET':
+                return 200, {'hosts': dataset.hosts}
+        if path == '/os-hosts/allocations' and method == 'GET':
+            return 200, {'allocations': dataset.allocations}
+
+        match = re.match(r'^/os-hosts/([^/]+)/allocation$', path)
+        if match and method == 'GET':
+            allocation = next(
+                (a for a in dataset.allocations
+                 if a['resource_id'] == match.group(1)),
+                {'resource_id': match.group(1), 'reservations': []})
+            return 200, {'allocation': allocation}
+
+        match = re.match(r'^/(leases|os-hosts)/([^/]+)$', path)
+        if match:
+            kind, obj_id = match.groups()
+            collection = dataset.leases if kind == 'leases' else dataset.hosts
+            key = 'lease' if kind == 'leases' else 'host'
+            obj = next((o for o in collection if str(o['id']) == obj_id),
+                       None)
+            if obj is None:
+                message = '%s %s not found.' % (key, obj_id)
+                return 404, {'error_message': message}
+            if method == 'GET':
+                return 200, {key: obj}
+            if method == 'PUT':
+                with self._lock:
+                    obj.update(body)
+                return 200, {key: obj}
+            if method == 'DELETE':
+                with self._lock:
+                    collection.remove(obj)
+                return 204, None
+
+        return 404, {'error_message': 'Unknown resource %s.' % path}
+
+
+class _Handler(server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        status, payload = self.server.fake.handle(self.command, self.path,
+                                                  body)
+        data = json.dumps(payload).encode() if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_client(url):
+    """Return a real Blazar client talking to the fake server at url.
+
+    The client uses the session of the dashboard, with its timeouts,
+    retries and circuit breaker, without authentication.
+    """
+    from blazar_dashboard.api import client
+    from blazarclient import client as blazar_client
+
+    return blazar_client.Client(session=client.blazar_session(),
+                                endpoint_override=url)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1234)
+    parser.add_argument('--hosts', type=int, default=1000)
+    parser.add_argument('--leases', type=int, default=5000)
+    parser.add_argument('--allocations', type=int, default=10000)
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Seconds to wait before each response.')
+    parser.add_argument('--jitter', type=float, default=0,
+                        help='Maximum random seconds added to latency.')
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help='Fraction of requests failing with HTTP 500.')
+    args = parser.parse_args(argv)
+
+    dataset = synthetic.generate(args.hosts, args.leases, args.allocations)
+    fake = FakeBlazarServer(dataset, latency=args.latency,
+                            jitter=args.jitter, error_rate=args.error_rate,
+                            host=args.host, port=args.port)
+    print('Serving fake Blazar API on %s' % fake.url)
+    try:
+        fake.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
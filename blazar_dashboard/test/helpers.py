@@ -10,19 +10,36 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from django.core.cache import cache
 from django import http
 from openstack_dashboard.test import helpers
 
+from blazar_dashboard.api import resilience
+from blazar_dashboard.api import snapshot
 from blazar_dashboard.test.test_data import utils
 
 
 class TestCase(helpers.TestCase):
+    def setUp(self):
+        super(TestCase, self).setUp()
+        # Inventory snapshots, the circuit breaker and the local memory
+        # cache live as long as the process.
+        snapshot.store.clear()
+        resilience.breaker.reset()
+        cache.clear()
+
     def _setup_test_data(self):
         super(TestCase, self)._setup_test_data()
         utils.load_test_data(self)
 
 
 class BaseAdminViewTests(helpers.BaseAdminViewTests):
+    def setUp(self):
+        super(BaseAdminViewTests, self).setUp()
+        snapshot.store.clear()
+        resilience.breaker.reset()
+        cache.clear()
+
     def _setup_test_data(self):
         super(BaseAdminViewTests, self)._setup_test_data()
         utils.load_test_data(self)
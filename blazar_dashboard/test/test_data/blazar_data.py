@@ -171,6 +171,30 @@ host_sample2 = {
     "reservable": True
 }
 
+allocation_sample1 = {
+    "resource_id": "1",
+    "reservations": [
+        {
+            "id": "087bc740-6d2d-410b-9d47-c7b2b55a9d36",
+            "lease_id": "6ee55c78-ac52-41a6-99af-2d2d73bcc466",
+            "start_date": "2030-06-27T18:00:00.000000",
+            "end_date": "2030-06-29T18:00:00.000000",
+        },
+    ]
+}
+
+allocation_sample2 = {
+    "resource_id": "2",
+    "reservations": [
+        {
+            "id": "1b05370e-d92a-452d-80db-89842666b604",
+            "lease_id": "ef32abe8-a1f7-4c2f-b5f2-941428848230",
+            "start_date": "2030-06-28T18:00:00.000000",
+            "end_date": "2030-06-30T18:00:00.000000",
+        },
+    ]
+}
+
 
 class DummyHypervisor(object):
     def __init__(self, host_name):
@@ -192,6 +216,11 @@ def data(TEST):
     TEST.hosts.add(api.client.Host(host_sample1))
     TEST.hosts.add(api.client.Host(host_sample2))
 
+    TEST.allocations = utils.TestDataContainer()
+
+    TEST.allocations.add(api.client.Allocation(allocation_sample1))
+    TEST.allocations.add(api.client.Allocation(allocation_sample2))
+
     TEST.hypervisors = utils.TestDataContainer()
 
     TEST.hypervisors.add(hypervisor_sample1)
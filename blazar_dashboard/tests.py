@@ -0,0 +1,82 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from blazar_dashboard import conf
+from blazar_dashboard import profiling
+from blazar_dashboard.test import helpers as test
+
+
+class ProfilingTests(test.TestCase):
+    def _request(self, is_superuser=True, **params):
+        request = RequestFactory().get('/', params)
+        request.user = mock.Mock(is_superuser=is_superuser)
+        return request
+
+    def _view(self, request):
+        api_call(request)
+        return HttpResponse('page')
+
+    def test_disabled_returns_view_unchanged(self):
+        view = self._view
+        with mock.patch.dict(conf.profiling, {'enabled': False}):
+            self.assertIs(view, profiling.profiled(view))
+
+    def test_server_timing(self):
+        view = profiling._profiled(self._view)
+
+        res = view(self._request(blazar_profile='1'))
+
+        self.assertEqual(b'page', res.content)
+        timing = res['Server-Timing']
+        self.assertIn('api;dur=', timing)
+        self.assertIn('blazar_http;dur=', timing)
+        self.assertIn('desc="2 calls"', timing)
+        self.assertIn('wrap;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_not_profiled_without_flag(self):
+        view = profiling._profiled(self._view)
+
+        res = view(self._request())
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_not_profiled_for_non_admin(self):
+        view = profiling._profiled(self._view)
+
+        res = view(self._request(is_superuser=False, blazar_profile='1'))
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_cprofile(self):
+        view = profiling._profiled(self._view)
+
+        res = view(self._request(blazar_profile='cprofile'))
+
+        self.assertEqual('text/plain', res['Content-Type'])
+        self.assertIn(b'function calls', res.content)
+
+
+_http_call = profiling._traced('blazar_http', lambda: None)
+
+
+def _fetch(request):
+    _http_call()
+    _http_call()
+
+
+api_call = profiling._traced('api', _fetch)